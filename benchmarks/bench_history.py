@@ -0,0 +1,119 @@
+"""
+Бенчмарк истории транзакций на большой таблице.
+
+Заполняет transactions (по умолчанию 10M строк, --players игроков) через
+generate_series и меряет чтение страниц истории одного игрока: keyset-курсор
+WalletManager.get_transaction_page против LIMIT/OFFSET на той же глубине.
+Время keyset-страницы не должно расти с глубиной.
+
+Запуск на отдельной БД (таблицы будут пересозданы!):
+    python benchmarks/bench_history.py --database-url postgresql://postgres@localhost/seka_bench
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models import Base  # noqa: E402
+from src.wallet import WalletManager  # noqa: E402
+
+OFFSET_QUERY = text("""
+    SELECT t.id, t.amount, t.action, t.created_at, t.game_id
+    FROM transactions t
+    WHERE t.player_id = (SELECT id FROM players WHERE telegram_id = :telegram_id)
+    ORDER BY t.created_at DESC, t.id DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def seed(engine, rows: int, players: int):
+    """Пересоздает схему и заполняет ее синтетическими транзакциями"""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO players (telegram_id, first_name, balance)
+            SELECT g, 'bench', 1000 FROM generate_series(1, :players) g
+        """), {"players": players})
+        # Индексы строятся после загрузки — так заполнение идет в разы быстрее
+        conn.execute(text("DROP INDEX IF EXISTS idx_transactions_player_created"))
+        conn.execute(text("DROP INDEX IF EXISTS idx_transactions_game"))
+        conn.execute(text("""
+            INSERT INTO transactions (player_id, amount, action, created_at)
+            SELECT 1 + g % :players,
+                   (g % 2000) - 1000,
+                   (ARRAY['bet', 'win', 'loss', 'join'])[1 + g % 4],
+                   now() - make_interval(secs => g)
+            FROM generate_series(1, :rows) g
+        """), {"players": players, "rows": rows})
+        conn.execute(text("CREATE INDEX idx_transactions_player_created ON transactions (player_id, created_at DESC, id DESC)"))
+        conn.execute(text("CREATE INDEX idx_transactions_game ON transactions (game_id)"))
+        conn.execute(text("ANALYZE players, transactions"))
+
+
+def timed(samples: list, started: float):
+    samples.append((time.perf_counter() - started) * 1000)
+
+
+async def bench(async_url: str, args):
+    engine = create_async_engine(async_url)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    # Игрок 1 получает строки g = players, 2*players, ... — около rows/players транзакций
+    telegram_id = 1
+    async with session_factory() as db:
+        wallet = WalletManager(db)
+        print(f"{'depth':>8} {'keyset p50':>12} {'offset p50':>12}")
+        for depth in args.depths:
+            # Курсор на нужной глубине получаем проходом по страницам
+            cursor = None
+            walked = 0
+            while walked < depth:
+                page, cursor = await wallet.get_transaction_page(telegram_id, limit=min(1000, depth - walked), cursor=cursor)
+                walked += len(page)
+                if cursor is None:
+                    break
+            if walked < depth:
+                print(f"{depth:>8} history has only {walked} rows")
+                break
+
+            keyset, offset = [], []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                await wallet.get_transaction_page(telegram_id, limit=args.page_size, cursor=cursor)
+                timed(keyset, started)
+
+                started = time.perf_counter()
+                await db.execute(OFFSET_QUERY, {"telegram_id": telegram_id, "limit": args.page_size, "offset": depth})
+                timed(offset, started)
+            print(f"{depth:>8} {statistics.median(keyset):10.2f}ms {statistics.median(offset):10.2f}ms")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), required=os.getenv("BENCH_DATABASE_URL") is None)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 1000, 10000, 50000, 95000])
+    parser.add_argument("--skip-seed", action="store_true", help="использовать уже заполненную БД")
+    args = parser.parse_args()
+
+    url = args.database_url.split("://", 1)[1]
+    if not args.skip_seed:
+        started = time.perf_counter()
+        seed(create_engine(f"postgresql://{url}"), args.rows, args.players)
+        print(f"seeded {args.rows:,} rows in {time.perf_counter() - started:.1f}s")
+    asyncio.run(bench(f"postgresql+asyncpg://{url}", args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Микробенчмарк проверки Telegram initData.
+
+Сравнивает пропускную способность:
+  * legacy   — прежний алгоритм (ключ выводится из токена на каждый вызов);
+  * cold     — TelegramAuthVerifier без попаданий в кэш (уникальная initData);
+  * cached   — повторное предъявление той же initData (переподключения).
+
+Запуск: python benchmarks/bench_telegram_auth.py [--number 20000]
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+import timeit
+from urllib.parse import parse_qsl, urlencode
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.telegram_auth import TelegramAuthVerifier  # noqa: E402
+
+BOT_TOKEN = "123456:TEST-benchmark-token"
+
+
+def sign_init_data(fields: dict, bot_token: str = BOT_TOKEN) -> str:
+    """Подписывает поля initData так же, как это делает Telegram"""
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret_key = hmac.new("WebAppData".encode(), bot_token.encode(), hashlib.sha256).digest()
+    fields = dict(fields, hash=hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest())
+    return urlencode(fields)
+
+
+def make_init_data(user_id: int) -> str:
+    user = {"id": user_id, "first_name": "Игрок", "last_name": str(user_id), "username": f"player{user_id}"}
+    return sign_init_data({
+        "query_id": f"AAH{user_id}",
+        "user": json.dumps(user, ensure_ascii=False, separators=(',', ':')),
+        "auth_date": str(int(time.time())),
+    })
+
+
+def legacy_verify(init_data: str, bot_token: str) -> bool:
+    parsed_data = dict(parse_qsl(init_data))
+    received_hash = parsed_data.pop('hash', None)
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(parsed_data.items()))
+    secret_key = hmac.new("WebAppData".encode(), bot_token.encode(), hashlib.sha256).digest()
+    calculated_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return calculated_hash == received_hash
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="число проверок в каждом сценарии")
+    args = parser.parse_args()
+
+    payloads = [make_init_data(100000 + i) for i in range(args.number)]
+    same = payloads[0]
+
+    def run_legacy():
+        for p in payloads:
+            legacy_verify(p, BOT_TOKEN)
+
+    def run_cold():
+        verifier = TelegramAuthVerifier(BOT_TOKEN, cache_size=1)
+        for p in payloads:
+            verifier.verify(p)
+
+    verifier = TelegramAuthVerifier(BOT_TOKEN)
+    verifier.verify(same)
+
+    def run_cached():
+        for _ in range(args.number):
+            verifier.verify(same)
+
+    print(f"{'scenario':<10} {'ops/s':>12} {'us/op':>8}")
+    for name, fn in (("legacy", run_legacy), ("cold", run_cold), ("cached", run_cached)):
+        elapsed = min(timeit.repeat(fn, number=1, repeat=3))
+        print(f"{name:<10} {args.number / elapsed:>12,.0f} {elapsed / args.number * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Локальный стенд Telegram Bot API для нагрузочных тестов бота.
+
+Поднимает поддельный Bot API (getMe, setWebhook, getUpdates, sendMessage,
+editMessageText, answerCallbackQuery ...) и воспроизводит всплеск апдейтов:
+/start и нажатия кнопок от --users разных пользователей. В режиме webhook
+апдейты отправляются POST-запросами на вебхук сервера, в режиме polling
+отдаются через getUpdates. Задержка — время от отправки апдейта до ответа
+бота в этот чат (sendMessage / editMessageText).
+
+Запуск (сервер использует этот стенд вместо api.telegram.org):
+    TELEGRAM_API_BASE_URL=http://localhost:8081 BOT_MODE=webhook \\
+        BOT_WEBHOOK_URL=http://localhost:8000 uvicorn src.server:app --port 8000
+    python benchmarks/fake_telegram.py --mode webhook --target http://localhost:8000 --updates 5000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Seka", "username": "seka_fake_bot"}
+CALLBACKS = ["balance", "stats", "history"]
+
+
+class FakeTelegram:
+    """Состояние поддельного Bot API: очередь getUpdates и учет ответов бота"""
+
+    def __init__(self):
+        self.pending: asyncio.Queue = asyncio.Queue()
+        self.webhook_set = asyncio.Event()
+        self.sent_at = {}  # chat_id -> время отправки последнего апдейта
+        self.latencies = []
+        self.calls = Counter()
+        self.message_id = 0
+
+    def _message(self, chat_id, text: str) -> dict:
+        self.message_id += 1
+        return {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "from": BOT_USER,
+            "text": text,
+        }
+
+    def _reply(self, chat_id):
+        started = self.sent_at.pop(int(chat_id), None)
+        if started is not None:
+            self.latencies.append((time.perf_counter() - started) * 1000)
+
+    async def handle(self, method: str, params: dict):
+        self.calls[method] += 1
+        if method == "getMe":
+            return BOT_USER
+        if method in ("setWebhook", "deleteWebhook"):
+            if method == "setWebhook":
+                self.webhook_set.set()
+            return True
+        if method == "getUpdates":
+            timeout = float(params.get("timeout") or 0)
+            updates = []
+            try:
+                updates.append(await asyncio.wait_for(self.pending.get(), timeout=max(timeout, 0.01)))
+            except asyncio.TimeoutError:
+                return []
+            while not self.pending.empty() and len(updates) < 100:
+                updates.append(self.pending.get_nowait())
+            return updates
+        if method in ("sendMessage", "editMessageText"):
+            self._reply(params.get("chat_id"))
+            return self._message(params.get("chat_id"), params.get("text", ""))
+        return True
+
+
+def create_fake_api(state: FakeTelegram) -> FastAPI:
+    api = FastAPI()
+
+    @api.post("/bot{token}/{method}")
+    async def bot_method(token: str, method: str, request: Request):
+        if request.headers.get("content-type", "").startswith("application/json"):
+            params = await request.json()
+        else:
+            params = {}
+            for key, value in (await request.form()).items():
+                try:
+                    params[key] = json.loads(value)
+                except (TypeError, ValueError):
+                    params[key] = value
+        return {"ok": True, "result": await state.handle(method, params)}
+
+    return api
+
+
+def make_update(update_id: int, user_id: int) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": "Load", "username": f"load{user_id}"}
+    chat = {"id": user_id, "type": "private"}
+    if random.random() < 0.5:
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id, "date": int(time.time()), "chat": chat, "from": user,
+                "text": "/start", "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+            },
+        }
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id), "from": user, "chat_instance": str(user_id),
+            "data": random.choice(CALLBACKS),
+            "message": {"message_id": update_id, "date": int(time.time()), "chat": chat, "from": BOT_USER, "text": "menu"},
+        },
+    }
+
+
+async def replay(state: FakeTelegram, args) -> Counter:
+    """Отправляет апдейты пачками по --burst; каждый пользователь ждет ответа до следующего апдейта"""
+    statuses = Counter()
+    user_ids = [args.first_id + i for i in range(args.users)]
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret}
+    limits = httpx.Limits(max_connections=args.burst)
+    async with httpx.AsyncClient(base_url=args.target, timeout=30, limits=limits) as client:
+        async def send(update_id: int):
+            user_id = user_ids[update_id % len(user_ids)]
+            if user_id in state.sent_at:
+                statuses["skipped (reply pending)"] += 1
+                return
+            update = make_update(update_id, user_id)
+            state.sent_at[user_id] = time.perf_counter()
+            if args.mode == "polling":
+                await state.pending.put(update)
+                statuses["queued"] += 1
+                return
+            try:
+                response = await client.post(args.webhook_path, json=update, headers=headers)
+                statuses[response.status_code] += 1
+                if response.status_code != 200:
+                    state.sent_at.pop(user_id, None)
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                state.sent_at.pop(user_id, None)
+
+        for start in range(0, args.updates, args.burst):
+            await asyncio.gather(*(send(i) for i in range(start, min(start + args.burst, args.updates))))
+            await asyncio.sleep(args.pause)
+    return statuses
+
+
+async def main_async(args):
+    state = FakeTelegram()
+    server = uvicorn.Server(uvicorn.Config(create_fake_api(state), host="0.0.0.0", port=args.port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+
+    async def bot_connected():
+        if args.mode == "webhook":
+            await state.webhook_set.wait()
+        else:
+            while not state.calls["getUpdates"]:
+                await asyncio.sleep(0.1)
+
+    print(f"fake Bot API on :{args.port}, waiting for the bot ({args.mode})...")
+    waiter = asyncio.create_task(bot_connected())
+    await asyncio.wait({server_task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+    if server_task.done():
+        # Порт занят или сервер не поднялся — uvicorn уже вывел причину
+        waiter.cancel()
+        return
+
+    started = time.perf_counter()
+    statuses = await replay(state, args)
+    deadline = time.monotonic() + args.drain
+    while state.sent_at and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - started
+
+    print(f"updates sent: {dict(statuses)}")
+    print(f"bot calls: {dict(state.calls)}")
+    if state.latencies:
+        q = statistics.quantiles(state.latencies, n=100)
+        print(f"replies={len(state.latencies)} in {elapsed:.1f}s ({len(state.latencies) / elapsed:,.0f}/s) "
+              f"p50={q[49]:.1f}ms p95={q[94]:.1f}ms p99={q[98]:.1f}ms max={max(state.latencies):.1f}ms")
+    print(f"unanswered: {len(state.sent_at)}")
+
+    server.should_exit = True
+    await server_task
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["webhook", "polling"], default="webhook")
+    parser.add_argument("--port", type=int, default=8081, help="порт поддельного Bot API")
+    parser.add_argument("--target", default="http://localhost:8000", help="адрес игрового сервера (webhook)")
+    parser.add_argument("--webhook-path", default="/telegram/webhook")
+    parser.add_argument("--secret", default=os.getenv("BOT_WEBHOOK_SECRET", ""),
+                        help="секрет вебхука (по умолчанию выводится из BOT_TOKEN, как на сервере)")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--burst", type=int, default=200, help="апдейтов в одной пачке")
+    parser.add_argument("--pause", type=float, default=0.05, help="пауза между пачками, сек")
+    parser.add_argument("--drain", type=float, default=30.0, help="сколько ждать оставшиеся ответы, сек")
+    parser.add_argument("--first-id", type=int, default=800000000)
+    args = parser.parse_args()
+    if not args.secret:
+        from src.telegram_bot import BOT_WEBHOOK_SECRET
+        args.secret = BOT_WEBHOOK_SECRET
+    # Каждый запрос к вебхуку иначе попадает в лог
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Нагрузочный тест: задержка WebSocket при параллельных запросах баланса.
+
+Открывает --sockets соединений /ws/{player_id} и меряет время ответа на
+heartbeat "ping" -> "pong" в двух фазах: без нагрузки и под потоком
+запросов GET /api/wallet/balance (--balance-concurrency параллельно).
+Пока обработчики баланса не блокируют event loop, задержка WebSocket
+в обеих фазах должна совпадать.
+
+Запуск (сервер уже поднят с тем же BOT_TOKEN):
+    python benchmarks/load_balance_ws.py --url http://localhost:8000 --bot-token "$BOT_TOKEN"
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+import httpx
+import websockets
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.bench_telegram_auth import sign_init_data  # noqa: E402
+
+
+def forge_init_data(user_id: int, bot_token: str) -> str:
+    user = {"id": user_id, "first_name": "Load", "last_name": str(user_id), "username": f"load{user_id}"}
+    return sign_init_data({
+        "query_id": f"LOAD{user_id}",
+        "user": json.dumps(user, separators=(',', ':')),
+        "auth_date": str(int(time.time())),
+    }, bot_token)
+
+
+async def get_token(client: httpx.AsyncClient, init_data: str) -> str:
+    response = await client.post("/api/validate-init-data", json={"initData": init_data})
+    response.raise_for_status()
+    return response.json()["token"]
+
+
+async def ping_loop(ws_url: str, stop: asyncio.Event, samples: list, interval: float):
+    async with websockets.connect(ws_url) as ws:
+        while not stop.is_set():
+            started = time.perf_counter()
+            await ws.send("ping")
+            while await ws.recv() != "pong":
+                pass
+            samples.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(interval)
+
+
+async def balance_loop(client: httpx.AsyncClient, token: str, stop: asyncio.Event, counter: list):
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        await client.get("/api/wallet/balance", headers=headers)
+        counter[0] += 1
+
+
+def summarize(name: str, samples: list, duration: float, requests: int = 0):
+    if not samples:
+        print(f"{name:<12} no samples")
+        return
+    q = statistics.quantiles(samples, n=100)
+    line = f"{name:<12} n={len(samples):<7} p50={q[49]:7.2f}ms p95={q[94]:7.2f}ms p99={q[98]:7.2f}ms max={max(samples):7.2f}ms"
+    if requests:
+        line += f"  balance rps={requests / duration:,.0f}"
+    print(line)
+
+
+async def run_phase(args, tokens: list, with_balance: bool):
+    ws_base = args.url.replace("http", "ws", 1)
+    stop = asyncio.Event()
+    samples: list = []
+    counter = [0]
+    async with httpx.AsyncClient(base_url=args.url, timeout=30) as client:
+        tasks = [
+            asyncio.create_task(ping_loop(f"{ws_base}/ws/{player_id}?token={token}", stop, samples, args.interval))
+            for player_id, token in tokens
+        ]
+        if with_balance:
+            tasks += [
+                asyncio.create_task(balance_loop(client, tokens[i % len(tokens)][1], stop, counter))
+                for i in range(args.balance_concurrency)
+            ]
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return samples, counter[0]
+
+
+async def main_async(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=30) as client:
+        tokens = []
+        for i in range(args.sockets):
+            player_id = args.first_id + i
+            tokens.append((player_id, await get_token(client, forge_init_data(player_id, args.bot_token))))
+
+    idle, _ = await run_phase(args, tokens, with_balance=False)
+    loaded, requests = await run_phase(args, tokens, with_balance=True)
+    summarize("idle", idle, args.duration)
+    summarize("balance", loaded, args.duration, requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--bot-token", default=os.getenv("BOT_TOKEN", ""))
+    parser.add_argument("--sockets", type=int, default=50)
+    parser.add_argument("--balance-concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=15.0, help="длительность каждой фазы, сек")
+    parser.add_argument("--interval", type=float, default=0.2, help="пауза между ping одного сокета, сек")
+    parser.add_argument("--first-id", type=int, default=900000000)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
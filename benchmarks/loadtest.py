@@ -0,0 +1,320 @@
+"""
+Сквозной нагрузочный тест: симулированные клиенты Telegram играют партии.
+
+Каждый клиент подписывает initData ботовым токеном, получает токен сессии,
+открывает /ws/{player_id}, встает в очередь (find_game), делает начальную
+ставку и ходит по сценарию стратегии, пока стол не рассчитается; затем
+встает в очередь снова (--hands партий). Часть клиентов (--reconnect-rate)
+посреди партии рвет соединение и переподключается с last_seq.
+
+Замеры (мс):
+    join       — find_game -> game_created (включает ожидание тика подбора)
+    action     — ход игрока -> game_state стола с этим ходом
+    reconnect  — открытие нового соединения -> resume/game_state
+
+Отчет печатается таблицей и (--output) пишется в JSON вместе с коммитом и
+параметрами запуска; --compare сравнивает с отчетом прошлого запуска.
+
+Игроки с id от --first-id заводятся в БД напрямую (--database-url) с
+балансом --balance, чтобы бай-ины не кончались.
+
+Запуск (сервер поднят из корня репозитория с тем же BOT_TOKEN):
+    python benchmarks/loadtest.py --players 600 --hands 3 \\
+        --bot-token "$BOT_TOKEN" --output loadtest.json --compare loadtest.prev.json
+
+Эталонный отчет лежит в benchmarks/results/loadtest/<коммит>.json (240 клиентов,
+3 партии, --reconnect-rate 0.5 --ramp 3 --hand-timeout 30); его удобно
+передавать в --compare.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+import httpx
+import websockets
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.load_balance_ws import forge_init_data, get_token  # noqa: E402
+
+STRATEGIES = ("caller", "aggressive", "folder")
+METRICS = ("join", "action", "reconnect")
+
+
+class Stats:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.counters = Counter()
+
+    def observe(self, name: str, started: float):
+        self.samples[name].append((time.perf_counter() - started) * 1000)
+
+    def summary(self) -> dict:
+        result = {}
+        for name in METRICS:
+            samples = self.samples.get(name)
+            if not samples:
+                continue
+            q = statistics.quantiles(samples, n=100, method="inclusive") if len(samples) > 1 else [samples[0]] * 99
+            result[name] = {
+                "n": len(samples),
+                "p50": round(q[49], 2),
+                "p95": round(q[94], 2),
+                "p99": round(q[98], 2),
+                "max": round(max(samples), 2),
+            }
+        return result
+
+
+def choose_action(strategy: str, state: dict, me: str, rng: random.Random) -> dict:
+    """Ход по стратегии: caller уравнивает, aggressive повышает, folder часто сбрасывает"""
+    current_bet = state.get("current_bet", 0)
+    chips = state["players"][me].get("chips") or 0
+    # Ставка списывается целиком, поэтому уравнять — значит поставить current_bet фишек
+    needed = current_bet or 100
+    if needed > chips or (strategy == "folder" and rng.random() < 0.5):
+        return {"type": "game_action", "action": "fold"}
+    if strategy == "aggressive" and rng.random() < 0.5 and needed + 100 <= min(chips, 2000):
+        return {"type": "game_action", "action": "bet", "amount": needed + 100}
+    if current_bet == 0:
+        return {"type": "game_action", "action": "bet", "amount": needed}
+    return {"type": "game_action", "action": "call"}
+
+
+class SimulatedPlayer:
+    def __init__(self, player_id: int, token: str, strategy: str, args, stats: Stats):
+        self.player_id = str(player_id)
+        self.token = token
+        self.strategy = strategy
+        self.args = args
+        self.stats = stats
+        self.rng = random.Random(player_id)
+        self.ws = None
+        self.last_seq = None
+        self.game_id = None
+        self.pending_action = None  # время отправки хода, ждущего рассылки
+        self.sent_initial_bet = False
+
+    def _url(self) -> str:
+        url = f"{self.args.url.replace('http', 'ws', 1)}/ws/{self.player_id}?token={self.token}"
+        if self.last_seq is not None:
+            url += f"&last_seq={self.last_seq}"
+        return url
+
+    async def _send(self, message: dict):
+        await self.ws.send(json.dumps(message))
+
+    async def _recv(self, deadline: float) -> dict:
+        while True:
+            raw = await asyncio.wait_for(self.ws.recv(), timeout=max(deadline - time.monotonic(), 0.001))
+            if raw == "pong":
+                continue
+            message = json.loads(raw)
+            if "seq" in message:
+                self.last_seq = message["seq"]
+            return message
+
+    async def _reconnect(self, deadline: float) -> dict:
+        await self.ws.close()
+        self.stats.counters["reconnects"] += 1
+        started = time.perf_counter()
+        self.ws = await websockets.connect(self._url(), max_size=None)
+        while True:
+            message = await self._recv(deadline)
+            if message.get("type") in ("resume", "game_state"):
+                self.stats.observe("reconnect", started)
+                return message
+
+    async def _on_state(self, state: dict) -> bool:
+        """Реакция на состояние стола; True — партия закончена"""
+        if state.get("status") == "finished":
+            return True
+        if state.get("status") == "betting":
+            if not self.sent_initial_bet and self.player_id in state.get("players", {}):
+                self.sent_initial_bet = True
+                await self._send({"type": "game_action", "action": "bet", "amount": 100})
+            return False
+        if state.get("current_turn") == self.player_id and self.player_id not in state.get("folded_players", []):
+            if self.pending_action is None:
+                await asyncio.sleep(self.args.think)
+                self.pending_action = time.perf_counter()
+                await self._send(choose_action(self.strategy, state, self.player_id, self.rng))
+        return False
+
+    async def play_hand(self):
+        deadline = time.monotonic() + self.args.hand_timeout
+        self.game_id = None
+        self.pending_action = None
+        self.sent_initial_bet = False
+        reconnect = self.rng.random() < self.args.reconnect_rate
+
+        started = time.perf_counter()
+        await self._send({"type": "find_game"})
+        while True:
+            message = await self._recv(deadline)
+            if message.get("type") == "game_created":
+                self.stats.observe("join", started)
+                self.game_id = message["game_id"]
+                state = message["game_state"]
+                break
+            if message.get("type") == "error":
+                # Может быть запоздалым ответом на ход прошлой партии; стол ждем до дедлайна
+                self.stats.counters[f"error:{message['data'].get('message')}"] += 1
+
+        while not await self._on_state(state):
+            if reconnect and state.get("status") == "playing":
+                reconnect = False
+                self.pending_action = None
+                message = await self._reconnect(deadline)
+            else:
+                message = await self._recv(deadline)
+            kind = message.get("type")
+            if kind == "error":
+                self.stats.counters[f"error:{message['data'].get('message')}"] += 1
+                self.pending_action = None
+                continue
+            if kind == "resume":
+                states = [event["data"] for event in message["events"] if event.get("type") == "game_state"]
+                if not states:
+                    continue
+                state = states[-1]
+            elif kind == "game_state" and message.get("game_id") == self.game_id:
+                state = message["data"]
+                if self.pending_action is not None:
+                    self.stats.observe("action", self.pending_action)
+                    self.pending_action = None
+            else:
+                continue
+        self.stats.counters["hands"] += 1
+
+    async def run(self):
+        try:
+            self.ws = await websockets.connect(self._url(), max_size=None)
+            for _ in range(self.args.hands):
+                await self.play_hand()
+        except asyncio.TimeoutError:
+            # Без game_id клиент не дождался стола, иначе застрял посреди партии
+            self.stats.counters["timeouts:play" if self.game_id else "timeouts:join"] += 1
+        except websockets.ConnectionClosed:
+            self.stats.counters["disconnects"] += 1
+        except (websockets.WebSocketException, OSError):
+            self.stats.counters["connect_failed"] += 1
+        finally:
+            if self.ws is not None:
+                await self.ws.close()
+
+
+def seed_players(database_url: str, first_id: int, count: int, balance: int):
+    """Завести игроков нагрузочного теста в БД с балансом на все партии"""
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(database_url.replace("+asyncpg", ""))
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO players (telegram_id, first_name, last_name, username, balance) "
+            "SELECT g, 'Load', g::text, 'load' || g, :balance FROM generate_series(:first, :last) AS g "
+            "ON CONFLICT (telegram_id) DO UPDATE SET balance = GREATEST(players.balance, EXCLUDED.balance)"
+        ), {"balance": balance, "first": first_id, "last": first_id + count - 1})
+    engine.dispose()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def print_report(report: dict, previous: dict = None):
+    print(f"commit {report['commit'] or '?'}, {report['params']['players']} players, "
+          f"{report['duration']:.1f}s")
+    for name, row in report["latency_ms"].items():
+        line = f"{name:<10} n={row['n']:<7}" + "".join(
+            f" {key}={row[key]:9.2f}" for key in ("p50", "p95", "p99", "max")
+        )
+        old = (previous or {}).get("latency_ms", {}).get(name)
+        if old:
+            line += "   vs " + (previous.get("commit") or "prev") + ":" + "".join(
+                f" {key} {(row[key] - old[key]) / old[key] * 100 if old[key] else 0:+.0f}%" for key in ("p50", "p99")
+            )
+        print(line)
+    print("counters: " + ", ".join(f"{key}={value}" for key, value in sorted(report["counters"].items())))
+
+
+async def main_async(args):
+    if args.seed:
+        seed_players(args.database_url, args.first_id, args.players, args.balance)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=30) as client:
+        semaphore = asyncio.Semaphore(50)
+
+        async def login(player_id: int):
+            async with semaphore:
+                return player_id, await get_token(client, forge_init_data(player_id, args.bot_token))
+
+        tokens = await asyncio.gather(*(login(args.first_id + i) for i in range(args.players)))
+
+    stats = Stats()
+    players = [
+        SimulatedPlayer(player_id, token, STRATEGIES[i % len(STRATEGIES)], args, stats)
+        for i, (player_id, token) in enumerate(tokens)
+    ]
+    started = time.monotonic()
+    tasks = []
+    for player in players:
+        tasks.append(asyncio.create_task(player.run()))
+        await asyncio.sleep(args.ramp / max(args.players, 1))
+    await asyncio.gather(*tasks)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "duration": time.monotonic() - started,
+        "params": {key: getattr(args, key) for key in
+                   ("players", "hands", "reconnect_rate", "think", "ramp", "hand_timeout")},
+        "latency_ms": stats.summary(),
+        "counters": dict(stats.counters),
+    }
+    previous = None
+    if args.compare and os.path.exists(args.compare):
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+    print_report(report, previous)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--bot-token", default=os.getenv("BOT_TOKEN", ""))
+    parser.add_argument("--players", type=int, default=60, help="число клиентов (столы по 6)")
+    parser.add_argument("--hands", type=int, default=3, help="партий на клиента")
+    parser.add_argument("--reconnect-rate", type=float, default=0.1, help="доля партий с переподключением")
+    parser.add_argument("--think", type=float, default=0.05, help="пауза перед ходом, сек")
+    parser.add_argument("--ramp", type=float, default=5.0, help="за сколько секунд подключить всех, сек")
+    parser.add_argument("--hand-timeout", type=float, default=120.0, help="предел на одну партию, сек")
+    parser.add_argument("--first-id", type=int, default=910000000)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", ""))
+    parser.add_argument("--balance", type=int, default=10 ** 7)
+    parser.add_argument("--no-seed", dest="seed", action="store_false", help="не заводить игроков в БД")
+    parser.add_argument("--output", help="куда записать JSON-отчет")
+    parser.add_argument("--compare", help="JSON-отчет прошлого запуска для сравнения")
+    args = parser.parse_args()
+    if args.seed and not args.database_url:
+        from src.db import DATABASE_URL
+        args.database_url = DATABASE_URL
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,494 @@
+"""
+Набор микробенчмарков горячих путей с порогами регрессии.
+
+Покрывает движок (создание GameState и колоды, раздача, подсчет очков и
+вскрытие), сериализацию состояния (to_dict/from_dict и JSON), проверку
+initData и MatchMaker.find_match на очереди разного размера. Redis для
+подбора заменен хранилищем в памяти с теми же командами, поэтому замер
+показывает стоимость самого алгоритма, а не сети.
+
+Результат запуска сохраняется в --results-dir/<машина>/<коммит>.json.
+Абсолютные времена разных машин несравнимы, поэтому база ищется только
+среди результатов той же машины: ключ складывается из ОС, архитектуры,
+модели и числа процессоров и версии Python (или задается --machine /
+BENCH_MACHINE, например для CI-раннера). Каждый замер сравнивается с
+базовым (по умолчанию — самый свежий результат другого коммита на этой
+машине); замедление больше порога — регрессия, и скрипт завершается с
+кодом 1, так что запуск годится для проверки в CI. Берется лучшая из
+--repeat серий, а порог по умолчанию (25%) шире шума таких замеров на
+общих машинах; замер, превысивший порог, перемеряется еще --confirm раз,
+и регрессией считается, только если медленными оказались все попытки. Без базового результата сравнение пропускается с пометкой
+SKIP, а с --require-baseline скрипт завершается с кодом 2 — на новой
+машине базу сначала нужно записать обычным запуском.
+
+Запуск:
+    python benchmarks/microbench.py                    # все замеры, сравнение с прошлым коммитом
+    python benchmarks/microbench.py -k engine --no-save
+    python benchmarks/microbench.py --baseline 79500daf --threshold 0.3
+    BENCH_MACHINE=ci-runner python benchmarks/microbench.py --require-baseline
+"""
+import argparse
+import asyncio
+import fnmatch
+import glob
+import itertools
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+import timeit
+from bisect import bisect_left, bisect_right, insort
+from typing import Callable, Dict, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.bench_telegram_auth import BOT_TOKEN, make_init_data  # noqa: E402
+from src.game.engine import GameState  # noqa: E402
+from src.game.matchmaking import MatchMaker  # noqa: E402
+from src.utils.telegram_auth import TelegramAuthVerifier, verify_telegram_data  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_THRESHOLD = 0.25  # допустимое замедление относительно базы, доля
+DEFAULT_REPEAT = 7
+DEFAULT_CONFIRM = 2
+
+# Имя -> (фабрика, порог). Фабрика готовит данные и возвращает run(number) -> секунды на number вызовов
+BENCHMARKS: Dict[str, tuple] = {}
+
+
+def benchmark(name: str, threshold: Optional[float] = None):
+    def decorator(factory: Callable):
+        BENCHMARKS[name] = (factory, threshold)
+        return factory
+    return decorator
+
+
+def _timer(fn: Callable[[], object]) -> Callable[[int], float]:
+    return timeit.Timer(fn).timeit
+
+
+class InMemoryPipeline:
+    """Конвейер InMemoryRedis: команды копятся и выполняются по порядку в execute()"""
+
+    def __init__(self, redis: "InMemoryRedis"):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.commands.clear()
+
+    def __getattr__(self, name: str):
+        if not hasattr(self.redis, f"_{name}"):
+            raise AttributeError(name)
+
+        def queue(*args):
+            self.commands.append((name.upper(), args))
+            return self
+        return queue
+
+    async def execute(self):
+        commands, self.commands = self.commands, []
+        return [await self.redis.execute_command(name, *args) for name, args in commands]
+
+
+class InMemoryRedis:
+    """
+    Хранилище в памяти с командами redis.asyncio, которыми пользуется MatchMaker
+
+    Команды идут через execute_command, как в redis-py, поэтому
+    instrument_redis считает обращения так же, как с настоящим клиентом.
+    """
+
+    def __init__(self):
+        self.hashes: Dict[str, Dict] = {}
+        self.zsets: Dict[str, tuple] = {}  # key -> ({member: score}, отсортированный список (score, member))
+        self.counters: Dict[str, int] = {}
+
+    async def execute_command(self, name: str, *args):
+        return getattr(self, f"_{name.lower()}")(*args)
+
+    def pipeline(self, transaction: bool = True):
+        # Команды выполняются без ожиданий, поэтому конвейер и так атомарен
+        return InMemoryPipeline(self)
+
+    async def hget(self, key, field):
+        return await self.execute_command("HGET", key, field)
+
+    async def hset(self, key, field, value):
+        return await self.execute_command("HSET", key, field, value)
+
+    async def hdel(self, key, *fields):
+        return await self.execute_command("HDEL", key, *fields)
+
+    async def hgetall(self, key):
+        return await self.execute_command("HGETALL", key)
+
+    async def incr(self, key):
+        return await self.execute_command("INCR", key)
+
+    async def zadd(self, key, mapping: Dict):
+        return await self.execute_command("ZADD", key, mapping)
+
+    async def zrem(self, key, *members):
+        return await self.execute_command("ZREM", key, *members)
+
+    async def zrange(self, key, start, end):
+        return await self.execute_command("ZRANGE", key, start, end)
+
+    async def zrangebyscore(self, key, min_score, max_score):
+        return await self.execute_command("ZRANGEBYSCORE", key, min_score, max_score)
+
+    def _hget(self, key, field):
+        return self.hashes.get(key, {}).get(str(field))
+
+    def _hset(self, key, field, value):
+        values = self.hashes.setdefault(key, {})
+        added = str(field) not in values
+        values[str(field)] = value
+        return int(added)
+
+    def _hdel(self, key, *fields):
+        values = self.hashes.get(key, {})
+        return sum(values.pop(str(field), None) is not None for field in fields)
+
+    def _hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def _incr(self, key):
+        self.counters[key] = self.counters.get(key, 0) + 1
+        return self.counters[key]
+
+    def _zset(self, key):
+        return self.zsets.setdefault(key, ({}, []))
+
+    def _zadd(self, key, mapping):
+        scores, entries = self._zset(key)
+        added = 0
+        for member, score in mapping.items():
+            if self._zrem(key, member) == 0:
+                added += 1
+            scores[member] = score
+            insort(entries, (score, member))
+        return added
+
+    def _zrem(self, key, *members):
+        scores, entries = self._zset(key)
+        removed = 0
+        for member in members:
+            score = scores.pop(member, None)
+            if score is not None:
+                del entries[bisect_left(entries, (score, member))]
+                removed += 1
+        return removed
+
+    def _zrange(self, key, start, end):
+        _, entries = self._zset(key)
+        end = len(entries) if end == -1 else end + 1
+        return [member for _, member in entries[start:end]]
+
+    def _zrangebyscore(self, key, min_score, max_score):
+        _, entries = self._zset(key)
+        lo = bisect_left(entries, (min_score, ""))
+        hi = bisect_right(entries, (max_score, "\uffff"))
+        return [member for _, member in entries[lo:hi]]
+
+
+def _full_table() -> GameState:
+    game = GameState()
+    for i in range(6):
+        game.add_player(str(1000 + i), {"id": 1000 + i, "first_name": f"P{i}"}, chips=1000)
+    return game
+
+
+def _dealt_table() -> GameState:
+    game = _full_table()
+    for player_id in game.players:
+        game.place_initial_bet(player_id, 100)
+    return game
+
+
+# --- Движок ---
+
+@benchmark("engine.new_game_state")
+def bench_new_game_state():
+    return _timer(GameState)
+
+
+@benchmark("engine.reset")
+def bench_reset():
+    return _timer(_dealt_table().reset)
+
+
+@benchmark("engine.init_deck")
+def bench_init_deck():
+    return _timer(GameState()._init_deck)
+
+
+@benchmark("engine.deal_cards")
+def bench_deal_cards():
+    game = _full_table()
+
+    def deal():
+        for player in game.players.values():
+            player['cards'] = []
+        game.deal_cards()
+
+    return _timer(deal)
+
+
+@benchmark("engine.calculate_score")
+def bench_calculate_score():
+    game = _dealt_table()
+    hands = [player['cards'] for player in game.players.values()]
+
+    def score():
+        for cards in hands:
+            game.calculate_score(cards)
+
+    return _timer(score)
+
+
+@benchmark("engine.showdown")
+def bench_showdown():
+    game = _dealt_table()
+    snapshot = game.to_dict()
+    restored = GameState()
+
+    def run(number: int) -> float:
+        elapsed = 0.0
+        for _ in range(number):
+            restored.from_dict(snapshot)
+            started = time.perf_counter()
+            restored.showdown_or_svara()
+            elapsed += time.perf_counter() - started
+        return elapsed
+
+    return run
+
+
+# --- Сериализация ---
+
+@benchmark("state.to_dict")
+def bench_to_dict():
+    return _timer(_dealt_table().to_dict)
+
+
+@benchmark("state.from_dict")
+def bench_from_dict():
+    snapshot = _dealt_table().to_dict()
+    return _timer(lambda: GameState().from_dict(snapshot))
+
+
+@benchmark("state.json_roundtrip")
+def bench_json_roundtrip():
+    game = _dealt_table()
+
+    def roundtrip():
+        GameState().from_dict(json.loads(json.dumps(game.to_dict())))
+
+    return _timer(roundtrip)
+
+
+# --- Проверка initData ---
+
+@benchmark("auth.verify_telegram_data.cached")
+def bench_verify_cached():
+    init_data = make_init_data(100000)
+    verify_telegram_data(init_data, BOT_TOKEN)
+    return _timer(lambda: verify_telegram_data(init_data, BOT_TOKEN))
+
+
+@benchmark("auth.verify_telegram_data.cold")
+def bench_verify_cold():
+    verifier = TelegramAuthVerifier(BOT_TOKEN, cache_size=1)
+    payloads = itertools.cycle([make_init_data(100000 + i) for i in range(1000)])
+    return _timer(lambda: verifier.verify(next(payloads)))
+
+
+# --- Подбор игроков ---
+
+def _find_match_factory(queue_size: int):
+    def factory():
+        matchmaker = MatchMaker(InMemoryRedis())
+        # Старые заявки уже прождали queue_timeout; таймаут игрока отключен,
+        # чтобы очередь не пустела по ходу замера
+        matchmaker.player_timeout = 10 ** 9
+        joined_at = "2000-01-01T00:00:00"
+        entries = {
+            json.dumps({"id": str(200000 + i), "rating": 1000, "joined_at": joined_at}): 1000 + i % 50
+            for i in range(queue_size)
+        }
+        matchmaker.redis._zadd(matchmaker.queue_key, entries)
+
+        async def measure(number: int) -> float:
+            elapsed = 0.0
+            for _ in range(number):
+                started = time.perf_counter()
+                await matchmaker.find_match(1000)
+                elapsed += time.perf_counter() - started
+                # Возвращаем сыгранных в очередь, чтобы ее размер не менялся
+                scores, _ = matchmaker.redis._zset(matchmaker.queue_key)
+                matchmaker.redis._zadd(matchmaker.queue_key, {
+                    member: score for member, score in entries.items() if member not in scores
+                })
+            return elapsed
+
+        return lambda number: asyncio.run(measure(number))
+    return factory
+
+
+for _size in (10, 100, 1000):
+    benchmark(f"matchmaking.find_match[{_size}]", threshold=0.4)(_find_match_factory(_size))
+
+
+# --- Запуск и сравнение ---
+
+def measure(run: Callable[[int], float], repeat: int, min_time: float) -> Dict:
+    """Число вызовов подбирается так, чтобы серия шла не меньше min_time; берется лучшая из repeat серий"""
+    number = 1
+    while True:
+        elapsed = run(number)
+        if elapsed >= min_time or number >= 10 ** 7:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    best = min([elapsed] + [run(number) for _ in range(repeat - 1)])
+    return {"per_call": best / number, "number": number, "repeat": repeat}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def machine_id() -> str:
+    """Ключ машины, на которой результаты сравнимы между собой"""
+    cpu = platform.processor()
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            cpu = next((line.split(":", 1)[1] for line in f if line.startswith("model name")), cpu)
+    except OSError:
+        pass
+    parts = [platform.system(), platform.machine(), cpu, f"{os.cpu_count()}cpu",
+             f"py{sys.version_info.major}.{sys.version_info.minor}"]
+    key = re.sub(r"\((r|tm)\)", "", "-".join(parts).lower())
+    return re.sub(r"[^a-z0-9.]+", "-", key).strip("-")
+
+
+def load_baseline(results_dir: str, baseline: Optional[str], commit: str) -> Optional[Dict]:
+    """Базовый результат этой машины: файл, коммит или самый свежий результат другого коммита"""
+    if baseline:
+        path = baseline if os.path.exists(baseline) else os.path.join(results_dir, f"{baseline}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    candidates = []
+    for path in glob.glob(os.path.join(results_dir, "*.json")):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("commit") != commit:
+            candidates.append(data)
+    return max(candidates, key=lambda data: data.get("created_at", ""), default=None)
+
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.1f} ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", "--filter", default="*", help="glob-маска имен замеров (подстрока тоже подходит)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="серий на замер, берется лучшая")
+    parser.add_argument("--min-time", type=float, default=0.2, help="минимальная длительность серии, сек")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое замедление для замеров без своего порога")
+    parser.add_argument("--confirm", type=int, default=DEFAULT_CONFIRM,
+                        help="сколько раз перемерить замер, превысивший порог, прежде чем считать его регрессией")
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--machine", default=os.getenv("BENCH_MACHINE") or machine_id(),
+                        help="ключ машины: результаты и база хранятся в --results-dir/<machine>")
+    parser.add_argument("--baseline", help="коммит или путь к JSON-результату для сравнения")
+    parser.add_argument("--no-save", dest="save", action="store_false", help="не сохранять результат")
+    parser.add_argument("--require-baseline", action="store_true",
+                        help="без базового результата завершиться с кодом 2, а не пропускать сравнение")
+    args = parser.parse_args()
+
+    pattern = args.filter if any(ch in args.filter for ch in "*?[") else f"*{args.filter}*"
+    selected = {name: spec for name, spec in BENCHMARKS.items() if fnmatch.fnmatchcase(name, pattern)}
+    commit = git_commit()
+    results_dir = os.path.join(args.results_dir, args.machine)
+    baseline = load_baseline(results_dir, args.baseline, commit)
+    base_results = (baseline or {}).get("results", {})
+    print(f"machine: {args.machine}")
+    if baseline:
+        print(f"baseline: {baseline.get('commit')} ({baseline.get('created_at')})")
+    else:
+        wanted = args.baseline or f"another commit in {results_dir}"
+        if args.require_baseline:
+            print(f"error: no baseline result for {wanted}")
+            sys.exit(2)
+        print(f"SKIP regression check: no baseline result for {wanted}")
+
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<36} {'per call':>11} {'baseline':>11} {'change':>8}")
+    for name, (factory, threshold) in selected.items():
+        result = measure(factory(), args.repeat, args.min_time)
+        base = base_results.get(name)
+        limit = threshold if threshold is not None else args.threshold
+        for _ in range(args.confirm if base else 0):
+            if result["per_call"] <= base["per_call"] * (1 + limit):
+                break
+            # Медленная серия могла прийтись на шумную фазу машины: перемеряем и берем лучший результат
+            retry = measure(factory(), args.repeat, args.min_time)
+            if retry["per_call"] < result["per_call"]:
+                result = retry
+        results[name] = result
+        line = f"{name:<36} {_format_time(result['per_call']):>11}"
+        if base:
+            change = result["per_call"] / base["per_call"] - 1
+            line += f" {_format_time(base['per_call']):>11} {change:+7.1%}"
+            if change > limit:
+                regressions.append(name)
+                line += f"  REGRESSION (> {limit:.0%})"
+        elif baseline:
+            line += f" {'-':>11} {'new':>8}"
+        print(line)
+
+    if args.save:
+        os.makedirs(results_dir, exist_ok=True)
+        path = os.path.join(results_dir, f"{commit}.json")
+        saved = {}
+        if os.path.exists(path):
+            # Повторный запуск на том же коммите (например, с -k) дополняет результат
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f).get("results", {})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": commit,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": args.machine,
+                "results": {**saved, **results},
+            }, f, indent=2)
+        print(f"saved {path}")
+
+    if regressions:
+        print(f"regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
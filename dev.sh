@@ -55,8 +55,7 @@ pip install -r requirements.txt
 
 # Initialize database
 echo -e "${GREEN}Initializing database...${NC}"
-python3 db.py
-python3 create_table_in_db.py
+python3 init_db.py
 echo -e "${GREEN}Database initialized.${NC}"
 
 # Clear Redis cache
@@ -5,7 +5,8 @@ import logging
 # Добавляем корень проекта в PYTHONPATH, чтобы можно было импортировать из src
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
-from src.db import create_database, create_tables
+from src.db import create_database
+from migrations.apply_migrations import apply_migrations
 
 # Настройка логирования для скрипта
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,7 +15,8 @@ if __name__ == "__main__":
     logging.info("Starting database initialization...")
     try:
         create_database()
-        create_tables()
+        # Схема создается и обновляется только миграциями Alembic
+        apply_migrations()
         logging.info("Database initialization completed successfully.")
     except Exception as e:
         logging.error(f"An error occurred during database initialization: {e}", exc_info=True)
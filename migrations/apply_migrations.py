@@ -2,14 +2,21 @@ import os
 import sys
 import logging
 from pathlib import Path
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, inspect, text
 from alembic.config import Config
 from alembic import command
-from config import settings
+
+# Корень проекта в PYTHONPATH, чтобы скрипт запускался из любого каталога
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.db import DATABASE_URL  # noqa: E402
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+# Ревизия, соответствующая схеме, которую раньше создавал create_all
+BASELINE_REVISION = "0001"
+
 def get_migrations_path():
     """Получение пути к директории с миграциями"""
     return Path(__file__).parent
@@ -19,24 +26,19 @@ def get_alembic_config():
     migrations_path = get_migrations_path()
     alembic_cfg = Config()
     alembic_cfg.set_main_option("script_location", str(migrations_path))
-    alembic_cfg.set_main_option("sqlalchemy.url", settings.POSTGRES_URL)
+    # ConfigParser интерполирует "%", который может встретиться в пароле
+    alembic_cfg.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
     return alembic_cfg
 
-def check_migrations_table():
+def check_migrations_table(engine):
     """Проверка существования таблицы миграций"""
-    engine = create_engine(settings.POSTGRES_URL)
-    with engine.connect() as conn:
-        try:
-            conn.execute(text("SELECT * FROM alembic_version LIMIT 1"))
-            return True
-        except Exception:
-            return False
+    return inspect(engine).has_table("alembic_version")
 
 def apply_migrations():
     """Применение миграций"""
     try:
         # Проверяем подключение к базе данных
-        engine = create_engine(settings.POSTGRES_URL)
+        engine = create_engine(DATABASE_URL)
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
         logger.info("✅ Подключение к базе данных успешно")
@@ -44,16 +46,18 @@ def apply_migrations():
         # Получаем конфигурацию Alembic
         alembic_cfg = get_alembic_config()
 
-        # Проверяем существование таблицы миграций
-        if not check_migrations_table():
-            logger.info("Создаем таблицу миграций...")
-            command.stamp(alembic_cfg, "head")
+        # База, созданная до Alembic, помечается базовой ревизией;
+        # пустая база создается миграциями с нуля
+        if not check_migrations_table(engine) and inspect(engine).has_table("players"):
+            logger.info(f"Существующая схема без истории миграций, помечаем ревизией {BASELINE_REVISION}...")
+            command.stamp(alembic_cfg, BASELINE_REVISION)
 
         # Получаем текущую версию
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT version_num FROM alembic_version"))
-            current_version = result.scalar()
-            logger.info(f"Текущая версия базы данных: {current_version}")
+        if check_migrations_table(engine):
+            with engine.connect() as conn:
+                result = conn.execute(text("SELECT version_num FROM alembic_version"))
+                current_version = result.scalar()
+                logger.info(f"Текущая версия базы данных: {current_version}")
 
         # Применяем миграции
         logger.info("Применяем миграции...")
@@ -65,4 +69,5 @@ def apply_migrations():
         sys.exit(1)
 
 if __name__ == "__main__":
-    apply_migrations() 
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    apply_migrations()
@@ -0,0 +1,76 @@
+"""Базовая схема: игроки, игры и журнал транзакций
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+Соответствует моделям src/models.py до появления резервов. Базу, созданную
+раньше через create_all, достаточно пометить этой ревизией
+(apply_migrations.py делает это сам) и применить остальные.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'players',
+        sa.Column('id', sa.BigInteger(), primary_key=True),
+        sa.Column('telegram_id', sa.BigInteger(), nullable=False, unique=True),
+        sa.Column('first_name', sa.String(), nullable=False),
+        sa.Column('last_name', sa.String()),
+        sa.Column('username', sa.String()),
+        sa.Column('photo_url', sa.String()),
+        sa.Column('balance', sa.Integer(), nullable=False),
+        sa.Column('games_played', sa.Integer()),
+        sa.Column('wins', sa.Integer()),
+        sa.Column('loses', sa.Integer()),
+        sa.Column('current_streak', sa.Integer()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('last_activity', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        'games',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('deck', sa.JSON()),
+        sa.Column('table_cards', sa.JSON()),
+        sa.Column('pot', sa.Integer(), nullable=False),
+        sa.Column('svara_pot', sa.Integer()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime(timezone=True)),
+        sa.Column('finished_at', sa.DateTime(timezone=True)),
+    )
+    op.create_table(
+        'game_players',
+        sa.Column('game_id', sa.String(), sa.ForeignKey('games.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('player_id', sa.BigInteger(), sa.ForeignKey('players.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('cards', sa.JSON()),
+        sa.Column('bet', sa.Integer(), nullable=False),
+        sa.Column('folded', sa.Boolean(), nullable=False),
+        sa.Column('score', sa.Integer()),
+        sa.Column('position', sa.String(10)),
+        sa.Column('is_turn', sa.Boolean()),
+    )
+    op.create_table(
+        'transactions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('game_id', sa.String(), sa.ForeignKey('games.id', ondelete='SET NULL')),
+        sa.Column('player_id', sa.BigInteger(), sa.ForeignKey('players.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('amount', sa.Integer(), nullable=False),
+        sa.Column('action', sa.String(10), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table('transactions')
+    op.drop_table('game_players')
+    op.drop_table('games')
+    op.drop_table('players')
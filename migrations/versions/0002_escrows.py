@@ -0,0 +1,30 @@
+"""Резерв фишек из кошелька на время игры за столом (escrow)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'escrows',
+        sa.Column('game_id', sa.String(), primary_key=True),
+        sa.Column('player_id', sa.BigInteger(), sa.ForeignKey('players.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('amount', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.CheckConstraint('amount >= 0', name='escrows_amount_check'),
+    )
+    # Для поиска зависших резервов после сбоя
+    op.create_index('idx_escrows_created', 'escrows', ['created_at'])
+
+
+def downgrade():
+    op.drop_table('escrows')
@@ -0,0 +1,30 @@
+"""Индексы истории транзакций (keyset-пагинация по (created_at, id))
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY не блокирует вставки в журнал, но работает только вне транзакции
+    with op.get_context().autocommit_block():
+        # Покрывает WHERE player_id = ? ORDER BY created_at DESC, id DESC и условие курсора
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_transactions_player_created "
+                   "ON transactions (player_id, created_at DESC, id DESC)")
+        # Фильтр истории по игре
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_transactions_game ON transactions (game_id)")
+        # Одиночный индекс по player_id (из старых скриптов) — префикс составного
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_transactions_player")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_transactions_game")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_transactions_player_created")
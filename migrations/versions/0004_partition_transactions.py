@@ -0,0 +1,97 @@
+"""Помесячное секционирование transactions и дневные итоги архива
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+Дальнейшие секции создает и архивирует LedgerMaintenance (src/wallet/ledger.py).
+"""
+from alembic import op
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE transactions RENAME TO transactions_legacy")
+    op.execute("ALTER SEQUENCE transactions_id_seq RENAME TO transactions_legacy_id_seq")
+    op.execute("""
+        CREATE TABLE transactions (
+            id BIGSERIAL,
+            game_id VARCHAR REFERENCES games(id) ON DELETE SET NULL,
+            player_id BIGINT NOT NULL REFERENCES players(id) ON DELETE CASCADE,
+            amount INTEGER NOT NULL,
+            action VARCHAR(10) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            -- Ключ секционирования обязан входить в первичный ключ
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    # Строки месяцев без своей секции
+    op.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT")
+    # Секции для имеющихся данных и двух следующих месяцев
+    op.execute("""
+        DO $$
+        DECLARE
+            month_start TIMESTAMP WITH TIME ZONE;
+        BEGIN
+            month_start := date_trunc('month', COALESCE((SELECT min(created_at) FROM transactions_legacy), now()) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+            WHILE month_start <= date_trunc('month', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' + interval '2 months' LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                    'transactions_' || to_char(month_start AT TIME ZONE 'UTC', 'YYYY_MM'),
+                    month_start,
+                    month_start + interval '1 month'
+                );
+                month_start := month_start + interval '1 month';
+            END LOOP;
+        END $$
+    """)
+    op.execute("""
+        INSERT INTO transactions (id, game_id, player_id, amount, action, created_at)
+        SELECT id, game_id, player_id, amount, action, COALESCE(created_at, CURRENT_TIMESTAMP)
+        FROM transactions_legacy
+    """)
+    op.execute("SELECT setval('transactions_id_seq', COALESCE((SELECT max(id) FROM transactions), 0) + 1, false)")
+    op.execute("DROP TABLE transactions_legacy")
+
+    # Индексы строятся после загрузки; на родителе они создаются во всех секциях
+    op.execute("CREATE INDEX idx_transactions_player_created ON transactions (player_id, created_at DESC, id DESC)")
+    op.execute("CREATE INDEX idx_transactions_game ON transactions (game_id)")
+
+    op.execute("""
+        CREATE TABLE transaction_daily_summary (
+            player_id BIGINT NOT NULL REFERENCES players(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            action VARCHAR(10) NOT NULL,
+            amount BIGINT NOT NULL DEFAULT 0,
+            transactions_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (player_id, day, action)
+        )
+    """)
+
+
+def downgrade():
+    op.execute("DROP TABLE transaction_daily_summary")
+    op.execute("ALTER TABLE transactions RENAME TO transactions_partitioned")
+    op.execute("ALTER SEQUENCE transactions_id_seq RENAME TO transactions_partitioned_id_seq")
+    op.execute("""
+        CREATE TABLE transactions (
+            id SERIAL PRIMARY KEY,
+            game_id VARCHAR REFERENCES games(id) ON DELETE SET NULL,
+            player_id BIGINT NOT NULL REFERENCES players(id) ON DELETE CASCADE,
+            amount INTEGER NOT NULL,
+            action VARCHAR(10) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    op.execute("""
+        INSERT INTO transactions (id, game_id, player_id, amount, action, created_at)
+        SELECT id, game_id, player_id, amount, action, created_at FROM transactions_partitioned
+    """)
+    op.execute("SELECT setval('transactions_id_seq', COALESCE((SELECT max(id) FROM transactions), 0) + 1, false)")
+    op.execute("DROP TABLE transactions_partitioned")
+    op.execute("CREATE INDEX idx_transactions_player_created ON transactions (player_id, created_at DESC, id DESC)")
+    op.execute("CREATE INDEX idx_transactions_game ON transactions (game_id)")
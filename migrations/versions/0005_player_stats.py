@@ -0,0 +1,36 @@
+"""Агрегированная статистика игроков (обновляется при расчете игры, см. src/stats)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+Начальное заполнение из журнала: python rebuild_stats.py
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'player_stats',
+        sa.Column('player_id', sa.BigInteger(), sa.ForeignKey('players.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('games_played', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('wins', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('losses', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('current_streak', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('net_profit', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('svara_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    # Лидерборды
+    op.create_index('idx_player_stats_net_profit', 'player_stats', [sa.text('net_profit DESC'), 'player_id'])
+    op.create_index('idx_player_stats_wins', 'player_stats', [sa.text('wins DESC'), 'player_id'])
+
+
+def downgrade():
+    op.drop_table('player_stats')
@@ -0,0 +1,29 @@
+"""Индексы горячих запросов, не покрытые ключами
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+players.telegram_id уже индексирован ограничением UNIQUE, а
+transactions(player_id, created_at) — индексом из ревизии 0003.
+Первичный ключ game_players начинается с game_id и не помогает
+поиску игр игрока. Проверка планов: python -m pytest tests/test_query_plans.py
+"""
+from alembic import op
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_game_players_player ON game_players (player_id)")
+        # Дубликат индекса UNIQUE из старого create_table_in_db.py
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_players_telegram")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_game_players_player")
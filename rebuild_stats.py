@@ -0,0 +1,26 @@
+import os
+import sys
+import asyncio
+import logging
+
+# Добавляем корень проекта в PYTHONPATH, чтобы можно было импортировать из src
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.db import AsyncSessionLocal, async_engine
+from src.stats import StatsManager
+
+# Настройка логирования для скрипта
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+async def rebuild():
+    """Полный пересчет player_stats из журнала транзакций"""
+    async with AsyncSessionLocal() as db:
+        count = await StatsManager(db).rebuild()
+    await async_engine.dispose()
+    return count
+
+
+if __name__ == "__main__":
+    logging.info("Rebuilding player stats from the ledger...")
+    asyncio.run(rebuild())
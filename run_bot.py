@@ -1,8 +1,37 @@
-from src.telegram_bot import create_bot_app
+import argparse
+import os
+
+import redis.asyncio as redis
+
+from src.config import settings
+from src.stats.leaderboard import Leaderboard
+from src.wallet.cache import BalanceCache
+from src.telegram_bot import (
+    create_bot_app, webhook_url, BOT_WEBHOOK_PATH, BOT_WEBHOOK_SECRET, BOT_MAX_CONCURRENT_UPDATES
+)
 
 def main():
-    app = create_bot_app()
-    app.run_polling()
+    # Отдельный процесс бота; игровой сервер при этом запускается с BOT_MODE=off
+    parser = argparse.ArgumentParser(description="Seka Telegram bot worker")
+    parser.add_argument("--mode", choices=["polling", "webhook"], default="polling")
+    args = parser.parse_args()
+    bot_webhook_url = webhook_url() if args.mode == "webhook" else None
+
+    # Тот же кэш балансов и лидерборд, что у игрового сервера: один Redis
+    redis_master = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, decode_responses=True)
+    app = create_bot_app(balance_cache=BalanceCache(redis_master), leaderboard=Leaderboard(redis_master))
+    if args.mode == "webhook":
+        # Собственный HTTP-сервер вебхука (нужен python-telegram-bot[webhooks])
+        app.run_webhook(
+            listen="0.0.0.0",
+            port=int(os.getenv("BOT_WEBHOOK_PORT", "8443")),
+            url_path=BOT_WEBHOOK_PATH.lstrip("/"),
+            webhook_url=bot_webhook_url,
+            secret_token=BOT_WEBHOOK_SECRET,
+            max_connections=BOT_MAX_CONCURRENT_UPDATES,
+        )
+    else:
+        app.run_polling()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,59 @@
+"""
+Массовая самоигра на движке GameState без Redis, сокетов и логов.
+
+Прогоняет --hands полных партий (со ставками и сварами) на пуле процессов,
+печатает сводную статистику и пишет столбцы по партиям в компактный
+файл (src.game.simulation.read_columns читает его обратно).
+
+Запуск:
+    python simulate.py --hands 1000000 --min-bet 100 --max-bet 2000 \\
+        --policies caller,aggressive,folder,scorer,caller,aggressive --output sim.col
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# Добавляем корень проекта в PYTHONPATH, чтобы можно было импортировать из src
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from src.game.simulation import SimulationConfig, config_meta, simulate, summarize, write_columns
+
+
+def main():
+    defaults = SimulationConfig()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hands", type=int, default=defaults.hands)
+    parser.add_argument("--policies", default=",".join(defaults.policies),
+                        help="6 политик через запятую: имена из POLICIES или module:function")
+    parser.add_argument("--min-bet", type=int, default=defaults.min_bet)
+    parser.add_argument("--max-bet", type=int, default=defaults.max_bet)
+    parser.add_argument("--buy-in", type=int, default=defaults.buy_in)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--workers", type=int, default=0, help="процессов пула (0 — по числу ядер)")
+    parser.add_argument("--chunk-size", type=int, default=20000, help="партий на одну задачу пула")
+    parser.add_argument("--output", help="файл для столбцов по партиям")
+    args = parser.parse_args()
+
+    config = SimulationConfig(
+        hands=args.hands,
+        policies=[name.strip() for name in args.policies.split(",")],
+        min_bet=args.min_bet,
+        max_bet=args.max_bet,
+        buy_in=args.buy_in,
+        seed=args.seed,
+    )
+    started = time.perf_counter()
+    columns = simulate(config, workers=args.workers or None, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - started
+
+    summary = summarize(columns, config)
+    summary["hands_per_second"] = round(config.hands / elapsed) if elapsed else None
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.output:
+        write_columns(args.output, columns, {**config_meta(config), "summary": summary})
+
+
+if __name__ == "__main__":
+    main()
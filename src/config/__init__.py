@@ -0,0 +1,161 @@
+from typing import List, Optional
+import os
+import hashlib
+import hmac
+from pydantic import BaseModel, validator
+from dotenv import load_dotenv
+import logging
+from ..utils.log import configure_logging, parse_logger_rates
+
+# Загружаем переменные окружения вручную
+load_dotenv()
+
+class Settings(BaseModel):
+    BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
+    WEB_APP_URL: str = os.getenv("WEB_APP_URL", "")
+    POSTGRES_DB: str = os.getenv("POSTGRES_DB", "postgres")
+    POSTGRES_USER: str = os.getenv("POSTGRES_USER", "postgres")
+    POSTGRES_PASSWORD: str = os.getenv("POSTGRES_PASSWORD", "")
+    POSTGRES_HOST: str = os.getenv("POSTGRES_HOST", "localhost")
+    POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
+    # Пул асинхронных соединений с базой
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "5"))  # ожидание свободного соединения, сек
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # пересоздание соединения, сек
+    REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
+    REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
+    AVATAR_CACHE_DIR: str = os.getenv("AVATAR_CACHE_DIR", "static/avatars")
+    DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
+    INIT_DATA_MAX_AGE: int = int(os.getenv("INIT_DATA_MAX_AGE", "86400"))  # Срок годности initData, сек
+    SESSION_SECRET: str = os.getenv("SESSION_SECRET", "")
+    SESSION_TTL: int = int(os.getenv("SESSION_TTL", "900"))  # Время жизни сессионного токена, сек
+    # Ограничения WebSocket-соединений
+    WS_MAX_MESSAGE_SIZE: int = int(os.getenv("WS_MAX_MESSAGE_SIZE", "4096"))  # байт
+    WS_RATE_LIMIT: float = float(os.getenv("WS_RATE_LIMIT", "10"))  # сообщений в секунду на соединение
+    WS_RATE_BURST: float = float(os.getenv("WS_RATE_BURST", "20"))
+    TABLE_RATE_LIMIT: float = float(os.getenv("TABLE_RATE_LIMIT", "30"))  # сообщений в секунду на стол
+    TABLE_RATE_BURST: float = float(os.getenv("TABLE_RATE_BURST", "60"))
+    WS_MAX_VIOLATIONS: int = int(os.getenv("WS_MAX_VIOLATIONS", "50"))  # всплеск отброшенных сообщений до разрыва
+    MAX_CONNECTIONS: int = int(os.getenv("MAX_CONNECTIONS", "1000"))
+    MAX_LOOP_LAG: float = float(os.getenv("MAX_LOOP_LAG", "0.5"))  # сек, выше — новые сокеты не принимаем
+    # Секционирование журнала транзакций
+    LEDGER_RETENTION_MONTHS: int = int(os.getenv("LEDGER_RETENTION_MONTHS", "12"))  # старше — в дневные итоги
+    LEDGER_PREMAKE_MONTHS: int = int(os.getenv("LEDGER_PREMAKE_MONTHS", "2"))  # секции создаются заранее
+    # Трассировка: доля входящих сообщений, для которых пишется трейс (0 — выключена)
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+    TRACE_FILE: str = os.getenv("TRACE_FILE", "logs/traces.jsonl")  # OTLP/JSON, по строке на трейс
+    # Сторож event loop: блокировка дольше порога (сек) пишется в лог со стеком; 0 — выключен
+    LOOP_STALL_THRESHOLD: float = float(os.getenv("LOOP_STALL_THRESHOLD", "0"))
+    ADMIN_IDS: List[int] = []
+
+    @validator('ADMIN_IDS', pre=True)
+    def parse_admin_ids(cls, v):
+        if v is None:
+            return []
+        if isinstance(v, str):
+            v = v.strip().replace('"', '').replace("'", "")
+            if not v:
+                return []
+            return [int(x.strip()) for x in v.split(',') if x.strip().isdigit()]
+        if isinstance(v, list):
+            return [int(x) for x in v if isinstance(x, int) or (isinstance(x, str) and x.isdigit())]
+        return []
+
+    class Config:
+        extra = "ignore"
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        # Создаем директорию для аватаров при инициализации
+        os.makedirs(self.AVATAR_CACHE_DIR, exist_ok=True)
+
+    @property
+    def POSTGRES_URL(self):
+        return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+
+    @property
+    def SESSION_SIGNING_KEY(self):
+        # Без явного SESSION_SECRET ключ выводится из токена бота
+        if self.SESSION_SECRET:
+            return self.SESSION_SECRET
+        return hmac.new(b"SekaSession", self.BOT_TOKEN.encode(), hashlib.sha256).hexdigest()
+
+    @property
+    def REDIS_URL(self):
+        return f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}/0"
+
+# Создаем экземпляр настроек
+def get_settings():
+    raw_admin_ids = os.getenv("ADMIN_IDS", "")
+    return Settings(ADMIN_IDS=raw_admin_ids)
+
+settings = get_settings()
+
+# Настройки логирования
+LOGGING_CONFIG = {
+    'level': os.getenv('LOG_LEVEL', 'INFO'),
+    'log_file': os.getenv('LOG_FILE', 'logs/app.log'),
+    'json_format': os.getenv('LOG_FORMAT', 'text').lower() == 'json',
+    # Доля сохраняемых записей по логгерам: "seka_game=0.1,src.game.engine=0.5"
+    'sampling': parse_logger_rates(os.getenv('LOG_SAMPLING', '')),
+    # Не больше N записей в секунду по логгерам: "seka_game=50"
+    'rate_limits': parse_logger_rates(os.getenv('LOG_RATE_LIMITS', '')),
+    # Включенные отладочные каналы seka.debug: "engine,ws" или "*"
+    'debug_channels': os.getenv('LOG_DEBUG_CHANNELS', ''),
+}
+
+def setup_logging():
+    """Настройка унифицированного логирования: запись в отдельном потоке через очередь"""
+    configure_logging(**LOGGING_CONFIG)
+
+    # Отключаем логирование от сторонних библиотек
+    logging.getLogger('urllib3').setLevel(logging.WARNING)
+    logging.getLogger('asyncio').setLevel(logging.WARNING)
+    logging.getLogger('websockets').setLevel(logging.WARNING)
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+# Инициализируем логирование при импорте модуля
+setup_logging()
+
+# Создаем логгер для этого модуля
+logger = logging.getLogger(__name__)
+
+# Redis конфигурация
+# Вместо текущего REDIS_CONFIG добавьте:
+REDIS_CONFIG = {
+    'master': {
+        'host': os.getenv('REDIS_HOST', 'localhost'),
+        'port': int(os.getenv('REDIS_PORT', 6379)),
+        'db': 0,
+        'decode_responses': True
+    },
+    'slave': {
+        'host': os.getenv('REDIS_SLAVE_HOST', os.getenv('REDIS_HOST', 'localhost')),
+        'port': int(os.getenv('REDIS_SLAVE_PORT', os.getenv('REDIS_PORT', 6379))),
+        'db': 0,
+        'decode_responses': True
+    }
+}
+
+# Настройки игры
+GAME_CONFIG = {
+    'min_players': 6,
+    'max_players': 6,
+    'min_bet': 100,
+    'max_bet': 2000,
+    'initial_balance': 1000,
+    'buy_in': 1000,  # Фишки, резервируемые из кошелька при входе за стол
+    'game_timeout': 300,  # 5 минут на игру
+    'player_timeout': 30,  # 30 секунд на ход
+    'queue_timeout': 300,  # 5 минут в очереди ожидания
+}
+
+# Настройки сервера
+SERVER_CONFIG = {
+    'host': os.getenv('SERVER_HOST', '0.0.0.0'),
+    'port': int(os.getenv('SERVER_PORT', 8080)),
+    'workers': int(os.getenv('WORKERS', 4)),
+    'max_connections': int(os.getenv('MAX_CONNECTIONS', 1000)),
+}
+
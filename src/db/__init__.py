@@ -3,8 +3,11 @@ import os
 import sys
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.exc import OperationalError
 from dotenv import load_dotenv
+from src.config import settings
+from src.utils.tracing import instrument_sqlalchemy
 
 # Загружаем переменные окружения
 load_dotenv()
@@ -20,20 +23,41 @@ DB_PORT = os.getenv("POSTGRES_PORT")
 DB_NAME = os.getenv("POSTGRES_DB")
 
 DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 ROOT_DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/postgres"
 
 # --- Инициализация SQLAlchemy ---
+# Синхронный движок используется только миграциями и скриптами инициализации
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Асинхронный движок (asyncpg) для API, кошелька и бота — не блокирует event loop
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+# SQL-запросы попадают в трейс текущего запроса как дочерние span'ы
+instrument_sqlalchemy(async_engine.sync_engine)
+
 def get_session():
+    """Синхронная сессия (только для миграций и служебных скриптов)"""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_session():
+    """Асинхронная сессия для FastAPI-зависимостей"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def create_database():
     """Создает базу данных, если она не существует."""
     try:
@@ -53,14 +77,3 @@ def create_database():
     except Exception as e:
         logger.error(f"Произошла ошибка при создании базы данных: {e}")
         sys.exit(1)
-
-def create_tables():
-    """Создает все таблицы, определенные в Base."""
-    try:
-        # Импортируем модели здесь, чтобы они были зарегистрированы в Base
-        from src import models
-        Base.metadata.create_all(bind=engine)
-        logger.info("Таблицы успешно созданы/проверены.")
-    except Exception as e:
-        logger.error(f"Произошла ошибка при создании таблиц: {e}")
-        sys.exit(1)
\ No newline at end of file
@@ -3,8 +3,20 @@ from typing import Dict, List, Optional
 from dataclasses import dataclass
 from enum import Enum
 import logging
+from ..utils.log import debug_channel
+from ..utils.metrics import Counter, Histogram, timed
+from ..utils.tracing import traced
 
 logger = logging.getLogger(__name__)
+# Покарточные и покадровые подробности; выключены, пока не включен канал engine
+trace = debug_channel('engine')
+
+ACTION_SECONDS = Histogram(
+    "seka_engine_action_seconds", "Время выполнения переходов GameState", ["action"]
+)
+POOL_ACQUIRES = Counter(
+    "seka_game_state_pool_acquires_total", "Выдачи GameState из пула", ["result"]
+)
 
 class Suit(Enum):
     HEARTS = "♥"
@@ -31,9 +43,23 @@ class Card:
             return f"9{self.suit.value}*"  # Звездочка обозначает джокер
         return f"{self.rank.value}{self.suit.value}"
 
+    @classmethod
+    def from_str(cls, value: str) -> 'Card':
+        """Обратное преобразование строки вида '10♥' или '9♣*' (формат to_dict)"""
+        is_joker = value.endswith('*')
+        if is_joker:
+            value = value[:-1]
+        return cls(rank=Rank(value[:-1]), suit=Suit(value[-1]), is_joker=is_joker)
+
+# Колода из 21 карты: 10, J, Q, K, A каждой масти и 9♣ (джокер). Карты не изменяются,
+# поэтому колоды всех столов собираются из одних и тех же объектов
+FULL_DECK = tuple(
+    [Card(rank, suit) for suit in Suit for rank in (Rank.TEN, Rank.JACK, Rank.QUEEN, Rank.KING, Rank.ACE)]
+    + [Card(Rank.NINE, Suit.CLUBS, is_joker=True)]
+)
+
 class GameState:
     def __init__(self):
-        logger.info("Initializing new game state")
         self.players: Dict[str, Dict] = {}
         self.bank: int = 0
         self.current_bet: int = 0
@@ -47,26 +73,46 @@ class GameState:
         self.ready_players: set = set()  # Игроки, готовые к игре (сделавшие ставки)
         self.min_bet: int = 100
         self.max_bet: int = 2000
-        self._init_deck()
-        logger.info("Game state initialized")
+        self.created_at: Optional[str] = None  # ISO-время создания стола, ставит тот, кто собирает стол
+        self._pooled: bool = False  # объект лежит в GameStatePool
+
+    def reset(self):
+        """
+        Возврат в состояние нового стола без создания объекта
+
+        Сбрасывает все поля, объявленные в __init__ (кроме отметки пула).
+        Контейнеры очищаются на месте. Колода собирается только при раздаче.
+        """
+        self.players.clear()
+        self.bank = 0
+        self.current_bet = 0
+        self.current_turn = None
+        self.folded_players.clear()
+        self.deck = []
+        self.status = 'matchmaking'
+        self.round = 'waiting'
+        self.svara_players.clear()
+        self.ready_players.clear()
+        self.min_bet = 100
+        self.max_bet = 2000
+        self.created_at = None
     
     def _init_deck(self):
-        """Инициализация колоды из 21 карты"""
-        logger.info("Initializing deck")
-        self.deck = []
-        # Только 10, J, Q, K, A (по 4 каждой масти) и одна 9♣ (джокер)
-        for suit in Suit:
-            for rank in [Rank.TEN, Rank.JACK, Rank.QUEEN, Rank.KING, Rank.ACE]:
-                for _ in range(4):
-                    self.deck.append(Card(rank, suit))
-            if suit == Suit.CLUBS:
-                self.deck.append(Card(Rank.NINE, suit, is_joker=True))
+        """Свежая перетасованная колода из 21 карты"""
+        self.deck = list(FULL_DECK)
         random.shuffle(self.deck)
-        logger.info(f"Deck initialized with {len(self.deck)} cards")
+        trace.debug("Deck initialized with %d cards", len(self.deck))
     
-    def add_player(self, player_id: str, user_info: dict = None) -> bool:
-        """Добавление игрока в игру с данными Telegram"""
-        logger.info(f"Attempting to add player {player_id}")
+    @timed(ACTION_SECONDS, "add_player")
+    @traced("engine.add_player")
+    def add_player(self, player_id: str, user_info: dict = None, chips: Optional[int] = None) -> bool:
+        """
+        Добавление игрока в игру с данными Telegram
+
+        chips — фишки, зарезервированные из кошелька при входе за стол (escrow).
+        Ставки двигают только их, без обращений к БД. None — без ограничения.
+        """
+        trace.debug("Attempting to add player %s", player_id)
         if len(self.players) >= 6:
             logger.warning(f"Cannot add player {player_id}: game is full")
             return False
@@ -76,7 +122,8 @@ class GameState:
             'bet': 0,
             'total_bet': 0,
             'user_info': user_info or {},
-            'status': 'waiting'  # waiting, ready, playing
+            'status': 'waiting',  # waiting, ready, playing
+            'chips': chips
         }
         
         if len(self.players) == 6:
@@ -92,19 +139,28 @@ class GameState:
         self.round = 'waiting'
         logger.info("Betting phase started")
 
+    @timed(ACTION_SECONDS, "place_initial_bet")
+    @traced("engine.place_initial_bet")
     def place_initial_bet(self, player_id: str, amount: int) -> bool:
         """Размещение начальной ставки"""
-        logger.info(f"Player {player_id} attempting to place initial bet of {amount}")
+        trace.debug("Player %s attempting to place initial bet of %s", player_id, amount)
         
         if player_id not in self.players:
             logger.warning(f"Cannot place bet: player {player_id} not in game")
             return False
+
+        if self.status != 'betting' or player_id in self.ready_players:
+            logger.warning(f"Cannot place initial bet: player {player_id} already bet or betting is over")
+            return False
             
         if amount < self.min_bet or amount > self.max_bet:
             logger.warning(f"Invalid bet amount: {amount}")
             return False
             
         player = self.players[player_id]
+        if not self._take_chips(player, amount):
+            logger.warning(f"Cannot place bet: player {player_id} has not enough chips")
+            return False
         player['bet'] = amount
         player['total_bet'] = amount
         player['status'] = 'ready'
@@ -114,9 +170,11 @@ class GameState:
         if len(self.ready_players) == len(self.players):
             self.start_game()
             
-        logger.info(f"Initial bet placed successfully by player {player_id}")
+        trace.debug("Initial bet placed successfully by player %s", player_id)
         return True
 
+    @timed(ACTION_SECONDS, "start_game")
+    @traced("engine.start_game")
     def start_game(self):
         """Начало игры после получения всех ставок"""
         if len(self.ready_players) != len(self.players):
@@ -141,25 +199,30 @@ class GameState:
         return True
     
     def deal_cards(self):
-        """Раздача карт игрокам"""
-        logger.info("Starting card dealing")
+        """Раздача карт игрокам из новой колоды"""
+        trace.debug("Starting card dealing")
         if len(self.players) != 6:  # Изменено с 2 на 6
             logger.warning(f"Cannot deal cards: wrong number of players ({len(self.players)})")
             return False
+        self._init_deck()
         
         # Раздаем по 3 карты каждому игроку
+        tracing = trace.isEnabledFor(logging.DEBUG)
         for _ in range(3):
             for player_id in self.players:
                 if self.deck:
                     card = self.deck.pop()
                     self.players[player_id]['cards'].append(card)
-                    logger.info(f"Dealt card {card} to player {player_id}")
-        logger.info("Card dealing completed")
+                    if tracing:
+                        trace.debug("Dealt card %s to player %s", card, player_id)
+        trace.debug("Card dealing completed")
         return True
     
+    @timed(ACTION_SECONDS, "place_bet")
+    @traced("engine.place_bet")
     def place_bet(self, player_id: str, amount: int) -> bool:
         """Размещение ставки"""
-        logger.info(f"Player {player_id} attempting to place bet of {amount}")
+        trace.debug("Player %s attempting to place bet of %s", player_id, amount)
         if player_id not in self.players or player_id in self.folded_players:
             logger.warning(f"Cannot place bet: player {player_id} not in game or folded")
             return False
@@ -169,11 +232,14 @@ class GameState:
             return False
         
         player = self.players[player_id]
+        if not self._take_chips(player, amount):
+            logger.warning(f"Cannot place bet: player {player_id} has not enough chips")
+            return False
         player['bet'] = amount
         player['total_bet'] += amount
         self.bank += amount
         self.current_bet = amount
-        logger.info(f"Bet placed successfully. Bank: {self.bank}, Current bet: {self.current_bet}")
+        trace.debug("Bet placed successfully. Bank: %s, Current bet: %s", self.bank, self.current_bet)
         
         # Находим следующего активного игрока
         active_players = [pid for pid in self.players if pid not in self.folded_players]
@@ -184,7 +250,7 @@ class GameState:
         current_index = active_players.index(player_id)
         next_index = (current_index + 1) % len(active_players)
         self.current_turn = active_players[next_index]
-        logger.info(f"Next turn: player {self.current_turn}")
+        trace.debug("Next turn: player %s", self.current_turn)
         
         # Проверяем, все ли активные игроки сделали равные ставки
         bets = [self.players[pid]['bet'] for pid in active_players]
@@ -194,6 +260,8 @@ class GameState:
         
         return True
     
+    @timed(ACTION_SECONDS, "fold")
+    @traced("engine.fold")
     def fold(self, player_id: str) -> bool:
         """Игрок сбрасывает карты"""
         if player_id not in self.players or player_id in self.folded_players:
@@ -205,13 +273,18 @@ class GameState:
         active_players = [pid for pid in self.players if pid not in self.folded_players]
         if len(active_players) == 1:
             self.current_turn = active_players[0]
+            if self.status in ('playing', 'svara'):
+                # Остальные сбросили карты — банк забирает оставшийся игрок
+                self.status = 'finished'
+                self.award_bank(active_players[0])
             return True
             
         # Если текущий ход был у сбросившего карты, передаем ход следующему
         if self.current_turn == player_id:
-            current_index = active_players.index(player_id)
-            next_index = (current_index + 1) % len(active_players)
-            self.current_turn = active_players[next_index]
+            # Порядок до сброса: сбросивший еще в нем, ход переходит к следующему за ним
+            order = [pid for pid in self.players if pid not in self.folded_players or pid == player_id]
+            next_index = (order.index(player_id) + 1) % len(order)
+            self.current_turn = order[next_index]
         
         return True
     
@@ -256,7 +329,6 @@ class GameState:
         self.folded_players = set(pid for pid in self.players if pid not in self.svara_players)
         self.status = 'svara'
         self.round = 'dealing'
-        self._init_deck()
         for pid in self.players:
             self.players[pid]['cards'] = []
             self.players[pid]['bet'] = 0
@@ -267,6 +339,8 @@ class GameState:
         self.current_bet = 0
         logger.info(f"Svara started for players: {self.svara_players}")
 
+    @timed(ACTION_SECONDS, "showdown_or_svara")
+    @traced("engine.showdown_or_svara")
     def showdown_or_svara(self):
         """Проводит вскрытие и определяет победителя или запускает свару"""
         scores = {
@@ -280,12 +354,41 @@ class GameState:
         winners = [pid for pid, score in scores.items() if score == max_score]
         if len(winners) == 1:
             self.status = 'finished'
+            self.award_bank(winners[0])
             return winners[0]
         else:
             # Запускаем свару между winners
             self.start_svara(winners)
             return None
 
+    @staticmethod
+    def _take_chips(player: dict, amount: int) -> bool:
+        """Списывает фишки игрока под ставку (если стол работает с резервом из кошелька)"""
+        chips = player.get('chips')
+        if chips is None:
+            return True
+        if amount > chips:
+            return False
+        player['chips'] = chips - amount
+        return True
+
+    def award_bank(self, winner_id: str):
+        """Передает банк победителю"""
+        winner = self.players[winner_id]
+        if winner.get('chips') is not None:
+            winner['chips'] += self.bank
+        self.bank = 0
+
+    def payouts(self) -> Dict[str, int]:
+        """Фишки, которые вернутся в кошельки игроков при расчете"""
+        return {
+            pid: pdata['chips']
+            for pid, pdata in self.players.items()
+            if pdata.get('chips') is not None
+        }
+
+    @timed(ACTION_SECONDS, "to_dict")
+    @traced("engine.to_dict")
     def to_dict(self) -> dict:
         """Преобразование состояния игры в словарь для передачи клиенту"""
         state = {
@@ -302,18 +405,21 @@ class GameState:
             "folded_players": list(self.folded_players),
             "status": self.status,
             "round": self.round,
-            "svara_players": list(self.svara_players) if hasattr(self, 'svara_players') else []
+            "svara_players": list(self.svara_players) if hasattr(self, 'svara_players') else [],
+            "created_at": self.created_at
         }
-        logger.info(f"Game state converted to dict: {state}")
+        trace.debug("Game state converted to dict: %s", state)
         return state
 
+    @timed(ACTION_SECONDS, "from_dict")
+    @traced("engine.from_dict")
     def from_dict(self, data: dict):
         """Восстановление состояния игры из словаря"""
         self.players = {}
         for pid, player_data in data["players"].items():
             self.players[pid] = {
                 "cards": [
-                    Card(
+                    Card.from_str(card) if isinstance(card, str) else Card(
                         rank=Rank(card["rank"]),
                         suit=Suit(card["suit"]),
                         is_joker=card.get("is_joker", False)
@@ -323,7 +429,8 @@ class GameState:
                 "bet": player_data["bet"],
                 "total_bet": player_data.get("total_bet", 0),
                 "user_info": player_data.get("user_info", {}),
-                "status": player_data.get("status", "waiting")
+                "status": player_data.get("status", "waiting"),
+                "chips": player_data.get("chips")
             }
         
         self.bank = data["bank"]
@@ -336,4 +443,65 @@ class GameState:
         self.ready_players = set(pid for pid, pdata in self.players.items() if pdata["status"] == "ready")
         self.min_bet = data.get("min_bet", 100)
         self.max_bet = data.get("max_bet", 2000)
-        self.deck = []  # Колода не сохраняется, так как она не нужна после раздачи 
\ No newline at end of file
+        self.created_at = data.get("created_at")
+        self.deck = []  # Колода не сохраняется, так как она не нужна после раздачи
+
+
+HIDDEN_CARD = "?"  # рубашка: клиент видит число чужих карт, но не сами карты
+
+
+def player_view(state: dict, viewer: Optional[str]) -> dict:
+    """
+    Состояние стола (формат to_dict) глазами игрока viewer
+
+    Свои карты игрок видит всегда, чужие скрыты до вскрытия. После расчета
+    (status 'finished') открыты карты всех, кто дошел до вскрытия; карты
+    сбросивших остаются закрытыми. Исходный словарь не изменяется.
+    """
+    revealed = state.get("status") == "finished"
+    folded = set(state.get("folded_players", ()))
+    players = {}
+    for pid, pdata in state.get("players", {}).items():
+        if pid == viewer or (revealed and pid not in folded):
+            players[pid] = pdata
+        else:
+            players[pid] = {**pdata, 'cards': [HIDDEN_CARD] * len(pdata.get('cards', ()))}
+    return {**state, "players": players}
+
+class GameStatePool:
+    """
+    Ограниченный пул объектов GameState
+
+    Загрузка стола из Redis, создание стола и самоигра берут объект через
+    acquire() и возвращают через release() — после этого объект сбрасывается
+    и им больше нельзя пользоваться. Сверх max_size свободные объекты не
+    хранятся. Пул рассчитан на один поток (event loop или процесс самоигры).
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._free: List[GameState] = []
+        self._reused = POOL_ACQUIRES.labels("reused")
+        self._created = POOL_ACQUIRES.labels("created")
+
+    def __len__(self) -> int:
+        return len(self._free)
+
+    def acquire(self) -> GameState:
+        if self._free:
+            self._reused.inc()
+            game = self._free.pop()
+            game._pooled = False
+            return game
+        self._created.inc()
+        return GameState()
+
+    def release(self, game: Optional[GameState]):
+        if game is None or game._pooled or len(self._free) >= self.max_size:
+            return
+        game.reset()
+        game._pooled = True
+        self._free.append(game)
+
+
+game_state_pool = GameStatePool()
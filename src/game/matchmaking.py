@@ -1,16 +1,16 @@
 import logging
-import asyncio
 from typing import Optional, List, Dict
 from datetime import datetime, timedelta
 import json
 from redis import Redis
-from .engine import GameState
+from .engine import GameState, game_state_pool
+from ..utils.metrics import MATCHMAKING_WAIT_SECONDS, instrument_redis, redis_call
 
 logger = logging.getLogger(__name__)
 
 class MatchMaker:
     def __init__(self, redis_client: Redis):
-        self.redis = redis_client
+        self.redis = instrument_redis(redis_client)
         self.queue_key = "matchmaking_queue"
         self.games_key = "active_games"
         self.player_timeout = 30  # секунд
@@ -18,7 +18,9 @@ class MatchMaker:
         self.min_players = 2  # Минимальное количество игроков
         self.max_players = 6  # Максимальное количество игроков
         self.queue_timeout = 60  # Время ожидания в очереди в секундах
-        
+        self.game_timeout = 300  # Через сколько секунд неначатая игра считается зависшей
+
+    @redis_call("MatchMaker.add_to_queue")
     async def add_to_queue(self, player_id: str, rating: int = 1000) -> bool:
         """Добавляет игрока в очередь матчмейкинга"""
         try:
@@ -58,6 +60,7 @@ class MatchMaker:
             logger.error(f"Ошибка при добавлении игрока {player_id} в очередь: {e}")
             return False
     
+    @redis_call("MatchMaker.remove_from_queue")
     async def remove_from_queue(self, player_id: str) -> bool:
         """Удаляет игрока из очереди"""
         try:
@@ -78,6 +81,7 @@ class MatchMaker:
             logger.error(f"Ошибка при удалении игрока {player_id} из очереди: {e}")
             return False
     
+    @redis_call("MatchMaker.find_match")
     async def find_match(self, rating: int = 1000, range: int = 100) -> Optional[List[str]]:
         """Ищет подходящих игроков для матча"""
         try:
@@ -122,6 +126,7 @@ class MatchMaker:
                         # Удаляем игроков из очереди
                         for p in players_data[:self.max_players]:
                             await self.redis.zrem(self.queue_key, p)
+                        self._observe_wait(players_data[:self.max_players], now)
                         logger.info(f"Найдена группа из {len(valid_players)} игроков для матча")
                         return valid_players[:self.max_players]
 
@@ -140,6 +145,7 @@ class MatchMaker:
                     # Удаляем игроков из очереди
                     for p in players_data[:len(valid_players)]:
                         await self.redis.zrem(self.queue_key, p)
+                    self._observe_wait(players_data[:len(valid_players)], now)
                     logger.info(f"Создаем игру с {len(valid_players)} игроками после ожидания")
                     return valid_players
 
@@ -149,11 +155,13 @@ class MatchMaker:
             logger.error(f"Ошибка при поиске матча: {e}")
             return None
     
+    @redis_call("MatchMaker.create_game")
     async def create_game(self, player_ids: List[str]) -> Optional[str]:
         """Создает новую игру"""
+        game = None
         try:
             game_id = await self.redis.incr("game_counter")
-            game = GameState()
+            game = game_state_pool.acquire()
             # Добавляем время создания игры
             game.created_at = datetime.now().isoformat()
 
@@ -180,7 +188,10 @@ class MatchMaker:
         except Exception as e:
             logger.error(f"Ошибка при создании игры: {e}")
             return None
+        finally:
+            game_state_pool.release(game)
     
+    @redis_call("MatchMaker.get_game_state")
     async def get_game_state(self, game_id: str) -> Optional[Dict]:
         """Получает состояние игры"""
         try:
@@ -193,6 +204,7 @@ class MatchMaker:
             logger.error(f"Ошибка при получении состояния игры {game_id}: {e}")
             return None
     
+    @redis_call("MatchMaker.update_game_state")
     async def update_game_state(self, game_id: str, game_state: GameState) -> bool:
         """Обновляет состояние игры"""
         try:
@@ -209,6 +221,7 @@ class MatchMaker:
             logger.error(f"Ошибка при обновлении состояния игры {game_id}: {e}")
             return False
     
+    @redis_call("MatchMaker.end_game")
     async def end_game(self, game_id: str) -> bool:
         """Завершает игру"""
         try:
@@ -231,23 +244,32 @@ class MatchMaker:
             logger.error(f"Ошибка при завершении игры {game_id}: {e}")
             return False
     
+    @redis_call("MatchMaker.cleanup_stale_games")
     async def cleanup_stale_games(self) -> None:
-        """Очищает зависшие игры"""
-        while True:
-            try:
-                games = await self.redis.hgetall(self.games_key)
-                for game_id, game_data in games.items():
-                    try:
-                        game = json.loads(game_data)
-                        if game["status"] == "waiting":
-                            # Проверяем время создания
-                            created_at = datetime.fromisoformat(game.get("created_at", ""))
-                            if datetime.now() - created_at > timedelta(minutes=5):
-                                await self.end_game(game_id)
-                                logger.info(f"Удалена зависшая игра {game_id}")
-                    except Exception as e:
-                        logger.error(f"Ошибка при обработке игры {game_id}: {e}")
-                        continue
-            except Exception as e:
-                logger.error(f"Ошибка при очистке игр: {e}")
-            await asyncio.sleep(60)  # Проверяем каждую минуту 
\ No newline at end of file
+        """
+        Один проход очистки зависших игр. Дедлайны живых столов ведет сервер
+        на общем колесе таймеров, здесь таймеров нет.
+        """
+        try:
+            games = await self.redis.hgetall(self.games_key)
+            for game_id, game_data in games.items():
+                try:
+                    game = json.loads(game_data)
+                    if game["status"] == "waiting":
+                        # Проверяем время создания; у игр без него отсчет идет с текущего прохода
+                        created_at = datetime.fromisoformat(game.get("created_at") or datetime.now().isoformat())
+                        if datetime.now() - created_at > timedelta(seconds=self.game_timeout):
+                            await self.end_game(game_id)
+                            logger.info(f"Удалена зависшая игра {game_id}")
+                except Exception as e:
+                    logger.error(f"Ошибка при обработке игры {game_id}: {e}")
+                    continue
+        except Exception as e:
+            logger.error(f"Ошибка при очистке игр: {e}")
+
+    @staticmethod
+    def _observe_wait(players_data: List[str], now: datetime) -> None:
+        """Время ожидания в очереди игроков, попавших в матч"""
+        for player_json in players_data:
+            joined_at = datetime.fromisoformat(json.loads(player_json)["joined_at"])
+            MATCHMAKING_WAIT_SECONDS.observe((now - joined_at).total_seconds())
@@ -0,0 +1,81 @@
+import logging
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, List, Optional
+
+from .timers import TimerWheel, TimerHandle, timer_wheel
+
+logger = logging.getLogger(__name__)
+
+
+class TableEventLog:
+    """
+    Кольцевой буфер последних событий стола с порядковыми номерами.
+
+    Переподключившийся клиент сообщает номер последнего полученного события
+    и получает только пропущенные; если он выпал из окна буфера, нужен
+    полный снимок состояния.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self._events: Deque[dict] = deque(maxlen=capacity)
+        self.last_seq: int = 0
+
+    def append(self, message: dict) -> dict:
+        """Присваивает сообщению следующий номер и сохраняет его в буфере"""
+        self.last_seq += 1
+        event = {**message, "seq": self.last_seq}
+        self._events.append(event)
+        return event
+
+    def since(self, seq: int) -> Optional[List[dict]]:
+        """
+        События с номером больше seq.
+
+        Returns:
+            Список пропущенных событий (возможно пустой) или None,
+            если часть из них уже вытеснена из буфера или клиент знает
+            номер, которого у этого буфера не было (буфер пересоздан).
+        """
+        if seq == self.last_seq:
+            return []
+        if seq > self.last_seq:
+            return None
+        if not self._events or seq < 0:
+            return None
+        first_seq = self._events[0]["seq"]
+        if seq < first_seq - 1:
+            return None
+        return list(islice(self._events, seq - first_seq + 1, None))
+
+
+class EventLogRegistry:
+    """Буферы событий по столам. Буфер удаляется после idle_ttl секунд без событий."""
+
+    def __init__(self, capacity: int = 256, idle_ttl: float = 600, timers: Optional[TimerWheel] = None):
+        self.capacity = capacity
+        self.idle_ttl = idle_ttl
+        self.timers = timers or timer_wheel
+        self._logs: Dict[str, TableEventLog] = {}
+        self._expiry: Dict[str, TimerHandle] = {}
+
+    def get(self, game_id: str) -> Optional[TableEventLog]:
+        return self._logs.get(game_id)
+
+    def append(self, game_id: str, message: dict) -> dict:
+        """Добавляет событие в буфер стола (создавая буфер при необходимости)"""
+        log = self._logs.get(game_id)
+        if log is None:
+            log = self._logs[game_id] = TableEventLog(self.capacity)
+        handle = self._expiry.get(game_id)
+        if handle is not None:
+            handle.cancel()
+        self._expiry[game_id] = self.timers.call_later(self.idle_ttl, self.discard, game_id)
+        return log.append(message)
+
+    def discard(self, game_id: str) -> None:
+        """Удаляет буфер стола (игра завершена или неактивна)"""
+        self._logs.pop(game_id, None)
+        handle = self._expiry.pop(game_id, None)
+        if handle is not None:
+            handle.cancel()
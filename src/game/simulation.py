@@ -0,0 +1,278 @@
+import importlib
+import json
+import logging
+import os
+import random
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .engine import GameState, game_state_pool
+
+logger = logging.getLogger(__name__)
+
+SEATS = 6
+
+# Ход политики: ("bet", сумма), ("call", 0) или ("fold", 0)
+Action = Tuple[str, int]
+Policy = Callable[[GameState, str, random.Random], Action]
+
+
+def _opening_bet(table: GameState) -> int:
+    return table.current_bet or table.min_bet
+
+
+def caller(table: GameState, player_id: str, rng: random.Random) -> Action:
+    """Всегда уравнивает; без ставки на столе ставит минимум"""
+    if table.current_bet == 0:
+        return "bet", table.min_bet
+    return "call", 0
+
+
+def aggressive(table: GameState, player_id: str, rng: random.Random) -> Action:
+    """Повышает на min_bet с вероятностью 1/2, пока позволяют лимит и фишки"""
+    amount = _opening_bet(table) + table.min_bet
+    chips = table.players[player_id].get('chips')
+    if rng.random() < 0.5 and amount <= table.max_bet and (chips is None or amount <= chips):
+        return "bet", amount
+    return caller(table, player_id, rng)
+
+
+def folder(table: GameState, player_id: str, rng: random.Random) -> Action:
+    """Сбрасывает карты с вероятностью 1/2, иначе уравнивает"""
+    if rng.random() < 0.5:
+        return "fold", 0
+    return caller(table, player_id, rng)
+
+
+def scorer(table: GameState, player_id: str, rng: random.Random) -> Action:
+    """Играет от силы руки: сильная рука повышает, слабая сбрасывает под ставку"""
+    score = table.calculate_score(table.players[player_id]['cards'])
+    if score >= 32:
+        return aggressive(table, player_id, rng)
+    if score <= 30 and table.current_bet > table.min_bet:
+        return "fold", 0
+    return caller(table, player_id, rng)
+
+
+POLICIES: Dict[str, Policy] = {
+    "caller": caller,
+    "aggressive": aggressive,
+    "folder": folder,
+    "scorer": scorer,
+}
+
+
+def resolve_policy(name: str) -> Policy:
+    """Политика по имени из POLICIES или по пути "module:function" """
+    if name in POLICIES:
+        return POLICIES[name]
+    module_name, sep, attr = name.partition(":")
+    if not sep:
+        raise ValueError(f"Unknown policy {name!r}; expected one of {sorted(POLICIES)} or module:function")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+@dataclass
+class SimulationConfig:
+    """Параметры прогона; передаются в процессы пула, поэтому политики заданы именами"""
+    hands: int = 100000
+    policies: Sequence[str] = ("caller", "aggressive", "folder", "scorer", "caller", "aggressive")
+    min_bet: int = 100
+    max_bet: int = 2000
+    buy_in: int = 1000
+    max_actions: int = 500  # защита от бесконечной партии
+    seed: int = 0
+
+
+# Столбцы результата: имя -> код типа array. Одна строка — одна партия
+COLUMNS = {
+    "bank": "I",         # банк к моменту расчета
+    "actions": "H",      # ходов за партию, включая свары
+    "svaras": "H",       # сколько раз партия уходила в свару
+    "folds": "H",        # сбросов карт
+    "winner_seat": "b",  # место победителя, -1 — без победителя
+    "truncated": "B",    # 1 — партия прервана по max_actions
+}
+
+
+def _new_columns() -> Dict[str, array]:
+    return {name: array(code) for name, code in COLUMNS.items()}
+
+
+def play_hand(table: GameState, seat_ids: List[str], policies: List[Policy], config: SimulationConfig,
+              rng: random.Random) -> Tuple[int, int, int, int, int, int]:
+    """
+    Одна партия на столе по правилам сервера (handle_game_action)
+
+    Returns:
+        (bank, actions, svaras, folds, winner_seat, truncated)
+    """
+    table.reset()
+    table.min_bet = config.min_bet
+    table.max_bet = config.max_bet
+    for player_id in seat_ids:
+        table.add_player(player_id, chips=config.buy_in)
+    for player_id in seat_ids:
+        table.place_initial_bet(player_id, config.min_bet)
+
+    seat_of = {player_id: seat for seat, player_id in enumerate(seat_ids)}
+    actions = svaras = folds = 0
+    bank = table.bank
+    winner = None
+    while table.status in ('playing', 'svara'):
+        if actions >= config.max_actions:
+            return bank, actions, svaras, folds, -1, 1
+        player_id = table.current_turn
+        kind, amount = policies[seat_of[player_id]](table, player_id, rng)
+        if kind == "bet":
+            accepted = table.place_bet(player_id, amount)
+        elif kind == "call":
+            accepted = table.place_bet(player_id, table.current_bet)
+        else:
+            accepted = False
+        if not accepted:
+            # Сброс, а также недопустимый ход (не хватает фишек и т.п.)
+            table.fold(player_id)
+            folds += 1
+        actions += 1
+        bank = max(bank, table.bank)
+
+        if table.round == 'showdown' and table.status in ('playing', 'svara'):
+            winner = table.showdown_or_svara()
+            if table.status == 'svara':
+                svaras += 1
+                bank = max(bank, table.bank)
+
+    if table.status == 'finished' and winner is None:
+        # Партия закончилась сбросами: банк забрал оставшийся игрок, ход передан ему
+        winner = table.current_turn
+    return bank, actions, svaras, folds, seat_of[winner] if winner is not None else -1, 0
+
+
+def run_chunk(config: SimulationConfig, hands: int, seed: int) -> Dict[str, array]:
+    """Прогон hands партий на одном переиспользуемом столе (выполняется в процессе пула)"""
+    rng = random.Random(seed)
+    # Колода тасуется модульным random, поэтому его тоже фиксируем
+    random.seed(seed)
+    policies = [resolve_policy(name) for name in config.policies]
+    seat_ids = [str(seat + 1) for seat in range(SEATS)]
+    table = game_state_pool.acquire()
+    columns = _new_columns()
+    appenders = [columns[name].append for name in COLUMNS]
+    try:
+        for _ in range(hands):
+            for append, value in zip(appenders, play_hand(table, seat_ids, policies, config, rng)):
+                append(value)
+    finally:
+        game_state_pool.release(table)
+    return columns
+
+
+def simulate(config: SimulationConfig, workers: Optional[int] = None, chunk_size: int = 20000) -> Dict[str, array]:
+    """Прогон config.hands партий на пуле процессов; столбцы в порядке частей"""
+    if len(config.policies) != SEATS:
+        raise ValueError(f"Expected {SEATS} policies, got {len(config.policies)}")
+    for name in config.policies:
+        resolve_policy(name)
+    chunks = [min(chunk_size, config.hands - start) for start in range(0, config.hands, chunk_size)]
+    seeds = [config.seed * 1000003 + i for i in range(len(chunks))]
+    columns = _new_columns()
+
+    def collect(parts):
+        for part in parts:
+            for name in COLUMNS:
+                columns[name].extend(part[name])
+
+    workers = workers or os.cpu_count() or 1
+    jobs = ([config] * len(chunks), chunks, seeds)
+    if workers == 1:
+        previous = logging.root.manager.disable
+        logging.disable(logging.CRITICAL)
+        try:
+            collect(map(run_chunk, *jobs))
+        finally:
+            logging.disable(previous)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=logging.disable,
+                                 initargs=(logging.CRITICAL,)) as pool:
+            collect(pool.map(run_chunk, *jobs))
+    return columns
+
+
+def summarize(columns: Dict[str, array], config: SimulationConfig) -> Dict:
+    """Сводная статистика прогона"""
+    hands = len(columns["bank"])
+    if not hands:
+        return {"hands": 0}
+    banks = sorted(columns["bank"])
+    wins = [0] * SEATS
+    for seat in columns["winner_seat"]:
+        if seat >= 0:
+            wins[seat] += 1
+    by_policy: Dict[str, int] = {}
+    for seat, name in enumerate(config.policies):
+        by_policy[name] = by_policy.get(name, 0) + wins[seat]
+    seats_per_policy = {name: list(config.policies).count(name) for name in by_policy}
+    return {
+        "hands": hands,
+        "bank_mean": sum(banks) / hands,
+        "bank_p50": banks[hands // 2],
+        "bank_p95": banks[min(hands - 1, int(hands * 0.95))],
+        "bank_max": banks[-1],
+        "svara_rate": sum(1 for n in columns["svaras"] if n) / hands,
+        "actions_mean": sum(columns["actions"]) / hands,
+        "actions_max": max(columns["actions"]),
+        "folds_mean": sum(columns["folds"]) / hands,
+        "truncated": sum(columns["truncated"]),
+        "win_rate_per_seat": {
+            name: by_policy[name] / seats_per_policy[name] / hands for name in by_policy
+        },
+    }
+
+
+COLUMNAR_MAGIC = b"SEKACOL1\n"
+
+
+def write_columns(path: str, columns: Dict[str, array], meta: Optional[Dict] = None):
+    """
+    Столбцы в компактный файл: сигнатура, строка JSON-заголовка, затем
+    данные столбцов подряд (little-endian) в порядке заголовка
+    """
+    header = {
+        "rows": len(next(iter(columns.values()))) if columns else 0,
+        "columns": [{"name": name, "type": data.typecode} for name, data in columns.items()],
+        "meta": meta or {},
+    }
+    with open(path, "wb") as f:
+        f.write(COLUMNAR_MAGIC)
+        f.write(json.dumps(header, ensure_ascii=False).encode() + b"\n")
+        for data in columns.values():
+            if data.itemsize > 1 and sys.byteorder != "little":
+                data = array(data.typecode, data)
+                data.byteswap()
+            data.tofile(f)
+
+
+def read_columns(path: str) -> Tuple[Dict, Dict[str, array]]:
+    """Обратное к write_columns: (заголовок, столбцы)"""
+    with open(path, "rb") as f:
+        if f.readline() != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a columnar simulation file")
+        header = json.loads(f.readline())
+        columns = {}
+        for column in header["columns"]:
+            data = array(column["type"])
+            data.fromfile(f, header["rows"])
+            if data.itemsize > 1 and sys.byteorder != "little":
+                data.byteswap()
+            columns[column["name"]] = data
+    return header, columns
+
+
+def config_meta(config: SimulationConfig) -> Dict:
+    meta = asdict(config)
+    meta["policies"] = list(config.policies)
+    return meta
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import math
+from typing import Callable, Dict, List, Optional
+from ..utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = Histogram(
+    "seka_event_loop_lag_seconds", "Насколько позже плана просыпается тик колеса таймеров",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+WHEEL_BITS = 6
+WHEEL_SIZE = 1 << WHEEL_BITS  # 64 слота на уровень
+WHEEL_MASK = WHEEL_SIZE - 1
+WHEEL_LEVELS = 5
+
+
+class TimerHandle:
+    """Дескриптор запланированного таймера. Отмена за O(1)."""
+    __slots__ = ('expires', 'callback', 'args', 'interval', '_bucket')
+
+    def __init__(self, expires: int, callback: Callable, args: tuple, interval: Optional[float] = None):
+        self.expires = expires
+        self.callback = callback
+        self.args = args
+        self.interval = interval
+        self._bucket: Optional[Dict['TimerHandle', None]] = None
+
+    @property
+    def active(self) -> bool:
+        return self._bucket is not None
+
+    def cancel(self) -> bool:
+        """Снимает таймер с колеса. Возвращает False, если он уже сработал или отменен"""
+        bucket = self._bucket
+        if bucket is None:
+            self.interval = None
+            return False
+        bucket.pop(self, None)
+        self._bucket = None
+        self.interval = None
+        return True
+
+
+class TimerWheel:
+    """
+    Иерархическое колесо таймеров для таймаутов ходов, очереди и зависших игр.
+
+    Планирование и отмена выполняются за O(1): таймер кладется в слот одного
+    из уровней колеса по величине задержки и переносится на нижний уровень,
+    когда колесо доходит до его слота. Все таймеры обслуживает одна asyncio-задача.
+
+    Коллбеки могут быть обычными функциями или корутинными функциями —
+    корутины запускаются отдельными задачами и не блокируют тик.
+    """
+
+    def __init__(self, tick: float = 0.1):
+        self.tick = tick
+        self.current_tick = 0
+        self.lag: float = 0.0  # насколько позже плана проснулся последний тик, сек
+        self._levels: List[List[Dict[TimerHandle, None]]] = [
+            [{} for _ in range(WHEEL_SIZE)] for _ in range(WHEEL_LEVELS)
+        ]
+        self._max_ticks = (1 << (WHEEL_BITS * WHEEL_LEVELS)) - 1
+        self._task: Optional[asyncio.Task] = None
+        self._started_at: float = 0.0
+        self._pending: set = set()
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for level in self._levels for bucket in level)
+
+    def call_later(self, delay: float, callback: Callable, *args) -> TimerHandle:
+        """Запланировать однократный вызов callback(*args) через delay секунд"""
+        ticks = max(1, math.ceil(delay / self.tick))
+        if ticks > self._max_ticks:
+            raise ValueError(f"Задержка {delay} с превышает диапазон колеса таймеров")
+        handle = TimerHandle(self.current_tick + ticks, callback, args)
+        self._place(handle)
+        return handle
+
+    def call_every(self, interval: float, callback: Callable, *args) -> TimerHandle:
+        """Запланировать периодический вызов callback(*args) каждые interval секунд"""
+        handle = self.call_later(interval, callback, *args)
+        handle.interval = interval
+        return handle
+
+    def _place(self, handle: TimerHandle):
+        delta = handle.expires - self.current_tick
+        level = 0
+        while level < WHEEL_LEVELS - 1 and delta >= (1 << (WHEEL_BITS * (level + 1))):
+            level += 1
+        slot = (handle.expires >> (WHEEL_BITS * level)) & WHEEL_MASK
+        bucket = self._levels[level][slot]
+        bucket[handle] = None
+        handle._bucket = bucket
+
+    def _cascade(self, level: int) -> int:
+        slot = (self.current_tick >> (WHEEL_BITS * level)) & WHEEL_MASK
+        bucket = self._levels[level][slot]
+        if bucket:
+            handles = list(bucket)
+            bucket.clear()
+            for handle in handles:
+                self._place(handle)
+        return slot
+
+    def advance(self, ticks: int = 1):
+        """Продвинуть колесо на указанное число тиков и вызвать истекшие таймеры"""
+        for _ in range(ticks):
+            self.current_tick += 1
+            level = 1
+            while level < WHEEL_LEVELS and (self.current_tick & ((1 << (WHEEL_BITS * level)) - 1)) == 0:
+                self._cascade(level)
+                level += 1
+
+            bucket = self._levels[0][self.current_tick & WHEEL_MASK]
+            if not bucket:
+                continue
+            expired = list(bucket)
+            bucket.clear()
+            for handle in expired:
+                handle._bucket = None
+                self._fire(handle)
+
+    def _fire(self, handle: TimerHandle):
+        if handle.interval is not None:
+            handle.expires = self.current_tick + max(1, math.ceil(handle.interval / self.tick))
+            self._place(handle)
+        try:
+            result = handle.callback(*handle.args)
+            if asyncio.iscoroutine(result):
+                task = asyncio.ensure_future(result)
+                self._pending.add(task)
+                task.add_done_callback(self._on_task_done)
+        except Exception as e:
+            logger.error(f"Ошибка в обработчике таймера {handle.callback!r}: {e}", exc_info=True)
+
+    def _on_task_done(self, task: asyncio.Task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Ошибка в асинхронном обработчике таймера: {task.exception()}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        # Отсчет ведется от нулевого тика, чтобы колесо можно было перезапускать
+        self._started_at = loop.time() - self.current_tick * self.tick
+        while True:
+            next_at = self._started_at + (self.current_tick + 1) * self.tick
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
+            now = loop.time()
+            self.lag = max(0.0, now - next_at)
+            LOOP_LAG_SECONDS.observe(self.lag)
+            due = int((now - self._started_at) / self.tick) - self.current_tick
+            if due > 0:
+                self.advance(due)
+
+    def start(self):
+        """Запустить задачу, обслуживающую колесо"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Timer wheel started (tick {self.tick}s)")
+
+    async def stop(self):
+        """Остановить колесо и отменить незавершенные асинхронные обработчики"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._pending):
+            task.cancel()
+        logger.info("Timer wheel stopped")
+
+
+# Общее колесо таймеров процесса: дедлайны ходов, очереди и зависших столов сервера
+timer_wheel = TimerWheel()
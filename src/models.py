@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, BigInteger, DateTime, Boolean, ForeignKey, JSON
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import (Column, Integer, String, BigInteger, Date, DateTime, Boolean, ForeignKey, JSON, Index,
+                        CheckConstraint, DDL, event)
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from src.db import Base
 
-Base = declarative_base()
+# Схема меняется только миграциями Alembic (migrations/versions); модели должны совпадать с ними
 
 class Player(Base):
     __tablename__ = 'players'
@@ -30,17 +31,61 @@ class Player(Base):
 class Transaction(Base):
     __tablename__ = 'transactions'
 
-    id = Column(Integer, primary_key=True)
+    # Таблица секционирована по месяцам (см. src/wallet/ledger.py), поэтому
+    # ключ секционирования created_at входит в первичный ключ
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
     game_id = Column(String, ForeignKey('games.id', ondelete='SET NULL'))
     player_id = Column(BigInteger, ForeignKey('players.id', ondelete='CASCADE'), nullable=False)
     amount = Column(Integer, nullable=False)
     action = Column(String(10), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
 
     # Отношения
     player = relationship("Player", back_populates="transactions")
     game = relationship("Game", back_populates="transactions")
 
+    __table_args__ = (
+        Index('idx_transactions_player_created', 'player_id', created_at.desc(), id.desc()),
+        Index('idx_transactions_game', 'game_id'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+# Секция по умолчанию принимает строки, для месяца которых секция еще не создана
+event.listen(
+    Transaction.__table__,
+    'after_create',
+    DDL("CREATE TABLE IF NOT EXISTS transactions_default PARTITION OF transactions DEFAULT"),
+)
+
+class PlayerStats(Base):
+    __tablename__ = 'player_stats'
+
+    # Агрегаты игрока, обновляемые при расчете игры (src/stats). Отдельная таблица,
+    # чтобы индексы лидерборда не мешали частым обновлениям баланса в players
+    player_id = Column(BigInteger, ForeignKey('players.id', ondelete='CASCADE'), primary_key=True)
+    games_played = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    current_streak = Column(Integer, nullable=False, default=0)  # > 0 — серия побед, < 0 — поражений
+    net_profit = Column(BigInteger, nullable=False, default=0)
+    svara_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index('idx_player_stats_net_profit', net_profit.desc(), player_id),
+        Index('idx_player_stats_wins', wins.desc(), player_id),
+    )
+
+class TransactionDailySummary(Base):
+    __tablename__ = 'transaction_daily_summary'
+
+    # Свертка архивированных секций transactions: итог по игроку, дню и типу операции
+    player_id = Column(BigInteger, ForeignKey('players.id', ondelete='CASCADE'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    action = Column(String(10), primary_key=True)
+    amount = Column(BigInteger, nullable=False, default=0)
+    transactions_count = Column(Integer, nullable=False, default=0)
+
 class Game(Base):
     __tablename__ = 'games'
 
@@ -72,4 +117,23 @@ class GamePlayer(Base):
 
     # Отношения
     game = relationship("Game", back_populates="game_players")
-    player = relationship("Player", back_populates="game_players") 
\ No newline at end of file
+    player = relationship("Player", back_populates="game_players")
+
+    __table_args__ = (
+        # Первичный ключ начинается с game_id; игры игрока ищутся по этому индексу
+        Index('idx_game_players_player', 'player_id'),
+    )
+
+class Escrow(Base):
+    __tablename__ = 'escrows'
+
+    # Фишки, зарезервированные из кошелька игрока на время игры за столом
+    game_id = Column(String, primary_key=True)
+    player_id = Column(BigInteger, ForeignKey('players.id', ondelete='CASCADE'), primary_key=True)
+    amount = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        CheckConstraint('amount >= 0', name='escrows_amount_check'),
+        Index('idx_escrows_created', 'created_at'),
+    )
@@ -1,56 +1,91 @@
 import logging
-import sys
-import os
 import asyncio
-import hashlib
 import hmac
-from urllib.parse import parse_qsl, unquote
 import json
 from typing import Dict, Set, Optional
 import time
 from contextlib import asynccontextmanager
+from datetime import datetime
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Depends
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Depends, Header, Query
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from starlette.websockets import WebSocketState
 import redis.asyncio as redis
 from starlette import status
 
-from .utils.telegram_auth import verify_telegram_data
-from .game.engine import GameState
-from .db import get_session
+from .utils.telegram_auth import get_verifier
+from .utils.session_tokens import issue_session_token, verify_session_token
+from .utils.rate_limit import TokenBucket, KeyedRateLimiter, AdmissionController
+from .utils.log import debug_channel
+from .utils.tracing import tracer, FileSpanExporter
+from .utils.diagnostics import LoopWatchdog, SamplingProfiler
+from .utils.metrics import (
+    REGISTRY, CONTENT_TYPE, Gauge, Histogram, MATCHMAKING_WAIT_SECONDS, instrument_redis, redis_call
+)
+from .game.engine import GameState, game_state_pool, player_view
+from .game.timers import TimerHandle, timer_wheel
+from .game.replay import EventLogRegistry
+from .db import get_async_session, AsyncSessionLocal
 from .wallet import WalletManager
-from sqlalchemy.orm import Session
-from .telegram_bot import create_bot_app
-from .config import settings
+from .wallet.cache import BalanceCache
+from .wallet.ledger import LedgerMaintenance
+from .stats import StatsManager, LEADERBOARD_METRICS
+from .stats.leaderboard import Leaderboard, PERIODS
+from sqlalchemy.ext.asyncio import AsyncSession
+from .telegram_bot import (
+    create_bot_app, enqueue_webhook_update, webhook_url, BOT_MODE, BOT_WEBHOOK_PATH,
+    BOT_WEBHOOK_SECRET, BOT_MAX_CONCURRENT_UPDATES
+)
+from .config import settings, GAME_CONFIG
 
 # --- Настройка логирования ---
-os.makedirs('logs', exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/app.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Обработчики настраивает src.config (запись в файл и консоль в отдельном потоке)
 logger = logging.getLogger('seka_game')
+# Подробности каждого сообщения и тика очереди; по умолчанию выключено (LOG_DEBUG_CHANNELS=ws)
+ws_debug = debug_channel('ws')
+
+# --- Метрики ---
+WS_SEND_SECONDS = Histogram("seka_ws_send_seconds", "Время отправки сообщения в WebSocket")
+WS_CONNECTIONS = Gauge("seka_ws_connections", "Открытые WebSocket-соединения")
+WS_SENDS_IN_FLIGHT = Gauge("seka_ws_sends_in_flight", "Отправки, ожидающие записи в сокет")
+MATCHMAKING_QUEUE_SIZE = Gauge("seka_matchmaking_queue_size", "Игроки в очереди ожидания на последнем тике")
 
 # --- Менеджеры ---
+def table_view(message: dict, player_id: str) -> dict:
+    """Сообщение стола для одного получателя: чужие карты в состояниях скрыты"""
+    kind = message.get("type")
+    if kind == "game_state":
+        return {**message, "data": player_view(message["data"], player_id)}
+    if kind == "game_created":
+        return {**message, "game_state": player_view(message["game_state"], player_id)}
+    if kind == "resume":
+        return {**message, "events": [table_view(event, player_id) for event in message["events"]]}
+    return message
+
 class ConnectionManager:
     """Управляет WebSocket-соединениями."""
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
+        # Стол, за которым сидит игрок (для лимита сообщений на стол)
+        self.player_tables: Dict[str, str] = {}
+        # Последние события каждого стола для досылки при переподключении
+        self.event_logs = EventLogRegistry()
+        self.sends_in_flight = 0
+        self._send_seconds = WS_SEND_SECONDS.labels()
 
     async def connect(self, websocket: WebSocket, player_id: str):
         await websocket.accept()
         self.active_connections[player_id] = websocket
         logger.info(f"Player {player_id} connected. Total connections: {len(self.active_connections)}")
 
-    def disconnect(self, player_id: str):
+    def disconnect(self, player_id: str, websocket: Optional[WebSocket] = None):
+        if websocket is not None and self.active_connections.get(player_id) is not websocket:
+            # Игрок уже переподключился: закрывается старое соединение, новое не трогаем
+            return
+        self.player_tables.pop(player_id, None)
         if player_id in self.active_connections:
             del self.active_connections[player_id]
             logger.info(f"Player {player_id} disconnected. Total connections: {len(self.active_connections)}")
@@ -59,14 +94,70 @@ class ConnectionManager:
         if player_id in self.active_connections:
             websocket = self.active_connections[player_id]
             if websocket.client_state == WebSocketState.CONNECTED:
-                await websocket.send_json(message)
+                self.sends_in_flight += 1
+                started = time.perf_counter()
+                try:
+                    await websocket.send_json(message)
+                except Exception as e:
+                    # Соединение закрылось во время отправки: рассылка остальным игрокам
+                    # продолжается, а пропущенное игрок получит через resume
+                    logger.warning(f"Failed to send message to player {player_id}: {e}")
+                    self.disconnect(player_id, websocket)
+                finally:
+                    self._send_seconds.observe(time.perf_counter() - started)
+                    self.sends_in_flight -= 1
             else:
                 logger.warning(f"Attempted to send message to disconnected player {player_id}")
                 self.disconnect(player_id)
 
-    async def broadcast(self, message: dict, player_ids: list):
+    async def broadcast(self, message: dict, player_ids: list, view=None):
+        """Рассылка игрокам; view(message, player_id) готовит копию для каждого получателя"""
+        with tracer.span("ws.broadcast") as span:
+            span.set_attribute("ws.recipients", len(player_ids))
+            for player_id in player_ids:
+                await self.send_personal_message(view(message, player_id) if view else message, player_id)
+
+    async def broadcast_table(self, game_id: str, message: dict, player_ids: list):
+        """
+        Рассылает событие стола, присваивая ему порядковый номер для досылки.
+        В буфере хранится полное событие, каждый игрок получает свой вид стола.
+        """
+        event = self.event_logs.append(game_id, message)
         for player_id in player_ids:
-            await self.send_personal_message(message, player_id)
+            self.player_tables[player_id] = game_id
+        await self.broadcast(event, player_ids, view=table_view)
+
+    async def resume(self, player_id: str, game_id: str, last_seq: Optional[int]):
+        """
+        Досылает переподключившемуся игроку пропущенные события стола.
+        Если клиент выпал из окна буфера (или не прислал номер), отправляется
+        полный снимок состояния игры.
+        """
+        log = self.event_logs.get(game_id)
+        missed = log.since(last_seq) if log is not None and last_seq is not None else None
+        if missed is not None:
+            await self.send_personal_message(table_view({
+                "type": "resume",
+                "game_id": game_id,
+                "events": missed,
+                "seq": log.last_seq
+            }, player_id), player_id)
+            logger.info(f"Replayed {len(missed)} events of game {game_id} to player {player_id}")
+            return
+
+        game = await game_manager.get_game(game_id)
+        if game is None:
+            return
+        try:
+            await self.send_personal_message({
+                "type": "game_state",
+                "game_id": game_id,
+                "data": player_view(game.to_dict(), player_id),
+                "seq": log.last_seq if log is not None else 0
+            }, player_id)
+        finally:
+            game_state_pool.release(game)
+        logger.info(f"Sent full snapshot of game {game_id} to player {player_id}")
 
 class GameStateManager:
     """Управляет состоянием игр в Redis."""
@@ -74,9 +165,9 @@ class GameStateManager:
         self.redis_master = redis_master
         self.redis_slave = redis_slave
         self.games_key = "seka:games"
-        self.players_key = "seka:players"
         self.waiting_key = "seka:waiting"
         self.player_games_key = "seka:player_games"
+        self.waiting_since_key = "seka:waiting_since"  # время входа в очередь (для метрики ожидания)
         self._initialized = False
 
     async def initialize(self):
@@ -90,28 +181,42 @@ class GameStateManager:
                 logger.error(f"Failed to connect to Redis: {e}")
                 raise
 
+    @redis_call("GameStateManager.add_waiting_player")
     async def add_waiting_player(self, player_id: str):
         active_game = await self.get_player_active_game(player_id)
         if active_game:
             logger.warning(f"Player {player_id} is already in game {active_game}.")
             return False
-        await self.redis_master.sadd(self.waiting_key, player_id)
+        async with self.redis_master.pipeline(transaction=False) as pipe:
+            pipe.sadd(self.waiting_key, player_id)
+            pipe.hsetnx(self.waiting_since_key, player_id, time.time())
+            await pipe.execute()
         return True
 
+    @redis_call("GameStateManager.get_waiting_players")
     async def get_waiting_players(self) -> Set[str]:
         return await self.redis_slave.smembers(self.waiting_key)
 
-    async def remove_waiting_players(self, player_ids: list):
+    @redis_call("GameStateManager.remove_waiting_players")
+    async def remove_waiting_players(self, player_ids: list, matched: bool = False):
+        """Снимает игроков с очереди; matched — они попали за стол (учитывается время ожидания)"""
         if player_ids:
-            await self.redis_master.srem(self.waiting_key, *player_ids)
+            async with self.redis_master.pipeline(transaction=False) as pipe:
+                pipe.srem(self.waiting_key, *player_ids)
+                pipe.hmget(self.waiting_since_key, player_ids)
+                pipe.hdel(self.waiting_since_key, *player_ids)
+                _, waiting_since, _ = await pipe.execute()
+            if matched:
+                now = time.time()
+                for since in waiting_since:
+                    if since is not None:
+                        MATCHMAKING_WAIT_SECONDS.observe(now - float(since))
             
+    @redis_call("GameStateManager.get_player_active_game")
     async def get_player_active_game(self, player_id: str) -> Optional[str]:
         return await self.redis_slave.hget(self.player_games_key, player_id)
 
-    async def get_player_balance(self, player_id: str) -> int:
-        balance = await self.redis_slave.hget(self.players_key, player_id)
-        return int(balance) if balance else 1000  # Default balance
-
+    @redis_call("GameStateManager.save_game")
     async def save_game(self, game_id: str, game_state: GameState):
         async with self.redis_master.pipeline() as pipe:
             pipe.hset(self.games_key, game_id, json.dumps(game_state.to_dict()))
@@ -119,89 +224,465 @@ class GameStateManager:
                 pipe.hset(self.player_games_key, player_id, game_id)
             await pipe.execute()
 
+    @redis_call("GameStateManager.get_game")
     async def get_game(self, game_id: str) -> Optional[GameState]:
+        """Состояние стола в объекте из пула; вызывающий возвращает его через game_state_pool.release"""
         game_data = await self.redis_slave.hget(self.games_key, game_id)
         if game_data:
-            game = GameState()
+            game = game_state_pool.acquire()
             game.from_dict(json.loads(game_data))
             return game
         return None
 
+    @redis_call("GameStateManager.finish_game")
+    async def finish_game(self, game_id: str, player_ids: list):
+        """Удаляет завершенную игру и связи игрок-игра"""
+        async with self.redis_master.pipeline() as pipe:
+            pipe.hdel(self.games_key, game_id)
+            if player_ids:
+                pipe.hdel(self.player_games_key, *player_ids)
+            await pipe.execute()
+
+    @redis_call("GameStateManager.leave_game")
+    async def leave_game(self, player_id: str):
+        await self.redis_master.hdel(self.player_games_key, player_id)
+
+    @redis_call("GameStateManager.get_active_game_ids")
+    async def get_active_game_ids(self) -> list:
+        return await self.redis_slave.hkeys(self.games_key)
+
 # --- Глобальные объекты ---
 manager = ConnectionManager()
-application = create_bot_app()
-
-redis_master = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0)
-redis_slave = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0)
+redis_master = instrument_redis(redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, decode_responses=True))
+redis_slave = instrument_redis(redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, decode_responses=True))
+balance_cache = BalanceCache(redis_master)
+leaderboard = Leaderboard(redis_master)
 game_manager = GameStateManager(redis_master, redis_slave)
+application = create_bot_app(balance_cache, leaderboard)
+
+table_limiter = KeyedRateLimiter(settings.TABLE_RATE_LIMIT, settings.TABLE_RATE_BURST)
+admission = AdmissionController(
+    max_connections=settings.MAX_CONNECTIONS,
+    max_loop_lag=settings.MAX_LOOP_LAG,
+    connection_count=lambda: len(manager.active_connections),
+    loop_lag=lambda: timer_wheel.lag,
+)
+WS_CONNECTIONS.set_function(lambda: len(manager.active_connections))
+WS_SENDS_IN_FLIGHT.set_function(lambda: manager.sends_in_flight)
+
+# Диагностика: сторож включается LOOP_STALL_THRESHOLD, профилировщик — через /api/admin/profiler
+watchdog = LoopWatchdog(threshold=settings.LOOP_STALL_THRESHOLD)
+profiler = SamplingProfiler()
 
 # --- Фоновые задачи ---
+MATCHMAKING_INTERVAL = 5  # секунд между проверками очереди ожидания
+_matchmaking_lock = asyncio.Lock()
+
+async def _seat_table(players_for_game: list, game_id: str):
+    """
+    Резервирует бай-ин игроков из очереди и создает стол
+
+    Стол создается только полным. Если кого-то посадить не удалось (нет
+    данных пользователя или средств), он снимается с очереди, резервы
+    остальных возвращаются, а сами они остаются в очереди до следующего тика.
+    """
+    game = game_state_pool.acquire()
+    buy_in = GAME_CONFIG['buy_in']
+    dropped = []
+    try:
+        async with AsyncSessionLocal() as db:
+            wallet = WalletManager(db, balance_cache)
+            for player_id in players_for_game:
+                user_info_json = await redis_master.get(f"seka:user_info:{player_id}")
+                if not user_info_json:
+                    logger.warning(f"User info for player {player_id} not found in Redis. Removing from waiting queue.")
+                    dropped.append(player_id)
+                    continue
+
+                # Фишки за столом резервируются из кошелька один раз при входе
+                reserved, message = await wallet.reserve_stake(int(player_id), game_id, buy_in)
+                if not reserved:
+                    logger.warning(f"Cannot reserve buy-in for player {player_id}: {message}")
+                    dropped.append(player_id)
+                    await manager.send_personal_message(
+                        {"type": "error", "data": {"message": message}}, player_id
+                    )
+                    continue
+
+                game.add_player(player_id, json.loads(user_info_json), chips=buy_in)
+
+            if dropped:
+                await game_manager.remove_waiting_players(dropped)
+                if game.players:
+                    refunded, message, _ = await wallet.refund_escrow(game_id)
+                    if not refunded:
+                        # Резервы останутся в БД и будут возвращены recover_stale_escrows
+                        logger.error(f"Cannot refund buy-ins of unfilled table {game_id}: {message}")
+                logger.warning(f"Table {game_id} is short of {len(dropped)} players; "
+                               f"{len(game.players)} players stay in the waiting queue")
+                return
+
+        game.created_at = datetime.now().isoformat()
+        await redis_master.delete(*[f"seka:user_info:{player_id}" for player_id in game.players])
+        await game_manager.save_game(game_id, game)
+        _schedule_stale_check(game_id, STALE_TABLE_TIMEOUT)
+        await game_manager.remove_waiting_players(players_for_game, matched=True)
+        logger.info(f"Created game {game_id} for players: {list(game.players.keys())}")
+
+        await manager.broadcast_table(game_id, {
+            "type": "game_created",
+            "game_id": game_id,
+            "game_state": game.to_dict()
+        }, list(game.players.keys()))
+    finally:
+        game_state_pool.release(game)
+
 async def monitor_game_state():
-    """Мониторит очередь ожидания и создает игры."""
-    while True:
-        await asyncio.sleep(5)
+    """Проверяет очередь ожидания и создает игры. Вызывается колесом таймеров."""
+    if _matchmaking_lock.locked():
+        # Предыдущий проход еще не закончился — пропускаем тик
+        return
+    async with _matchmaking_lock:
         try:
             waiting_players = list(await game_manager.get_waiting_players())
-            logger.info(f"Monitoring: {len(waiting_players)} waiting players.")
-            
-            if len(waiting_players) >= 6:
-                players_for_game = waiting_players[:6]
-                game_id = f"game_{int(time.time())}"
-                game = GameState()
-                
-                for player_id in players_for_game:
-                    user_info_json = await redis_master.get(f"seka:user_info:{player_id}")
-                    if user_info_json:
-                        user_info = json.loads(user_info_json)
-                        game.add_player(player_id, user_info)
-                        await redis_master.delete(f"seka:user_info:{player_id}")
-                    else:
-                        logger.warning(f"User info for player {player_id} not found in Redis. Removing from waiting queue.")
-                        await game_manager.remove_waiting_players([player_id])
-
-                if len(game.players) > 0:
-                    await game_manager.save_game(game_id, game)
-                    await game_manager.remove_waiting_players(players_for_game)
-                    logger.info(f"Created game {game_id} for players: {list(game.players.keys())}")
-                    
-                    await manager.broadcast({
-                        "type": "game_created",
-                        "game_id": game_id,
-                        "game_state": game.to_dict()
-                    }, list(game.players.keys()))
-                else:
-                    logger.warning("Game creation aborted because no player info could be retrieved.")
+            MATCHMAKING_QUEUE_SIZE.set(len(waiting_players))
+            ws_debug.debug("Monitoring: %d waiting players.", len(waiting_players))
+
+            # За один проход рассаживаются все полные столы, а не один стол за тик
+            created_at = int(time.time())
+            for table, start in enumerate(range(0, len(waiting_players) - 5, 6)):
+                await _seat_table(waiting_players[start:start + 6], f"game_{created_at}_{table}")
 
         except Exception as e:
             logger.error(f"Error in game state monitor: {e}")
 
+ESCROW_RECOVERY_INTERVAL = 600  # секунд между проверками зависших резервов
+ESCROW_RECOVERY_AGE = 300  # резерв моложе этого может принадлежать создаваемой игре
+
+async def recover_stale_escrows():
+    """Возвращает в кошельки фишки игр, пропавших из Redis (например, после сбоя)"""
+    try:
+        active_game_ids = await game_manager.get_active_game_ids()
+        async with AsyncSessionLocal() as db:
+            await WalletManager(db, balance_cache).refund_stale_escrows(active_game_ids, ESCROW_RECOVERY_AGE)
+    except Exception as e:
+        logger.error(f"Error in escrow recovery: {e}")
+
+LEADERBOARD_COMPACTION_INTERVAL = 3600  # секунд между сверками лидербордов с Postgres
+
+async def compact_leaderboards():
+    try:
+        async with AsyncSessionLocal() as db:
+            await leaderboard.compact(db)
+    except Exception as e:
+        logger.error(f"Error compacting leaderboards: {e}")
+
+LEDGER_MAINTENANCE_INTERVAL = 6 * 3600  # секунд между проходами обслуживания секций transactions
+ledger_maintenance = LedgerMaintenance(
+    AsyncSessionLocal,
+    retention_months=settings.LEDGER_RETENTION_MONTHS,
+    premake_months=settings.LEDGER_PREMAKE_MONTHS,
+)
+
+# --- Игровые действия ---
+# Действия одного стола выполняются последовательно; БД на этом пути не используется
+_game_locks: Dict[str, asyncio.Lock] = {}
+
+async def settle_table(game_id: str, game: GameState):
+    """Однократный расчет стола: фишки возвращаются в кошельки одной транзакцией"""
+    payouts = {int(pid): chips for pid, chips in game.payouts().items()}
+    svara_players = [int(pid) for pid in game.svara_players]
+    async with AsyncSessionLocal() as db:
+        settled, message, _ = await WalletManager(db, balance_cache, leaderboard).release_escrow(
+            game_id, payouts, svara_players
+        )
+    if not settled:
+        # Резервы остаются в БД и будут возвращены recover_stale_escrows
+        logger.error(f"Settlement of game {game_id} failed: {message}")
+    await game_manager.finish_game(game_id, list(game.players.keys()))
+    _cancel_table_timers(game_id)
+    _game_locks.pop(game_id, None)
+    logger.info(f"Game {game_id} settled: {payouts}")
+
+async def _commit_action(game_id: str, game: GameState):
+    """Принятый ход: вскрытие, расчет или сохранение стола, рассылка и таймер следующего хода"""
+    if game.round == "showdown" and game.status in ("playing", "svara"):
+        game.showdown_or_svara()
+
+    player_ids = list(game.players.keys())
+    if game.status == "finished":
+        await settle_table(game_id, game)
+    else:
+        await game_manager.save_game(game_id, game)
+        _sync_turn_timer(game_id, game)
+
+    await manager.broadcast_table(game_id, {
+        "type": "game_state",
+        "game_id": game_id,
+        "data": game.to_dict()
+    }, player_ids)
+
+async def handle_game_action(player_id: str, data: dict):
+    """Применяет ход игрока к состоянию стола и рассылает обновление"""
+    game_id = manager.player_tables.get(player_id) or await game_manager.get_player_active_game(player_id)
+    if not game_id:
+        await manager.send_personal_message({"type": "error", "data": {"message": "not_in_game"}}, player_id)
+        return
+
+    async with _game_locks.setdefault(game_id, asyncio.Lock()):
+        game = await game_manager.get_game(game_id)
+        try:
+            if game is None or player_id not in game.players:
+                await manager.send_personal_message({"type": "error", "data": {"message": "game_not_found"}}, player_id)
+                return
+
+            action = data.get("action")
+            try:
+                amount = int(data.get("amount") or 0)
+            except (TypeError, ValueError):
+                amount = 0
+            my_turn = game.current_turn == player_id
+
+            if action == "bet" and game.status == "betting":
+                accepted = game.place_initial_bet(player_id, amount)
+            elif action == "bet":
+                accepted = my_turn and game.place_bet(player_id, amount)
+            elif action == "call":
+                accepted = my_turn and game.place_bet(player_id, game.current_bet)
+            elif action == "fold":
+                accepted = game.fold(player_id)
+            else:
+                accepted = False
+
+            if not accepted:
+                await manager.send_personal_message({"type": "error", "data": {"message": "invalid_action"}}, player_id)
+                return
+
+            await _commit_action(game_id, game)
+        finally:
+            game_state_pool.release(game)
+
+async def handle_exit_game(player_id: str):
+    """Уход из-за стола: фишки игрока возвращаются в кошелек сразу"""
+    game_id = manager.player_tables.get(player_id) or await game_manager.get_player_active_game(player_id)
+    if not game_id:
+        return
+
+    async with _game_locks.setdefault(game_id, asyncio.Lock()):
+        game = await game_manager.get_game(game_id)
+        try:
+            if game is None or player_id not in game.players:
+                return
+            if game.status == "betting":
+                # Начальные ставки еще не в банке: стол отменяется, резервы возвращаются целиком
+                manager.player_tables.pop(player_id, None)
+                await _cancel_table(game_id, game, requeue=game.ready_players - {player_id})
+                logger.info(f"Game {game_id} cancelled: player {player_id} left before it started")
+                return
+            if player_id not in game.folded_players:
+                game.fold(player_id)
+
+            if game.status == "finished":
+                await settle_table(game_id, game)
+            else:
+                player = game.players[player_id]
+                chips = player.get('chips')
+                if chips is not None:
+                    async with AsyncSessionLocal() as db:
+                        await WalletManager(db, balance_cache, leaderboard).release_escrow(
+                            game_id, {int(player_id): chips}, [int(pid) for pid in game.svara_players]
+                        )
+                    player['chips'] = 0
+                player['status'] = 'left'
+                await game_manager.save_game(game_id, game)
+                await game_manager.leave_game(player_id)
+                _sync_turn_timer(game_id, game)
+
+            manager.player_tables.pop(player_id, None)
+            await manager.broadcast_table(game_id, {
+                "type": "player_left",
+                "game_id": game_id,
+                "data": {"playerId": player_id}
+            }, list(game.players.keys()))
+        finally:
+            game_state_pool.release(game)
+
+# --- Дедлайны ---
+# Таймаут хода, ожидания в очереди и сбора стола обслуживает колесо таймеров процесса.
+# Коллбеки перепроверяют состояние в Redis, поэтому устаревший таймер ничего не делает
+TURN_TIMEOUT = GAME_CONFIG['player_timeout']  # секунд на ход, затем карты сбрасываются за игрока
+QUEUE_TIMEOUT = GAME_CONFIG['queue_timeout']  # секунд в seka:waiting, затем игрок снимается с очереди
+STALE_TABLE_TIMEOUT = GAME_CONFIG['game_timeout']  # секунд на начальные ставки, затем стол отменяется
+_turn_timers: Dict[str, TimerHandle] = {}
+_stale_timers: Dict[str, TimerHandle] = {}
+
+def _sync_turn_timer(game_id: str, game: GameState):
+    """Таймер хода следует за current_turn; вне торгов таймер снимается"""
+    handle = _turn_timers.get(game_id)
+    if game.status in ("playing", "svara") and game.current_turn:
+        if handle is not None and handle.active and handle.args[1] == game.current_turn:
+            return
+        if handle is not None:
+            handle.cancel()
+        _turn_timers[game_id] = timer_wheel.call_later(TURN_TIMEOUT, _on_turn_timeout, game_id, game.current_turn)
+    elif handle is not None:
+        handle.cancel()
+        del _turn_timers[game_id]
+
+def _schedule_stale_check(game_id: str, delay: float):
+    handle = _stale_timers.pop(game_id, None)
+    if handle is not None:
+        handle.cancel()
+    _stale_timers[game_id] = timer_wheel.call_later(max(delay, 0), _reap_stale_table, game_id)
+
+def _cancel_table_timers(game_id: str):
+    for timers in (_turn_timers, _stale_timers):
+        handle = timers.pop(game_id, None)
+        if handle is not None:
+            handle.cancel()
+
+def _stale_table_delay(game: GameState) -> float:
+    """Сколько осталось до отмены неначатого стола; стол без created_at отсчитывается заново"""
+    if not game.created_at:
+        return STALE_TABLE_TIMEOUT
+    return STALE_TABLE_TIMEOUT - (datetime.now() - datetime.fromisoformat(game.created_at)).total_seconds()
+
+async def _on_turn_timeout(game_id: str, player_id: str):
+    """Игрок не сходил за TURN_TIMEOUT: карты сбрасываются за него"""
+    async with _game_locks.setdefault(game_id, asyncio.Lock()):
+        game = await game_manager.get_game(game_id)
+        try:
+            if game is None or game.current_turn != player_id or game.status not in ("playing", "svara"):
+                return
+            if game.fold(player_id):
+                logger.info(f"Player {player_id} folded by turn timeout in game {game_id}")
+                await _commit_action(game_id, game)
+        finally:
+            game_state_pool.release(game)
+
+async def _reap_stale_table(game_id: str):
+    """Стол так и не начался (кто-то не сделал начальную ставку): резервы возвращаются, стол удаляется"""
+    _stale_timers.pop(game_id, None)
+    async with _game_locks.setdefault(game_id, asyncio.Lock()):
+        game = await game_manager.get_game(game_id)
+        try:
+            if game is None or game.status != "betting":
+                return
+            await _cancel_table(game_id, game, requeue=set(game.ready_players))
+            logger.warning(f"Stale game {game_id} cancelled before it started")
+        finally:
+            game_state_pool.release(game)
+
+async def _cancel_table(game_id: str, game: GameState, requeue: Set[str]):
+    """
+    Отмена неначатого стола (вызывается под блокировкой стола): резервы
+    возвращаются целиком, игроки из requeue снова встают в очередь
+    """
+    async with AsyncSessionLocal() as db:
+        refunded, message, _ = await WalletManager(db, balance_cache).refund_escrow(game_id)
+    if not refunded:
+        # Резервы останутся в БД и будут возвращены recover_stale_escrows
+        logger.error(f"Cannot refund buy-ins of cancelled game {game_id}: {message}")
+    player_ids = list(game.players.keys())
+    await game_manager.finish_game(game_id, player_ids)
+    _cancel_table_timers(game_id)
+    _game_locks.pop(game_id, None)
+    await manager.broadcast_table(game_id, {"type": "game_cancelled", "game_id": game_id}, player_ids)
+    for player_id in requeue:
+        await redis_master.set(f"seka:user_info:{player_id}", json.dumps(game.players[player_id]['user_info']))
+        if await game_manager.add_waiting_player(player_id):
+            timer_wheel.call_later(QUEUE_TIMEOUT, _expire_waiting, player_id)
+
+async def _expire_waiting(player_id: str):
+    """Снимает игрока с очереди, если он ждет дольше QUEUE_TIMEOUT"""
+    since = await redis_master.hget(game_manager.waiting_since_key, player_id)
+    if since is None:
+        # Уже за столом или сам вышел из очереди
+        return
+    remaining = float(since) + QUEUE_TIMEOUT - time.time()
+    if remaining > 0:
+        timer_wheel.call_later(remaining, _expire_waiting, player_id)
+        return
+    await game_manager.remove_waiting_players([player_id])
+    await redis_master.delete(f"seka:user_info:{player_id}")
+    await manager.send_personal_message({"type": "error", "data": {"message": "matchmaking_timeout"}}, player_id)
+    logger.info(f"Player {player_id} removed from the waiting queue by timeout")
+
+async def restore_deadlines():
+    """Дедлайны очереди и столов после рестарта: колесо таймеров процесса начинается пустым"""
+    now = time.time()
+    waiting_since = await redis_slave.hgetall(game_manager.waiting_since_key)
+    for player_id, since in waiting_since.items():
+        timer_wheel.call_later(max(float(since) + QUEUE_TIMEOUT - now, 0), _expire_waiting, player_id)
+    game_ids = await game_manager.get_active_game_ids()
+    for game_id in game_ids:
+        game = await game_manager.get_game(game_id)
+        try:
+            if game is None:
+                continue
+            if game.status == "betting":
+                _schedule_stale_check(game_id, _stale_table_delay(game))
+            _sync_turn_timer(game_id, game)
+        finally:
+            game_state_pool.release(game)
+    logger.info(f"Deadlines restored: {len(waiting_since)} waiting players, {len(game_ids)} tables")
+
 # --- Жизненный цикл приложения (Lifespan) ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Логика при старте
     logger.info("Starting up application...")
+    # Ошибку конфигурации вебхука показываем сразу, до подключения к Redis и БД
+    bot_webhook_url = webhook_url() if BOT_MODE == "webhook" else None
+    if settings.TRACE_SAMPLE_RATE > 0:
+        tracer.configure(settings.TRACE_SAMPLE_RATE, FileSpanExporter(settings.TRACE_FILE))
+        logger.info(f"Tracing {settings.TRACE_SAMPLE_RATE:.0%} of messages to {settings.TRACE_FILE}")
+    if settings.LOOP_STALL_THRESHOLD > 0:
+        watchdog.start()
     await game_manager.initialize()
     logger.info("Successfully connected to Redis.")
     
-    # Запускаем мониторинг состояния игры в фоне
-    monitor_task = asyncio.create_task(monitor_game_state())
+    # Все таймауты и периодические проверки обслуживает общее колесо таймеров
+    timer_wheel.start()
+    await restore_deadlines()
+    monitor_timer = timer_wheel.call_every(MATCHMAKING_INTERVAL, monitor_game_state)
+    escrow_timer = timer_wheel.call_every(ESCROW_RECOVERY_INTERVAL, recover_stale_escrows)
+    await ledger_maintenance.run()
+    ledger_timer = timer_wheel.call_every(LEDGER_MAINTENANCE_INTERVAL, ledger_maintenance.run)
+    leaderboard_timer = timer_wheel.call_every(LEADERBOARD_COMPACTION_INTERVAL, compact_leaderboards)
     logger.info("Game state monitor started.")
     
-    await application.initialize()
-    await application.updater.start_polling()
-    await application.start()
-    logger.info("Telegram bot started.")
+    if BOT_MODE != "off":
+        await application.initialize()
+        if BOT_MODE == "webhook":
+            # Апдейты приходят на telegram_webhook; цикл опроса в игровом процессе не нужен
+            await application.bot.set_webhook(
+                url=bot_webhook_url,
+                secret_token=BOT_WEBHOOK_SECRET,
+                max_connections=BOT_MAX_CONCURRENT_UPDATES,
+            )
+        else:
+            await application.updater.start_polling()
+        await application.start()
+        logger.info(f"Telegram bot started in {BOT_MODE} mode.")
     
     yield
     # Логика при остановке
     logger.info("Shutting down application...")
-    await application.stop()
-    await application.updater.stop()
-    monitor_task.cancel()
-    try:
-        await monitor_task
-    except asyncio.CancelledError:
-        logger.info("Game state monitor task cancelled.")
+    if BOT_MODE != "off":
+        if application.updater.running:
+            await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+    monitor_timer.cancel()
+    escrow_timer.cancel()
+    ledger_timer.cancel()
+    leaderboard_timer.cancel()
+    await timer_wheel.stop()
+    logger.info("Game state monitor stopped.")
+    tracer.configure(0.0)  # дописывает очередь трейсов в файл
+    watchdog.stop()
+    profiler.stop()
     logger.info("Application shutdown complete.")
 
 # --- Инициализация FastAPI ---
@@ -220,47 +701,144 @@ app.add_middleware(
 app.mount("/static", StaticFiles(directory="build/static"), name="static")
 templates = Jinja2Templates(directory="build")
 
-# --- HTML-Serving Routes ---
-@app.get("/{full_path:path}", response_class=HTMLResponse)
-async def read_root(request: Request, full_path: str):
-    return templates.TemplateResponse("index.html", {"request": request})
-
 # --- WebSocket эндпоинт ---
+def _parse_seq(value) -> Optional[int]:
+    """Номер последнего полученного клиентом события (None, если не передан)"""
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _authenticate_websocket(websocket: WebSocket) -> Optional[dict]:
+    """
+    Возвращает данные пользователя Telegram для соединения.
+    Сессионный токен проверяется дешево; initData — запасной путь для старых клиентов.
+    """
+    token = websocket.query_params.get("token")
+    if token:
+        claims = verify_session_token(token, settings.SESSION_SIGNING_KEY)
+        return claims.get("user") if claims else None
+
+    init_data = websocket.query_params.get("initData")
+    if not init_data:
+        return None
+    auth_fields = get_verifier(settings.BOT_TOKEN, settings.INIT_DATA_MAX_AGE).verify(init_data)
+    return auth_fields.get('user', {}) if auth_fields else None
+
+
 @app.websocket("/ws/{player_id}")
 async def websocket_endpoint(websocket: WebSocket, player_id: str):
     """Обрабатывает WebSocket-соединения от игроков."""
-    init_data = websocket.query_params.get("initData")
-    if not init_data or not verify_telegram_data(init_data, settings.BOT_TOKEN):
-        logger.warning(f"WebSocket connection rejected for player {player_id}: Invalid initData")
+    admitted, reason = admission.admit()
+    if not admitted:
+        logger.warning(f"WebSocket connection refused for player {player_id}: {reason}")
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    user_info = _authenticate_websocket(websocket)
+    if user_info is None:
+        logger.warning(f"WebSocket connection rejected for player {player_id}: Invalid credentials")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    if 'id' in user_info and str(user_info['id']) != player_id:
+        logger.warning(f"Player ID mismatch: {player_id} vs {user_info['id']}")
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
     await manager.connect(websocket, player_id)
     
     try:
-        # Сохраняем информацию о пользователе из initData
-        parsed_data = dict(parse_qsl(unquote(init_data)))
-        user_info = json.loads(parsed_data.get('user', '{}'))
-        if 'id' in user_info:
-            player_id_from_data = str(user_info['id'])
-            if player_id_from_data != player_id:
-                 logger.warning(f"Player ID mismatch: {player_id} vs {player_id_from_data}")
-                 await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-                 return
-            
-            await redis_master.set(f"seka:user_info:{player_id}", json.dumps(user_info))
-            logger.info(f"Saved user info for player {player_id}")
+        last_seq = _parse_seq(websocket.query_params.get("last_seq"))
+
+        # Если игрок переподключается к идущей игре — досылаем пропущенное
+        active_game = await game_manager.get_player_active_game(player_id)
+        if active_game:
+            manager.player_tables[player_id] = _decode(active_game)
+            await manager.resume(player_id, _decode(active_game), last_seq)
 
+        connection_limiter = TokenBucket(settings.WS_RATE_LIMIT, settings.WS_RATE_BURST)
+        # Бюджет нарушений: одиночные всплески прощаются, устойчивый флуд приводит к разрыву
+        violation_budget = TokenBucket(1.0, settings.WS_MAX_VIOLATIONS)
+        violations = 0
         while True:
-            data = await websocket.receive_json()
-            logger.info(f"Received message from {player_id}: {data}")
+            raw = await websocket.receive_text()
+            if raw == "ping":
+                # Heartbeat клиента; используется и для замера задержки
+                await websocket.send_text("pong")
+                continue
+            if len(raw) > settings.WS_MAX_MESSAGE_SIZE:
+                logger.warning(f"Message from {player_id} is too big ({len(raw)} bytes), closing connection")
+                await websocket.close(code=status.WS_1009_MESSAGE_TOO_BIG)
+                manager.disconnect(player_id, websocket)
+                return
+
+            table_id = manager.player_tables.get(player_id)
+            if not connection_limiter.consume() or (table_id and not table_limiter.consume(table_id)):
+                violations += 1
+                if not violation_budget.consume():
+                    logger.warning(f"Player {player_id} keeps flooding, closing connection")
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                    manager.disconnect(player_id, websocket)
+                    return
+                if violations == 1 or violations % 10 == 0:
+                    await manager.send_personal_message(
+                        {"type": "error", "data": {"message": "rate_limited"}}, player_id
+                    )
+                continue
+
+            try:
+                data = json.loads(raw)
+            except json.JSONDecodeError:
+                await manager.send_personal_message(
+                    {"type": "error", "data": {"message": "invalid_json"}}, player_id
+                )
+                continue
+            if not isinstance(data, dict):
+                continue
+            ws_debug.debug("Received message from %s: %s", player_id, data)
+            message_type = data.get("type")
+
+            # Каждое входящее действие — корневой span трейса (если попало в выборку)
+            with tracer.start_trace("ws.message", {"message.type": str(message_type), "player.id": player_id}):
+                if message_type == "find_game":
+                    # Данные пользователя нужны монитору очереди (возможно, в другом воркере),
+                    # поэтому в Redis они пишутся только при входе в очередь, а не на каждое подключение
+                    await redis_master.set(f"seka:user_info:{player_id}", json.dumps(user_info))
+                    if await game_manager.add_waiting_player(player_id):
+                        timer_wheel.call_later(QUEUE_TIMEOUT, _expire_waiting, player_id)
+
+                elif message_type == "cancel_matchmaking":
+                    await game_manager.remove_waiting_players([player_id])
+                    await redis_master.delete(f"seka:user_info:{player_id}")
+
+                elif message_type == "game_action":
+                    await handle_game_action(player_id, data)
+
+                elif message_type == "exit_game":
+                    await handle_exit_game(player_id)
+
+                elif message_type == "resume":
+                    # Досылается только стол, за которым игрок сидит; game_id клиента лишь сверяется
+                    game_id = await game_manager.get_player_active_game(player_id)
+                    requested = data.get("game_id")
+                    if not game_id or (requested and str(requested) != _decode(game_id)):
+                        await manager.send_personal_message(
+                            {"type": "error", "data": {"message": "not_in_game"}}, player_id
+                        )
+                    else:
+                        await manager.resume(player_id, _decode(game_id), _parse_seq(data.get("last_seq")))
 
     except WebSocketDisconnect:
-        manager.disconnect(player_id)
+        manager.disconnect(player_id, websocket)
         logger.info(f"Player {player_id} disconnected.")
     except Exception as e:
         logger.error(f"Error in websocket for player {player_id}: {e}")
-        manager.disconnect(player_id)
+        manager.disconnect(player_id, websocket)
 
 # --- API эндпоинты ---
 @app.post("/api/validate-init-data")
@@ -273,13 +851,19 @@ async def validate_init_data_endpoint(request: Request):
             logger.error("initData not provided in request body")
             raise HTTPException(status_code=400, detail="initData not provided")
 
-        if verify_telegram_data(init_data, settings.BOT_TOKEN):
-            parsed_data = dict(parse_qsl(unquote(init_data)))
-            user_data = json.loads(parsed_data.get('user', '{}'))
-            return {"status": "ok", "user": user_data}
+        auth_fields = get_verifier(settings.BOT_TOKEN, settings.INIT_DATA_MAX_AGE).verify(init_data)
+        if auth_fields:
+            user_data = auth_fields.get('user', {})
+            if 'id' not in user_data:
+                raise HTTPException(status_code=403, detail="initData has no user")
+            # Короткоживущий токен избавляет от повторной проверки initData на горячих путях
+            token = issue_session_token(user_data, settings.SESSION_SIGNING_KEY, settings.SESSION_TTL)
+            return {"status": "ok", "user": user_data, "token": token, "expires_in": settings.SESSION_TTL}
         else:
             logger.warning(f"Invalid Telegram initData received.")
             raise HTTPException(status_code=403, detail="Invalid Telegram initData")
+    except HTTPException:
+        raise
     except json.JSONDecodeError:
         logger.error("Failed to decode JSON from request body")
         raise HTTPException(status_code=400, detail="Invalid JSON format")
@@ -287,18 +871,172 @@ async def validate_init_data_endpoint(request: Request):
         logger.error(f"Unexpected error in validate_init_data_endpoint: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+def get_current_user(authorization: Optional[str] = Header(None)) -> dict:
+    """Зависимость REST-эндпоинтов: проверяет сессионный токен из заголовка Authorization"""
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Session token required")
+    claims = verify_session_token(authorization[len("Bearer "):], settings.SESSION_SIGNING_KEY)
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired session token")
+    return claims
+
+def get_admin_user(claims: dict = Depends(get_current_user)) -> dict:
+    """Зависимость служебных эндпоинтов: только пользователи из ADMIN_IDS"""
+    if int(claims["sub"]) not in settings.ADMIN_IDS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return claims
+
 @app.get("/api/wallet/balance")
-async def get_balance(telegram_id: int, db: Session = Depends(get_session)):
-    wallet = WalletManager(db)
-    balance = wallet.get_balance(telegram_id)
+async def get_balance(telegram_id: Optional[int] = None, db: AsyncSession = Depends(get_async_session),
+                      claims: dict = Depends(get_current_user)):
+    if telegram_id is None:
+        telegram_id = int(claims["sub"])
+    elif str(telegram_id) != claims["sub"]:
+        raise HTTPException(status_code=403, detail="Access to another player's wallet is forbidden")
+    wallet = WalletManager(db, balance_cache)
+    balance = await wallet.get_balance(telegram_id)
     if balance is None:
         raise HTTPException(status_code=404, detail="Player not found")
     return {"balance": balance}
 
+@app.get("/api/wallet/history")
+async def get_history(limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None,
+                      action: Optional[str] = None, game_id: Optional[str] = None,
+                      db: AsyncSession = Depends(get_async_session),
+                      claims: dict = Depends(get_current_user)):
+    wallet = WalletManager(db)
+    try:
+        transactions, next_cursor = await wallet.get_transaction_page(
+            int(claims["sub"]), limit=limit, cursor=cursor, action=action, game_id=game_id
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"transactions": transactions, "next_cursor": next_cursor}
+
+@app.get("/api/stats")
+async def get_stats(db: AsyncSession = Depends(get_async_session), claims: dict = Depends(get_current_user)):
+    stats = await StatsManager(db).get_stats(int(claims["sub"]))
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No games played yet")
+    return stats
+
+@app.get("/api/leaderboard")
+async def get_leaderboard(period: str = "global", metric: str = "net_profit",
+                          limit: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_async_session)):
+    """
+    Лидерборд по выигрышу из sorted set'а Redis. Другие метрики, а также общий
+    лидерборд, пока Redis недоступен или еще не заполнен, читаются из player_stats
+    """
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"Unknown period, expected one of {list(PERIODS)}")
+    if metric not in LEADERBOARD_METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric, expected one of {sorted(LEADERBOARD_METRICS)}")
+    if metric != "net_profit" and period != "global":
+        raise HTTPException(status_code=400, detail="Only net_profit is ranked per period")
+
+    stats_manager = StatsManager(db)
+    if metric == "net_profit":
+        try:
+            entries = await leaderboard.top(period, limit)
+        except Exception as e:
+            if period != "global":
+                raise HTTPException(status_code=503, detail="Leaderboard is temporarily unavailable")
+            logger.warning(f"Leaderboard read failed, falling back to player_stats: {e}")
+            entries = []
+        if entries or period != "global":
+            names = await stats_manager.get_player_names([telegram_id for telegram_id, _ in entries])
+            return {
+                "period": period,
+                "metric": metric,
+                "players": [
+                    {"rank": position, "telegram_id": telegram_id, "name": names.get(telegram_id), "net_profit": score}
+                    for position, (telegram_id, score) in enumerate(entries, start=1)
+                ]
+            }
+
+    rows = await stats_manager.get_leaderboard(metric, limit)
+    return {
+        "period": period,
+        "metric": metric,
+        "players": [
+            {"rank": position, "name": row["first_name"] or row["username"], **row}
+            for position, row in enumerate(rows, start=1)
+        ]
+    }
+
+@app.get("/api/leaderboard/me")
+async def get_my_rank(period: str = "global", radius: int = Query(2, ge=0, le=10),
+                      db: AsyncSession = Depends(get_async_session), claims: dict = Depends(get_current_user)):
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"Unknown period, expected one of {list(PERIODS)}")
+    telegram_id = int(claims["sub"])
+    ranked = await leaderboard.rank(telegram_id, period)
+    if ranked is None:
+        raise HTTPException(status_code=404, detail="Player is not ranked in this period")
+    neighbours = await leaderboard.around(telegram_id, period, radius)
+    names = await StatsManager(db).get_player_names([member for _, member, _ in neighbours])
+    return {
+        "period": period,
+        "rank": ranked[0],
+        "net_profit": ranked[1],
+        "neighbours": [
+            {"rank": position, "telegram_id": member, "name": names.get(member), "net_profit": score}
+            for position, member, score in neighbours
+        ]
+    }
+
+@app.post(BOT_WEBHOOK_PATH)
+async def telegram_webhook(request: Request,
+                           x_telegram_bot_api_secret_token: Optional[str] = Header(None)):
+    if BOT_MODE != "webhook":
+        raise HTTPException(status_code=404, detail="Webhook mode is disabled")
+    if not hmac.compare_digest((x_telegram_bot_api_secret_token or "").encode(), BOT_WEBHOOK_SECRET.encode()):
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON format")
+    if not await enqueue_webhook_update(application, data):
+        # Telegram повторит доставку; так всплеск апдейтов не растит очередь без предела
+        raise HTTPException(status_code=503, detail="Update queue is full")
+    return {"ok": True}
+
+@app.post("/api/admin/profiler")
+async def start_profiler(duration: float = Query(30, gt=0, le=600), interval: float = Query(0.005, ge=0.001, le=1),
+                         admin: dict = Depends(get_admin_user)):
+    """Запускает статистический профилировщик потока event loop на duration секунд"""
+    if not profiler.start(duration, interval):
+        raise HTTPException(status_code=409, detail="Profiler is already running")
+    logger.info(f"Profiler started by {admin['sub']} for {duration}s")
+    return profiler.status()
+
+@app.get("/api/admin/profiler")
+async def get_profile(format: str = Query("json", pattern="^(json|collapsed)$"),
+                      admin: dict = Depends(get_admin_user)):
+    """Результат профилировщика: сводка или свернутые стеки для flamegraph.pl/speedscope"""
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed())
+    return {**profiler.status(), "top": profiler.top()}
+
+@app.get("/api/admin/stalls")
+async def get_loop_stalls(admin: dict = Depends(get_admin_user)):
+    """Последние блокировки event loop, пойманные сторожем, со стеками"""
+    return {"threshold": watchdog.threshold, "stalls": list(watchdog.stalls)}
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "ok"}
 
+# --- HTML-Serving Routes ---
+# Регистрируется последним, иначе перехватывает GET-запросы к /api/*
+@app.get("/{full_path:path}", response_class=HTMLResponse)
+async def read_root(request: Request, full_path: str):
+    return templates.TemplateResponse("index.html", {"request": request})
+
 logger.info("Application configured.")
 
 if __name__ == "__main__":
@@ -306,4 +1044,4 @@ if __name__ == "__main__":
     # Get port from environment variable or default to 8080
     
     logger.info(f"Starting server on http://0.0.0.0:{8000}")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_max_size=settings.WS_MAX_MESSAGE_SIZE)
\ No newline at end of file
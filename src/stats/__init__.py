@@ -0,0 +1,196 @@
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+from src.models import Player, PlayerStats
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Фрагмент CTE для расчета игры: ожидает выше по запросу CTE
+# results (player_id, net, svara) — по строке на игрока, завершившего игру.
+# Вставляется в тот же запрос, что и зачисление фишек, поэтому статистика
+# обновляется атомарно с расчетом и одной операцией на всю раздачу.
+RECORD_RESULTS_CTE = """
+    recorded AS (
+        INSERT INTO player_stats AS s
+            (player_id, games_played, wins, losses, current_streak, net_profit, svara_count, updated_at)
+        SELECT player_id, 1,
+               CASE WHEN net > 0 THEN 1 ELSE 0 END,
+               CASE WHEN net > 0 THEN 0 ELSE 1 END,
+               CASE WHEN net > 0 THEN 1 ELSE -1 END,
+               net,
+               CASE WHEN svara THEN 1 ELSE 0 END,
+               now()
+        FROM results
+        ON CONFLICT (player_id) DO UPDATE SET
+            games_played = s.games_played + 1,
+            wins = s.wins + EXCLUDED.wins,
+            losses = s.losses + EXCLUDED.losses,
+            current_streak = CASE WHEN EXCLUDED.wins = 1 THEN GREATEST(s.current_streak, 0) + 1
+                                  ELSE LEAST(s.current_streak, 0) - 1 END,
+            net_profit = s.net_profit + EXCLUDED.net_profit,
+            svara_count = s.svara_count + EXCLUDED.svara_count,
+            updated_at = EXCLUDED.updated_at
+        RETURNING player_id
+    )
+"""
+
+# Пересчет из журнала: исход игры — строка 'win' или 'loss' расчета,
+# результат — сумма вступления, расчета и возвратов. Архивированные месяцы
+# берутся из transaction_daily_summary, открытые резервы компенсируют 'join'
+# еще не завершенных игр. Число свар в журнал не пишется и сохраняется как есть.
+_REBUILD = text("""
+    WITH live AS (
+        SELECT player_id,
+               COUNT(*) FILTER (WHERE action IN ('win', 'loss')) AS games,
+               COUNT(*) FILTER (WHERE action = 'win') AS wins,
+               COALESCE(SUM(amount) FILTER (WHERE action IN ('join', 'win', 'loss', 'refund')), 0) AS net
+        FROM transactions
+        GROUP BY player_id
+    ),
+    archived AS (
+        SELECT player_id,
+               COALESCE(SUM(transactions_count) FILTER (WHERE action IN ('win', 'loss')), 0) AS games,
+               COALESCE(SUM(transactions_count) FILTER (WHERE action = 'win'), 0) AS wins,
+               COALESCE(SUM(amount) FILTER (WHERE action IN ('join', 'win', 'loss', 'refund')), 0) AS net
+        FROM transaction_daily_summary
+        GROUP BY player_id
+    ),
+    open_escrows AS (
+        SELECT player_id, SUM(amount) AS amount FROM escrows GROUP BY player_id
+    ),
+    ordered AS (
+        SELECT player_id, action,
+               ROW_NUMBER() OVER (PARTITION BY player_id ORDER BY created_at DESC, id DESC) AS rn,
+               ROW_NUMBER() OVER (PARTITION BY player_id, action ORDER BY created_at DESC, id DESC) AS rn_action
+        FROM transactions
+        WHERE action IN ('win', 'loss')
+    ),
+    streaks AS (
+        -- Номера совпадают только у ведущей серии одинаковых исходов
+        SELECT player_id, CASE WHEN MIN(action) = 'win' THEN COUNT(*) ELSE -COUNT(*) END AS streak
+        FROM ordered
+        WHERE rn = rn_action
+        GROUP BY player_id
+    ),
+    totals AS (
+        SELECT p.id AS player_id,
+               COALESCE(l.games, 0) + COALESCE(a.games, 0) AS games,
+               COALESCE(l.wins, 0) + COALESCE(a.wins, 0) AS wins,
+               COALESCE(l.net, 0) + COALESCE(a.net, 0) + COALESCE(e.amount, 0) AS net,
+               COALESCE(st.streak, 0) AS streak
+        FROM players p
+        LEFT JOIN live l ON l.player_id = p.id
+        LEFT JOIN archived a ON a.player_id = p.id
+        LEFT JOIN open_escrows e ON e.player_id = p.id
+        LEFT JOIN streaks st ON st.player_id = p.id
+    ),
+    rebuilt AS (
+        INSERT INTO player_stats AS s
+            (player_id, games_played, wins, losses, current_streak, net_profit, svara_count, updated_at)
+        SELECT player_id, games, wins, games - wins, streak, net, 0, now()
+        FROM totals
+        WHERE games > 0 OR EXISTS (SELECT 1 FROM player_stats WHERE player_stats.player_id = totals.player_id)
+        ON CONFLICT (player_id) DO UPDATE SET
+            games_played = EXCLUDED.games_played,
+            wins = EXCLUDED.wins,
+            losses = EXCLUDED.losses,
+            current_streak = EXCLUDED.current_streak,
+            net_profit = EXCLUDED.net_profit,
+            updated_at = EXCLUDED.updated_at
+        RETURNING 1
+    )
+    SELECT COUNT(*) FROM rebuilt
+""")
+
+LEADERBOARD_METRICS = {
+    "net_profit": PlayerStats.net_profit,
+    "wins": PlayerStats.wins,
+}
+
+
+def _stats_dict(stats: PlayerStats) -> Dict:
+    return {
+        "games_played": stats.games_played,
+        "wins": stats.wins,
+        "losses": stats.losses,
+        "current_streak": stats.current_streak,
+        "net_profit": stats.net_profit,
+        "svara_count": stats.svara_count,
+    }
+
+
+class StatsManager:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_stats(self, telegram_id: int) -> Optional[Dict]:
+        """Статистика игрока (None, если он еще не сыграл ни одной игры)"""
+        try:
+            result = await self.db.execute(
+                select(PlayerStats)
+                .join(Player, Player.id == PlayerStats.player_id)
+                .where(Player.telegram_id == telegram_id)
+            )
+            stats = result.scalar_one_or_none()
+            return _stats_dict(stats) if stats is not None else None
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting stats for user {telegram_id}: {e}")
+            return None
+
+    async def get_leaderboard(self, metric: str = "net_profit", limit: int = 10) -> List[Dict]:
+        """Топ игроков по метрике; читается по индексу idx_player_stats_<metric>"""
+        column = LEADERBOARD_METRICS[metric]
+        try:
+            result = await self.db.execute(
+                select(PlayerStats, Player.telegram_id, Player.first_name, Player.username)
+                .join(Player, Player.id == PlayerStats.player_id)
+                .where(PlayerStats.games_played > 0)
+                .order_by(column.desc(), PlayerStats.player_id)
+                .limit(limit)
+            )
+            return [
+                {
+                    "telegram_id": telegram_id,
+                    "first_name": first_name,
+                    "username": username,
+                    **_stats_dict(stats),
+                }
+                for stats, telegram_id, first_name, username in result
+            ]
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting leaderboard by {metric}: {e}")
+            return []
+
+    async def get_player_names(self, telegram_ids: List[int]) -> Dict[int, str]:
+        """Отображаемые имена игроков по telegram_id (для лидербордов из Redis)"""
+        if not telegram_ids:
+            return {}
+        try:
+            result = await self.db.execute(
+                select(Player.telegram_id, Player.first_name, Player.username)
+                .where(Player.telegram_id.in_(telegram_ids))
+            )
+            return {telegram_id: first_name or username for telegram_id, first_name, username in result}
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting player names: {e}")
+            return {}
+
+    async def rebuild(self) -> int:
+        """
+        Пересчитать статистику всех игроков из журнала транзакций одним запросом
+
+        Returns:
+            Количество пересчитанных игроков
+        """
+        try:
+            result = await self.db.execute(_REBUILD)
+            count = result.scalar_one()
+            await self.db.commit()
+            logger.info(f"Player stats rebuilt for {count} players")
+            return count
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Error rebuilding player stats: {e}", exc_info=True)
+            return 0
@@ -0,0 +1,198 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("global", "daily", "weekly")
+
+# Итог игрока по играм, рассчитанным в периоде: выплата минус ставка входа
+# той же игры (у settle_game строки 'join' нет — там сумма уже является итогом)
+_PERIOD_RESULTS = text("""
+    SELECT p.telegram_id, SUM(r.amount + COALESCE(j.amount, 0)) AS net
+    FROM transactions r
+    JOIN players p ON p.id = r.player_id
+    LEFT JOIN transactions j
+        ON j.game_id = r.game_id AND j.player_id = r.player_id AND j.action = 'join'
+    WHERE r.action IN ('win', 'loss')
+      AND r.created_at >= :start
+    GROUP BY p.telegram_id
+""")
+
+_GLOBAL_RESULTS = text("""
+    SELECT p.telegram_id, s.net_profit AS net
+    FROM player_stats s
+    JOIN players p ON p.id = s.player_id
+    WHERE s.games_played > 0
+""")
+
+
+# Итоги игры в лидерборд; пока идет compact() (есть ключ-метка), итоги
+# дублируются в журнал, чтобы пересобранный набор их не потерял.
+# KEYS: набор, метка, журнал; ARGV: TTL набора (0 — без срока), TTL журнала,
+# затем пары участник/приращение
+_RECORD_SCRIPT = """
+local journal = redis.call('EXISTS', KEYS[2]) == 1
+for i = 3, #ARGV, 2 do
+    redis.call('ZINCRBY', KEYS[1], ARGV[i + 1], ARGV[i])
+    if journal then
+        redis.call('ZINCRBY', KEYS[3], ARGV[i + 1], ARGV[i])
+    end
+end
+if tonumber(ARGV[1]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+if journal then
+    redis.call('EXPIRE', KEYS[3], ARGV[2])
+end
+return 1
+"""
+
+# Подмена набора пересобранным: выборка из Postgres плюс журнал итогов,
+# записанных за время пересборки. KEYS: набор, выборка, журнал, метка;
+# ARGV: TTL набора (0 — без срока)
+_SWAP_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 or redis.call('EXISTS', KEYS[3]) == 1 then
+    redis.call('ZUNIONSTORE', KEYS[1], 2, KEYS[2], KEYS[3])
+    if tonumber(ARGV[1]) > 0 then
+        redis.call('EXPIRE', KEYS[1], ARGV[1])
+    end
+else
+    redis.call('DEL', KEYS[1])
+end
+redis.call('DEL', KEYS[2], KEYS[3], KEYS[4])
+return redis.call('ZCARD', KEYS[1])
+"""
+
+
+class Leaderboard:
+    """
+    Лидерборды по выигрышу в sorted set'ах Redis: общий, за день и за неделю.
+
+    При расчете игры итоги игроков добавляются через ZINCRBY, так что место
+    любого игрока (ZREVRANK) находится за O(log n) без сканирования таблиц.
+    Redis не является источником истины: compact() периодически пересобирает
+    наборы из Postgres, исправляя пропущенные при сбоях Redis обновления.
+    """
+
+    def __init__(self, redis_client, key_prefix: str = "seka:leaderboard:"):
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        # Наборы периода живут чуть дольше самого периода
+        self.period_ttl = {"daily": 2 * 86400, "weekly": 15 * 86400}
+        # Предел одной пересборки: метка упавшей compact() не держит журнал вечно
+        self.compaction_timeout = 600
+        self._record = redis_client.register_script(_RECORD_SCRIPT)
+        self._swap = redis_client.register_script(_SWAP_SCRIPT)
+
+    def _key(self, period: str, now: Optional[datetime] = None) -> str:
+        now = now or datetime.now(timezone.utc)
+        if period == "global":
+            return f"{self.key_prefix}global"
+        if period == "daily":
+            return f"{self.key_prefix}daily:{now:%Y%m%d}"
+        if period == "weekly":
+            year, week, _ = now.isocalendar()
+            return f"{self.key_prefix}weekly:{year}-W{week:02d}"
+        raise ValueError(f"Unknown leaderboard period: {period}")
+
+    @staticmethod
+    def _period_start(period: str, now: datetime) -> datetime:
+        day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if period == "daily":
+            return day
+        return day - timedelta(days=now.weekday())
+
+    async def record(self, results: Dict[int, int], now: Optional[datetime] = None) -> None:
+        """Добавить итоги рассчитанной игры {telegram_id: выигрыш} во все лидерборды"""
+        if not results:
+            return
+        increments = [value for telegram_id, net in results.items() for value in (str(telegram_id), net)]
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for period in PERIODS:
+                    key = self._key(period, now)
+                    await self._record(
+                        keys=[key, f"{key}:compacting", f"{key}:journal"],
+                        args=[self.period_ttl.get(period, 0), self.compaction_timeout, *increments],
+                        client=pipe,
+                    )
+                await pipe.execute()
+        except Exception as e:
+            # Расхождение исправит следующая compact()
+            logger.warning(f"Leaderboard update failed: {e}")
+
+    async def top(self, period: str = "global", limit: int = 10) -> List[Tuple[int, int]]:
+        """Первые limit игроков: [(telegram_id, выигрыш), ...]"""
+        entries = await self.redis.zrevrange(self._key(period), 0, limit - 1, withscores=True)
+        return [(int(member), int(score)) for member, score in entries]
+
+    async def rank(self, telegram_id: int, period: str = "global") -> Optional[Tuple[int, int]]:
+        """Место игрока (с 1) и его выигрыш; None, если игрока нет в лидерборде"""
+        key = self._key(period)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zrevrank(key, str(telegram_id))
+            pipe.zscore(key, str(telegram_id))
+            position, score = await pipe.execute()
+        if position is None:
+            return None
+        return position + 1, int(score)
+
+    async def around(self, telegram_id: int, period: str = "global",
+                     radius: int = 2) -> List[Tuple[int, int, int]]:
+        """Соседи игрока по таблице: [(место, telegram_id, выигрыш), ...]"""
+        key = self._key(period)
+        position = await self.redis.zrevrank(key, str(telegram_id))
+        if position is None:
+            return []
+        start = max(position - radius, 0)
+        entries = await self.redis.zrevrange(key, start, position + radius, withscores=True)
+        return [(start + i + 1, int(member), int(score)) for i, (member, score) in enumerate(entries)]
+
+    async def compact(self, db: AsyncSession, now: Optional[datetime] = None,
+                      batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Пересобрать лидерборды из Postgres
+
+        Перед запросом ставится метка: пока она есть, record() пишет итоги
+        еще и в журнал. Выборка строится во временном ключе, и Lua-скрипт
+        одним шагом подменяет набор суммой выборки и журнала, поэтому
+        читатели не видят частично заполненный лидерборд, а итоги игр,
+        рассчитанных во время пересборки, не теряются. Игра, рассчитанная
+        в момент самого запроса, может попасть и в выборку, и в журнал —
+        это исправит следующая compact().
+
+        Returns:
+            Число игроков в каждом пересобранном лидерборде
+        """
+        now = now or datetime.now(timezone.utc)
+        sizes = {}
+        for period in PERIODS:
+            key = self._key(period, now)
+            staging, journal, marker = f"{key}:staging", f"{key}:journal", f"{key}:compacting"
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.delete(staging, journal)
+                pipe.set(marker, 1, ex=self.compaction_timeout)
+                await pipe.execute()
+            try:
+                if period == "global":
+                    result = await db.execute(_GLOBAL_RESULTS)
+                else:
+                    result = await db.execute(_PERIOD_RESULTS, {"start": self._period_start(period, now)})
+                while True:
+                    rows = result.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    await self.redis.zadd(staging, {str(row.telegram_id): int(row.net) for row in rows})
+            except Exception:
+                # Текущий набор не тронут; итоги и так попали в него через record()
+                await self.redis.delete(staging, journal, marker)
+                raise
+            sizes[period] = await self._swap(
+                keys=[key, staging, journal, marker], args=[self.period_ttl.get(period, 0)]
+            )
+        logger.info(f"Leaderboards compacted: {sizes}")
+        return sizes
@@ -3,16 +3,19 @@ from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
 import os
-from .db import get_session
+import hashlib
+import hmac
+from typing import Optional
+from urllib.parse import urlparse
+from .db import AsyncSessionLocal
 from .wallet import WalletManager
+from .wallet.cache import BalanceCache
+from .stats import StatsManager
+from .stats.leaderboard import Leaderboard
 from .models import Player
-from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
@@ -20,62 +23,139 @@ load_dotenv()
 # Конфигурация
 TELEGRAM_BOT_TOKEN = os.getenv("BOT_TOKEN")
 WEBAPP_URL = os.getenv("WEB_APP_URL", "").strip()
+# Режим получения апдейтов: polling — опрос getUpdates внутри игрового сервера,
+# webhook — Telegram присылает апдейты на BOT_WEBHOOK_PATH, off — бот запущен отдельно (run_bot.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+BOT_WEBHOOK_URL = os.getenv("BOT_WEBHOOK_URL", "").strip().rstrip("/")  # публичный адрес сервера
+BOT_WEBHOOK_PATH = "/telegram/webhook"
+# Секрет заголовка X-Telegram-Bot-Api-Secret-Token; по умолчанию выводится из токена бота
+BOT_WEBHOOK_SECRET = os.getenv("BOT_WEBHOOK_SECRET") or hmac.new(
+    b"SekaWebhook", (TELEGRAM_BOT_TOKEN or "").encode(), hashlib.sha256
+).hexdigest()
+# Предел апдейтов в очереди; сверх него вебхук отвечает 503 и Telegram повторит доставку позже
+BOT_WEBHOOK_MAX_PENDING = int(os.getenv("BOT_WEBHOOK_MAX_PENDING", "256"))
+# Адрес Bot API; переопределяется для локального стенда (benchmarks/fake_telegram.py)
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "").strip().rstrip("/")
+
+# Сколько апдейтов бот обрабатывает одновременно; держим меньше пула соединений БД,
+# чтобы всплеск /start не занимал соединения, нужные расчетам игр
+BOT_MAX_CONCURRENT_UPDATES = int(os.getenv("BOT_MAX_CONCURRENT_UPDATES", "8"))
 
 if not TELEGRAM_BOT_TOKEN:
     logger.critical("BOT_TOKEN не найден в переменных окружения!")
     exit(1)
 
 
-async def get_or_create_player(db: Session, user: dict) -> Player:
-    """Получить или создать игрока"""
-    player = db.query(Player).filter(Player.telegram_id == user.id).first()
-    if not player:
-        player = Player(
+async def register_player(db: AsyncSession, user) -> Optional[int]:
+    """
+    Зарегистрировать игрока, если его еще нет, одним запросом
+
+    Returns:
+        Начальный баланс только что созданного игрока или None, если игрок уже был
+    """
+    result = await db.execute(
+        insert(Player)
+        .values(
             telegram_id=user.id,
             first_name=user.first_name,
             last_name=user.last_name,
             username=user.username,
-            photo_url=user.photo_url if hasattr(user, 'photo_url') else None,
+            photo_url=getattr(user, 'photo_url', None),
             balance=1000
         )
-        db.add(player)
-        db.commit()
-        db.refresh(player)
-    return player
+        .on_conflict_do_nothing(index_elements=[Player.telegram_id])
+        .returning(Player.balance)
+    )
+    balance = result.scalar_one_or_none()
+    await db.commit()
+    return balance
+
+
+HISTORY_PAGE_SIZE = 5
+LEADERBOARD_SIZE = 10
+
+LEADERBOARD_TITLES = {
+    'global': 'Рейтинг за все время',
+    'daily': 'Рейтинг дня',
+    'weekly': 'Рейтинг недели'
+}
+
+ACTION_TEXT = {
+    'bet': 'Ставка',
+    'win': 'Выигрыш',
+    'loss': 'Проигрыш',
+    'fold': 'Фолд',
+    'svara': 'Свара',
+    'join': 'Вход в игру',
+    'bluff': 'Блеф',
+    'refund': 'Возврат'
+}
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка команды /start"""
     try:
         user = update.effective_user
-        db = next(get_session())
-
-        try:
-            player = await get_or_create_player(db, user)
-            wallet = WalletManager(db)
-            balance = wallet.get_balance(user.id)
-
-            keyboard = [
-                [InlineKeyboardButton("🎮 Играть", web_app=WebAppInfo(url=WEBAPP_URL))],
-                [InlineKeyboardButton("💰 Баланс", callback_data="balance")],
-                [InlineKeyboardButton("📊 Статистика", callback_data="stats")],
-                [InlineKeyboardButton("📜 История транзакций", callback_data="history")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-
-            await update.message.reply_text(
-                f"Добро пожаловать в СЕКА, {user.first_name}!\n"
-                f"Ваш текущий баланс: {balance}₽\n\n"
-                "Выберите действие:",
-                reply_markup=reply_markup
-            )
-        finally:
-            db.close()
+
+        async with AsyncSessionLocal() as db:
+            balance = await register_player(db, user)
+            if balance is None:
+                # Игрок уже есть — баланс обычно берется из кэша без запроса к БД
+                balance = await WalletManager(db, context.bot_data.get("balance_cache")).get_balance(user.id)
+
+        keyboard = [
+            [InlineKeyboardButton("🎮 Играть", web_app=WebAppInfo(url=WEBAPP_URL))],
+            [InlineKeyboardButton("💰 Баланс", callback_data="balance")],
+            [InlineKeyboardButton("📊 Статистика", callback_data="stats")],
+            [InlineKeyboardButton("📜 История транзакций", callback_data="history")]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+
+        await update.message.reply_text(
+            f"Добро пожаловать в СЕКА, {user.first_name}!\n"
+            f"Ваш текущий баланс: {balance}₽\n\n"
+            "Выберите действие:",
+            reply_markup=reply_markup
+        )
     except Exception as e:
         logger.error(f"Ошибка в команде start: {str(e)}", exc_info=True)
         await update.message.reply_text("Произошла ошибка при обработке команды. Пожалуйста, попробуйте позже.")
 
 
+async def top(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработка команды /top [daily|weekly]"""
+    try:
+        leaderboard = context.bot_data.get("leaderboard")
+        if leaderboard is None:
+            await update.message.reply_text("Рейтинг временно недоступен")
+            return
+
+        period = context.args[0].lower() if context.args else "global"
+        if period not in LEADERBOARD_TITLES:
+            await update.message.reply_text("Использование: /top [daily|weekly]")
+            return
+
+        user_id = update.effective_user.id
+        entries = await leaderboard.top(period, LEADERBOARD_SIZE)
+        ranked = await leaderboard.rank(user_id, period)
+        async with AsyncSessionLocal() as db:
+            names = await StatsManager(db).get_player_names([telegram_id for telegram_id, _ in entries])
+
+        if not entries:
+            await update.message.reply_text(f"{LEADERBOARD_TITLES[period]}: пока никто не играл")
+            return
+
+        text = f"{LEADERBOARD_TITLES[period]}:\n"
+        for position, (telegram_id, score) in enumerate(entries, start=1):
+            text += f"{position}. {names.get(telegram_id) or telegram_id}: {score:+}₽\n"
+        if ranked is not None:
+            text += f"\nВаше место: {ranked[0]} ({ranked[1]:+}₽)"
+        await update.message.reply_text(text)
+    except Exception as e:
+        logger.error(f"Ошибка в команде top: {str(e)}", exc_info=True)
+        await update.message.reply_text("Произошла ошибка при обработке команды. Пожалуйста, попробуйте позже.")
+
+
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка нажатий на кнопки"""
     try:
@@ -83,66 +163,110 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.answer()
 
         user_id = update.effective_user.id
-        db = next(get_session())
 
-        try:
-            wallet = WalletManager(db)
+        async with AsyncSessionLocal() as db:
+            # Баланс отдается из кэша; сессия не берет соединение, пока нет запросов к БД
+            wallet = WalletManager(db, context.bot_data.get("balance_cache"))
 
             if query.data == "balance":
-                balance = wallet.get_balance(user_id)
+                balance = await wallet.get_balance(user_id)
                 await query.edit_message_text(f"Ваш баланс: {balance}₽")
 
             elif query.data == "stats":
-                player = db.query(Player).filter(Player.telegram_id == user_id).first()
-                if player:
-                    win_rate = player.wins / player.games_played * 100 if player.games_played > 0 else 0
+                stats = await StatsManager(db).get_stats(user_id)
+                if stats:
+                    win_rate = stats['wins'] / stats['games_played'] * 100 if stats['games_played'] > 0 else 0
+                    streak = stats['current_streak']
+                    streak_text = f"{streak} побед" if streak > 0 else f"{-streak} поражений" if streak < 0 else "—"
                     await query.edit_message_text(
                         f"Статистика:\n"
-                        f"Игр сыграно: {player.games_played}\n"
-                        f"Побед: {player.wins}\n"
-                        f"Процент побед: {win_rate:.1f}%"
+                        f"Игр сыграно: {stats['games_played']}\n"
+                        f"Побед: {stats['wins']}\n"
+                        f"Поражений: {stats['losses']}\n"
+                        f"Процент побед: {win_rate:.1f}%\n"
+                        f"Текущая серия: {streak_text}\n"
+                        f"Итог: {stats['net_profit']:+}₽\n"
+                        f"Свар: {stats['svara_count']}"
                     )
+                else:
+                    await query.edit_message_text("Вы еще не сыграли ни одной игры")
 
-            elif query.data == "history":
-                transactions = wallet.get_transaction_history(user_id, limit=5)
+            elif query.data == "history" or query.data.startswith("history:"):
+                # Курсор следующей страницы передается в callback_data кнопки
+                cursor = query.data.partition(":")[2] or None
+                try:
+                    transactions, next_cursor = await wallet.get_transaction_page(
+                        user_id, limit=HISTORY_PAGE_SIZE, cursor=cursor
+                    )
+                except ValueError:
+                    transactions, next_cursor = [], None
                 if transactions:
-                    history_text = "Последние транзакции:\n"
+                    history_text = "Последние транзакции:\n" if cursor is None else "Более ранние транзакции:\n"
                     for t in transactions:
-                        action_text = {
-                            'bet': 'Ставка',
-                            'win': 'Выигрыш',
-                            'loss': 'Проигрыш',
-                            'fold': 'Фолд',
-                            'svara': 'Свара',
-                            'join': 'Вход в игру',
-                            'bluff': 'Блеф'
-                        }.get(t['action'], t['action'])
-
+                        action_text = ACTION_TEXT.get(t['action'], t['action'])
                         history_text += f"{action_text}: {t['amount']}₽ ({t['created_at'].strftime('%d.%m %H:%M')})\n"
-                    await query.edit_message_text(history_text)
+                    reply_markup = None
+                    if next_cursor:
+                        reply_markup = InlineKeyboardMarkup(
+                            [[InlineKeyboardButton("⬇️ Ранее", callback_data=f"history:{next_cursor}")]]
+                        )
+                    await query.edit_message_text(history_text, reply_markup=reply_markup)
                 else:
                     await query.edit_message_text("История транзакций пуста")
-        finally:
-            db.close()
     except Exception as e:
         logger.error(f"Ошибка в обработке кнопок: {str(e)}", exc_info=True)
         await query.answer("Произошла ошибка. Пожалуйста, попробуйте позже.")
 
 
+async def enqueue_webhook_update(app: Application, data: dict) -> bool:
+    """
+    Поставить апдейт из вебхука в очередь приложения
+
+    Обработку выполняет app.start() с ограничением BOT_MAX_CONCURRENT_UPDATES,
+    поэтому вебхук отвечает сразу. При переполненной очереди возвращает False.
+    """
+    if app.update_queue.qsize() >= BOT_WEBHOOK_MAX_PENDING:
+        return False
+    await app.update_queue.put(Update.de_json(data, app.bot))
+    return True
+
+
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик ошибок"""
     logger.error("Exception while handling an update:", exc_info=context.error)
 
 
-def create_bot_app() -> Application:
+def webhook_url() -> str:
+    """
+    Адрес, который регистрируется в Telegram для режима webhook.
+
+    Telegram доставляет апдейты только по HTTPS, поэтому пустой или не-https
+    BOT_WEBHOOK_URL — ошибка конфигурации, о которой надо узнать при старте,
+    а не по молчащему боту.
+    """
+    if not BOT_WEBHOOK_URL:
+        raise ValueError("Режим webhook требует BOT_WEBHOOK_URL (публичный https-адрес сервера)")
+    parsed = urlparse(BOT_WEBHOOK_URL)
+    if parsed.scheme != "https" or not parsed.netloc:
+        raise ValueError(f"BOT_WEBHOOK_URL должен быть https-адресом, получено: {BOT_WEBHOOK_URL!r}")
+    return f"{BOT_WEBHOOK_URL}{BOT_WEBHOOK_PATH}"
+
+
+def create_bot_app(balance_cache: Optional[BalanceCache] = None,
+                   leaderboard: Optional[Leaderboard] = None) -> Application:
     """Создает и настраивает приложение бота."""
     if not TELEGRAM_BOT_TOKEN:
         raise ValueError("BOT_TOKEN не найден в переменных окружения!")
         
-    app_builder = Application.builder().token(TELEGRAM_BOT_TOKEN)
+    app_builder = Application.builder().token(TELEGRAM_BOT_TOKEN).concurrent_updates(BOT_MAX_CONCURRENT_UPDATES)
+    if TELEGRAM_API_BASE_URL:
+        app_builder = app_builder.base_url(f"{TELEGRAM_API_BASE_URL}/bot").base_file_url(f"{TELEGRAM_API_BASE_URL}/file/bot")
     app = app_builder.build()
+    app.bot_data["balance_cache"] = balance_cache
+    app.bot_data["leaderboard"] = leaderboard
 
     app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("top", top))
     app.add_handler(CallbackQueryHandler(button_handler))
     app.add_error_handler(error_handler)
     
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as FrameCounter, deque
+from typing import Dict, List, Optional
+
+from .metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+LOOP_STALLS = Counter("seka_event_loop_stalls_total", "Блокировки event loop дольше порога сторожа")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> str:
+    """Стек кадра в свернутом виде для flamegraph.pl / speedscope: корень;...;лист"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class LoopWatchdog:
+    """
+    Сторож event loop
+
+    Loop раз в interval отмечает сердцебиение; поток сторожа проверяет, как
+    давно оно было. Если дольше threshold, loop занят синхронным кодом —
+    сторож снимает стек потока loop'а, пишет его в лог и сохраняет в stalls.
+    Об одной блокировке сообщается один раз, с длительностью на момент снимка.
+    """
+
+    def __init__(self, threshold: float = 0.25, interval: float = 0.05, keep: int = 50):
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls: deque = deque(maxlen=keep)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._beat_handle = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Запустить из корутины в event loop, который нужно сторожить"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._beat()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Event loop watchdog started (threshold {self.threshold}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self._beat_handle is not None:
+            self._beat_handle.cancel()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _beat(self):
+        self._last_beat = time.monotonic()
+        self._beat_handle = self._loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            blocked = time.monotonic() - beat
+            if blocked < self.threshold or beat == reported_beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            reported_beat = beat
+            stack = "".join(traceback.format_stack(frame))
+            del frame
+            LOOP_STALLS.inc()
+            self.stalls.append({"at": time.time(), "blocked": round(blocked, 3), "stack": stack})
+            logger.warning(f"Event loop blocked for {blocked:.3f}s, stack:\n{stack}")
+
+
+class SamplingProfiler:
+    """
+    Статистический профилировщик потока event loop
+
+    Отдельный поток раз в interval снимает стек потока loop'а и считает
+    одинаковые стеки. Результат — свернутые стеки ("a;b;c 42"), которые
+    принимают flamegraph.pl, speedscope и inferno. Код loop'а не
+    инструментируется, поэтому накладные расходы не зависят от нагрузки.
+    """
+
+    def __init__(self):
+        self.samples: FrameCounter = FrameCounter()
+        self.interval = 0.005
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._target_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # samples пополняет поток сбора, а читают обработчики в loop'е
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float, interval: float = 0.005, thread_id: Optional[int] = None) -> bool:
+        """Начать сбор на duration секунд; False, если сбор уже идет"""
+        if self.running:
+            return False
+        self.samples = FrameCounter()
+        self.interval = interval
+        self.started_at = time.time()
+        self.finished_at = None
+        self._target_thread_id = thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(duration,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def _run(self, duration: float):
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline and not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is None:
+                break
+            stack = _collapse(frame)
+            del frame
+            with self._lock:
+                self.samples[stack] += 1
+        self.finished_at = time.time()
+
+    def _snapshot(self) -> List:
+        with self._lock:
+            return list(self.samples.items())
+
+    def collapsed(self) -> str:
+        snapshot = sorted(self._snapshot(), key=lambda item: item[1], reverse=True)
+        return "".join(f"{stack} {count}\n" for stack, count in snapshot)
+
+    def status(self) -> Dict:
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "interval": self.interval,
+            "samples": sum(count for _, count in self._snapshot()),
+        }
+
+    def top(self, limit: int = 20) -> List[Dict]:
+        """Функции с наибольшим собственным временем (лист стека)"""
+        leaves: FrameCounter = FrameCounter()
+        for stack, count in self._snapshot():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [{"frame": frame, "samples": count, "share": round(count / total, 4)}
+                for frame, count in leaves.most_common(limit)]
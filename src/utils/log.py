@@ -0,0 +1,200 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from .rate_limit import TokenBucket
+
+# Префикс отладочного канала: подробные дампы (каждая карта, полное состояние стола,
+# каждое сообщение сокета). По умолчанию канал выключен и проверка isEnabledFor
+# отсекает такие записи до форматирования
+DEBUG_CHANNEL = "seka.debug"
+
+# Атрибуты LogRecord, которые не считаются пользовательскими полями (extra=...)
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+
+
+def debug_channel(name: str) -> logging.Logger:
+    """Логгер отладочного канала seka.debug.<name>"""
+    return logging.getLogger(f"{DEBUG_CHANNEL}.{name}")
+
+
+def parse_logger_rates(raw: str) -> Dict[str, float]:
+    """Разбор строки вида "seka_game=0.1,src.game.engine=0.5" в {логгер: число}"""
+    rates = {}
+    for item in (raw or "").split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip():
+            try:
+                rates[name.strip()] = float(value)
+            except ValueError:
+                continue
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись; поля из extra=... попадают в запись как есть"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Выборка и ограничение частоты записей по логгерам
+
+    sampling — доля сохраняемых записей (0.1 — каждая десятая в среднем),
+    rate_limits — не больше N записей в секунду. Правило логгера наследуется
+    дочерними логгерами. WARNING и выше проходят всегда. Число отброшенных
+    записей добавляется к следующей прошедшей в поле dropped.
+    """
+
+    def __init__(self, sampling: Dict[str, float] = None, rate_limits: Dict[str, float] = None):
+        super().__init__()
+        self.sampling = sampling or {}
+        self.rate_limits = rate_limits or {}
+        self._rules: Dict[str, tuple] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._dropped: Dict[str, int] = {}
+
+    def _rule(self, name: str) -> tuple:
+        rule = self._rules.get(name)
+        if rule is None:
+            sample, limit = None, None
+            parts = name.split(".")
+            for i in range(len(parts), 0, -1):
+                prefix = ".".join(parts[:i])
+                if sample is None:
+                    sample = self.sampling.get(prefix)
+                if limit is None:
+                    limit = self.rate_limits.get(prefix)
+            rule = self._rules[name] = (sample, limit)
+        return rule
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        sample, limit = self._rule(record.name)
+        if sample is None and limit is None:
+            return True
+        if sample is not None and random.random() >= sample:
+            self._dropped[record.name] = self._dropped.get(record.name, 0) + 1
+            return False
+        if limit is not None:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                bucket = self._buckets[record.name] = TokenBucket(limit, max(limit, 1.0))
+            if not bucket.consume():
+                self._dropped[record.name] = self._dropped.get(record.name, 0) + 1
+                return False
+        dropped = self._dropped.pop(record.name, 0)
+        if dropped:
+            record.dropped = dropped
+        return True
+
+
+class _OffloopQueueHandler(QueueHandler):
+    """
+    QueueHandler, который только подставляет аргументы в сообщение
+
+    Стандартный prepare() форматирует запись целиком в потоке вызывающего;
+    здесь форматирование (JSON, время, traceback) выполняется в потоке
+    QueueListener, а в очередь уходит копия записи без ссылок на аргументы.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Объект исключения держит кадры стека; в очередь передаем только текст
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(level: str = "INFO", log_file: Optional[str] = None, json_format: bool = False,
+                      sampling: Dict[str, float] = None, rate_limits: Dict[str, float] = None,
+                      debug_channels: str = "") -> QueueListener:
+    """
+    Настроить корневой логгер: запись в консоль и файл идет в отдельном потоке
+
+    debug_channels — список каналов seka.debug через запятую ("engine,ws")
+    или "*" для всех; остальные отладочные каналы выключены.
+    """
+    global _listener
+    stop_logging()
+
+    if json_format:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S"
+        )
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _OffloopQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sampling, rate_limits))
+
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(queue_handler)
+    root_logger.setLevel(level.upper())
+
+    # Отладочные каналы выключены, пока не перечислены явно
+    debug_root = logging.getLogger(DEBUG_CHANNEL)
+    for name, existing in logging.root.manager.loggerDict.items():
+        if name.startswith(f"{DEBUG_CHANNEL}.") and isinstance(existing, logging.Logger):
+            existing.setLevel(logging.NOTSET)
+    channels = [name.strip() for name in (debug_channels or "").split(",") if name.strip()]
+    debug_root.setLevel(logging.DEBUG if "*" in channels else logging.CRITICAL + 1)
+    for name in channels:
+        if name != "*":
+            debug_channel(name).setLevel(logging.DEBUG)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Дописать очередь и остановить поток записи логов"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
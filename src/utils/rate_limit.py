@@ -0,0 +1,79 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket: в среднем rate событий в секунду, всплески до burst"""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated_at')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def consume(self, amount: float = 1.0) -> bool:
+        """Списывает токены; False — лимит исчерпан"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+
+class KeyedRateLimiter:
+    """Набор token bucket'ов по ключу (например, по столу) с ограничением числа ключей"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def consume(self, key: str, amount: float = 1.0) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.consume(amount)
+
+    def discard(self, key: str) -> None:
+        self._buckets.pop(key, None)
+
+
+class AdmissionController:
+    """
+    Серверный контроль допуска новых соединений.
+
+    Отказывает новым сокетам, когда число соединений или задержка
+    event loop превышают пороги, чтобы перегрузка не била по всем столам.
+    """
+
+    def __init__(self, max_connections: int, max_loop_lag: float,
+                 connection_count: Callable[[], int], loop_lag: Callable[[], float]):
+        self.max_connections = max_connections
+        self.max_loop_lag = max_loop_lag
+        self._connection_count = connection_count
+        self._loop_lag = loop_lag
+        self.rejected = 0
+
+    def admit(self) -> Tuple[bool, Optional[str]]:
+        """Можно ли принять новое соединение. Возвращает (решение, причина отказа)"""
+        connections = self._connection_count()
+        if connections >= self.max_connections:
+            self.rejected += 1
+            return False, f"too many connections ({connections})"
+        lag = self._loop_lag()
+        if lag > self.max_loop_lag:
+            self.rejected += 1
+            return False, f"event loop lag {lag:.3f}s"
+        return True, None
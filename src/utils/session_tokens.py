@@ -0,0 +1,46 @@
+import logging
+import time
+from typing import Dict, Optional
+
+from jose import jwt, JWTError
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = "HS256"
+TOKEN_TYPE = "session"
+
+
+def issue_session_token(user: Dict, secret: str, ttl: int) -> str:
+    """
+    Issues a short-lived signed session token after initData verification.
+
+    The Telegram user info travels in the claims, so the WebSocket handshake
+    and REST endpoints need neither initData nor a Redis lookup.
+    """
+    now = int(time.time())
+    claims = {
+        "sub": str(user["id"]),
+        "typ": TOKEN_TYPE,
+        "user": user,
+        "iat": now,
+        "exp": now + ttl,
+    }
+    return jwt.encode(claims, secret, algorithm=ALGORITHM)
+
+
+def verify_session_token(token: str, secret: str) -> Optional[Dict]:
+    """
+    Verifies a session token.
+
+    Returns:
+        The token claims if the signature is valid and the token has not
+        expired, None otherwise.
+    """
+    try:
+        claims = jwt.decode(token, secret, algorithms=[ALGORITHM])
+    except JWTError as e:
+        logger.debug(f"Session token rejected: {e}")
+        return None
+    if claims.get("typ") != TOKEN_TYPE or "sub" not in claims:
+        return None
+    return claims
@@ -1,52 +1,140 @@
 import hashlib
 import hmac
+import json
 import logging
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 from urllib.parse import parse_qsl
 
 logger = logging.getLogger(__name__)
 
-def verify_telegram_data(init_data: str, bot_token: str) -> bool:
+DEFAULT_MAX_AGE = 24 * 60 * 60  # How long initData stays fresh, in seconds
+DEFAULT_CACHE_TTL = 300
+DEFAULT_CACHE_SIZE = 10000
+
+
+class TelegramAuthVerifier:
+    """
+    Verifies Telegram Mini App initData for a single bot token.
+
+    The WebAppData secret key is derived once per token. Successfully verified
+    payloads are cached in a bounded TTL cache keyed on their hash, so the same
+    initData re-presented on reconnects skips parsing and HMAC entirely.
+    """
+
+    def __init__(self, bot_token: str, max_age: int = DEFAULT_MAX_AGE,
+                 cache_ttl: float = DEFAULT_CACHE_TTL, cache_size: int = DEFAULT_CACHE_SIZE):
+        # The secret key is the HMAC-SHA256 hash of the bot token
+        # using the string "WebAppData" as the key.
+        self._secret_key = hmac.new(
+            "WebAppData".encode(), bot_token.encode(), hashlib.sha256
+        ).digest()
+        self.max_age = max_age
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        # hash -> (raw initData, parsed fields, cache deadline)
+        self._cache: "OrderedDict[str, Tuple[str, Dict[str, str], float]]" = OrderedDict()
+
+    def verify(self, init_data: str) -> Optional[Dict[str, str]]:
+        """
+        Verifies initData and returns its fields.
+
+        Returns:
+            The parsed fields (without 'hash'; 'user' is decoded from JSON when
+            present) if the data is authentic and fresh, None otherwise.
+        """
+        try:
+            now = time.time()
+            received_hash = _extract_hash(init_data)
+            if not received_hash:
+                logger.error("Hash not found in initData")
+                return None
+
+            cached = self._cache.get(received_hash)
+            if cached is not None:
+                raw, fields, deadline = cached
+                if now < deadline and raw == init_data:
+                    self._cache.move_to_end(received_hash)
+                    return fields
+                del self._cache[received_hash]
+
+            parsed_data = dict(parse_qsl(init_data))
+            parsed_data.pop('hash', None)
+
+            # The data is sorted by key and formatted as 'key=value' pairs,
+            # separated by a newline character.
+            data_check_string = "\n".join(
+                f"{k}={v}" for k, v in sorted(parsed_data.items())
+            )
+            calculated_hash = hmac.new(
+                self._secret_key, data_check_string.encode(), hashlib.sha256
+            ).hexdigest()
+
+            if not hmac.compare_digest(calculated_hash.encode(), received_hash.encode()):
+                logger.debug(f"initData hash mismatch: received {received_hash}, calculated {calculated_hash}")
+                return None
+
+            expires_at = self._expires_at(parsed_data, now)
+            if expires_at is None:
+                return None
+
+            fields = dict(parsed_data)
+            if 'user' in fields:
+                fields['user'] = json.loads(fields['user'])
+            self._remember(received_hash, init_data, fields, min(expires_at, now + self.cache_ttl))
+            return fields
+        except Exception as e:
+            logger.error(f"Telegram data verification failed: {e}", exc_info=True)
+            return None
+
+    def _expires_at(self, parsed_data: Dict[str, str], now: float) -> Optional[float]:
+        """Returns the moment initData stops being fresh, or None if it is already stale."""
+        if not self.max_age:
+            return now + self.cache_ttl
+        try:
+            auth_date = int(parsed_data['auth_date'])
+        except (KeyError, ValueError):
+            logger.warning("auth_date missing or malformed in initData")
+            return None
+        expires_at = auth_date + self.max_age
+        if expires_at <= now:
+            logger.warning(f"Stale initData: auth_date {auth_date} is older than {self.max_age}s")
+            return None
+        return expires_at
+
+    def _remember(self, received_hash: str, init_data: str, fields: Dict[str, str], deadline: float):
+        self._cache[received_hash] = (init_data, fields, deadline)
+        self._cache.move_to_end(received_hash)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+def _extract_hash(init_data: str) -> Optional[str]:
+    """Extracts the hash value without parsing the whole payload."""
+    for part in init_data.split('&'):
+        if part.startswith('hash='):
+            return part[5:]
+    return None
+
+
+@lru_cache(maxsize=8)
+def get_verifier(bot_token: str, max_age: int = DEFAULT_MAX_AGE) -> TelegramAuthVerifier:
+    """Returns the shared verifier for a token, so the secret key is derived once."""
+    return TelegramAuthVerifier(bot_token, max_age=max_age)
+
+
+def verify_telegram_data(init_data: str, bot_token: str, max_age: int = DEFAULT_MAX_AGE) -> bool:
     """
     Verifies the authenticity of data received from a Telegram Mini App.
 
     Args:
         init_data: The raw initData string from Telegram.
         bot_token: Your Telegram bot token.
+        max_age: Maximum accepted age of auth_date in seconds (0 disables the check).
 
     Returns:
         True if the data is authentic, False otherwise.
     """
-    try:
-        parsed_data = dict(parse_qsl(init_data))
-        received_hash = parsed_data.pop('hash', None)
-
-        if not received_hash:
-            logger.error("Hash not found in initData")
-            return False
-
-        # The data is sorted by key and formatted as 'key=value' pairs,
-        # separated by a newline character.
-        data_check_string = "\n".join(
-            f"{k}={v}" for k, v in sorted(parsed_data.items())
-        )
-
-        # The secret key is the HMAC-SHA256 hash of the string "WebAppData"
-        # using the bot token as the key.
-        secret_key = hmac.new(
-            "WebAppData".encode(), bot_token.encode(), hashlib.sha256
-        ).digest()
-
-        # The calculated hash is the HMAC-SHA256 hash of the data_check_string
-        # using the secret_key.
-        calculated_hash = hmac.new(
-            secret_key, data_check_string.encode(), hashlib.sha256
-        ).hexdigest()
-
-        # For debugging purposes
-        logger.debug(f"Received hash: {received_hash}")
-        logger.debug(f"Calculated hash: {calculated_hash}")
-
-        return calculated_hash == received_hash
-    except Exception as e:
-        logger.error(f"Telegram data verification failed: {e}", exc_info=True)
-        return False 
\ No newline at end of file
+    return get_verifier(bot_token, max_age).verify(init_data) is not None
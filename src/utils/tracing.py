@@ -0,0 +1,306 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "seka-game"
+
+# Вид span'а в терминах OpenTelemetry
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("seka_current_span", default=None)
+
+
+class _Trace:
+    """Span'ы одного трейса; экспортируются вместе, когда завершается корневой"""
+    __slots__ = ('trace_id', 'spans', 'exported')
+
+    def __init__(self):
+        self.trace_id = random.getrandbits(128)
+        self.spans: List["Span"] = []
+        self.exported = False
+
+
+class Span:
+    __slots__ = ('tracer', 'trace', 'name', 'kind', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'status', 'status_message', '_token')
+
+    def __init__(self, tracer: "Tracer", trace: _Trace, name: str, parent_id: Optional[int],
+                 kind: int, attributes: Dict):
+        self.tracer = tracer
+        self.trace = trace
+        self.name = name
+        self.kind = kind
+        self.span_id = random.getrandbits(64)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.end_ns = 0
+        self._token = None
+        self.start_ns = time.time_ns()
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    def end(self):
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        if self.trace.exported:
+            # Задача, запущенная из запроса, пережила корневой span
+            return
+        self.trace.spans.append(self)
+        if self.parent_id is None:
+            self.trace.exported = True
+            self.tracer._export(self.trace)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None and not isinstance(exc, asyncio.CancelledError):
+            self.record_exception(exc)
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+    @property
+    def duration(self) -> float:
+        """Длительность в секундах (для завершенного span'а)"""
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+class _NoopSpan:
+    """Span трейса, не попавшего в выборку: все методы ничего не делают"""
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def span_to_otlp(span: Span) -> Dict:
+    """Span в формате OTLP/JSON"""
+    data = {
+        "traceId": f"{span.trace.trace_id:032x}",
+        "spanId": f"{span.span_id:016x}",
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+        "status": {"code": span.status, "message": span.status_message} if span.status else {},
+    }
+    if span.parent_id is not None:
+        data["parentSpanId"] = f"{span.parent_id:016x}"
+    return data
+
+
+def trace_to_otlp(spans: List[Span]) -> Dict:
+    """Запрос экспорта OTLP/JSON с span'ами одного трейса"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "seka"}, "spans": [span_to_otlp(span) for span in spans]}],
+        }]
+    }
+
+
+class InMemorySpanExporter:
+    """Сборщик последних span'ов в памяти (тесты, бенчмарки, отладка)"""
+
+    def __init__(self, max_spans: int = 10000):
+        self._spans: deque = deque(maxlen=max_spans)
+
+    def export(self, spans: List[Span]):
+        self._spans.extend(spans)
+
+    def spans(self) -> List[Span]:
+        return list(self._spans)
+
+    def clear(self):
+        self._spans.clear()
+
+    def shutdown(self):
+        pass
+
+
+class FileSpanExporter:
+    """
+    Запись трейсов в файл OTLP/JSON: по строке на трейс
+
+    Сериализация и запись выполняются в отдельном потоке, event loop только
+    кладет готовый трейс в очередь. Файл читает, например, filelog-приемник
+    OpenTelemetry Collector или otel-cli.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: List[Span]):
+        self._queue.put(spans)
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                spans = self._queue.get()
+                if spans is None:
+                    break
+                try:
+                    f.write(json.dumps(trace_to_otlp(spans), ensure_ascii=False) + "\n")
+                    if self._queue.empty():
+                        f.flush()
+                except Exception as e:
+                    logger.error(f"Failed to export trace: {e}")
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class Tracer:
+    """
+    Трейсер с выборкой на уровне корневого span'а
+
+    Решение о выборке принимается один раз в start_trace. Вне выбранного
+    трейса span() возвращает общий NOOP_SPAN, поэтому при выключенной
+    трассировке инструментирование стоит одного чтения contextvar.
+    """
+
+    def __init__(self):
+        self.sample_rate = 0.0
+        self.exporter = None
+
+    def configure(self, sample_rate: float, exporter=None):
+        """sample_rate — доля трейсов, попадающих в выборку (0 — трассировка выключена)"""
+        if self.exporter is not None and self.exporter is not exporter:
+            self.exporter.shutdown()
+        self.sample_rate = max(0.0, min(1.0, sample_rate)) if exporter is not None else 0.0
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0.0
+
+    def start_trace(self, name: str, attributes: Optional[Dict] = None):
+        """Корневой span входящего запроса (или дочерний, если трейс уже идет)"""
+        parent = _current_span.get()
+        if parent is not None:
+            return Span(self, parent.trace, name, parent.span_id, SPAN_KIND_INTERNAL, attributes or {})
+        if self.sample_rate <= 0.0 or random.random() >= self.sample_rate:
+            return NOOP_SPAN
+        return Span(self, _Trace(), name, None, SPAN_KIND_SERVER, attributes or {})
+
+    def span(self, name: str, attributes: Optional[Dict] = None, kind: int = SPAN_KIND_INTERNAL):
+        """Дочерний span текущего трейса; вне трейса — NOOP_SPAN"""
+        parent = _current_span.get()
+        if parent is None:
+            return NOOP_SPAN
+        return Span(self, parent.trace, name, parent.span_id, kind, attributes or {})
+
+    def _export(self, trace: _Trace):
+        exporter = self.exporter
+        if exporter is not None:
+            exporter.export(trace.spans)
+
+
+tracer = Tracer()
+
+
+def traced(name: str):
+    """Декоратор: вызов функции (обычной или корутинной) — дочерний span текущего трейса"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return await func(*args, **kwargs)
+                with tracer.span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def instrument_sqlalchemy(engine):
+    """Span на каждый SQL-запрос движка (для AsyncEngine передается engine.sync_engine)"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        span = tracer.span("db.statement", kind=SPAN_KIND_CLIENT)
+        if span is not NOOP_SPAN:
+            span.attributes["db.system"] = "postgresql"
+            span.attributes["db.statement"] = statement[:500]
+            context._trace_span = span
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        context = exception_context.execution_context
+        span = getattr(context, "_trace_span", None) if context is not None else None
+        if span is not None:
+            span.record_exception(exception_context.original_exception)
+            span.end()
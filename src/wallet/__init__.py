@@ -1,98 +1,522 @@
-from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from src.models import Player, Transaction
+from src.wallet.cache import BalanceCache
+from src.stats import RECORD_RESULTS_CTE
+from src.stats.leaderboard import Leaderboard
+from src.utils.metrics import Histogram, timed
+from src.utils.tracing import traced
 import logging
-from typing import Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+DB_CALL_SECONDS = Histogram(
+    "seka_wallet_db_seconds", "Время операций кошелька в Postgres", ["call"]
+)
+
+
+def encode_history_cursor(created_at: datetime, transaction_id: int) -> str:
+    """Курсор истории: время (мкс с эпохи) и id последней транзакции страницы в hex.
+    Компактен, чтобы помещаться в callback_data кнопок бота (до 64 байт)."""
+    micros = (created_at - datetime(1970, 1, 1, tzinfo=timezone.utc)) // datetime.resolution
+    return f"{micros:x}-{transaction_id:x}"
+
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разбор курсора истории. ValueError для некорректного курсора"""
+    try:
+        micros, transaction_id = (int(part, 16) for part in cursor.split("-"))
+    except (ValueError, AttributeError):
+        raise ValueError(f"Invalid history cursor: {cursor!r}")
+    created_at = datetime(1970, 1, 1, tzinfo=timezone.utc) + micros * datetime.resolution
+    return created_at, transaction_id
+
 class WalletManager:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession, cache: Optional[BalanceCache] = None,
+                 leaderboard: Optional[Leaderboard] = None):
         self.db = db
+        self.cache = cache
+        self.leaderboard = leaderboard
 
-    def get_balance(self, telegram_id: int) -> Optional[int]:
-        """Получить баланс пользователя"""
+    async def get_balance(self, telegram_id: int) -> Optional[int]:
+        """Получить баланс пользователя (из кэша, если он подключен)"""
+        if self.cache is not None:
+            cached = await self.cache.get(telegram_id)
+            if cached is not None:
+                return cached
         try:
-            player = self.db.query(Player).filter(Player.telegram_id == telegram_id).first()
-            return player.balance if player else None
+            # Попадания в кэш в метрику БД не входят
+            with DB_CALL_SECONDS.time("get_balance"):
+                result = await self.db.execute(select(Player.balance).where(Player.telegram_id == telegram_id))
+            balance = result.scalar_one_or_none()
+            if balance is not None and self.cache is not None:
+                await self.cache.fill(telegram_id, balance)
+            return balance
         except SQLAlchemyError as e:
             logger.error(f"Error getting balance for user {telegram_id}: {e}")
             return None
 
-    def update_balance(self, telegram_id: int, amount: int, action: str, game_id: Optional[str] = None) -> Tuple[bool, str]:
+    @timed(DB_CALL_SECONDS, "update_balance")
+    @traced("wallet.update_balance")
+    async def update_balance(self, telegram_id: int, amount: int, action: str, game_id: Optional[str] = None) -> Tuple[bool, str]:
         """
         Обновить баланс пользователя
-        
+
         Args:
             telegram_id: ID пользователя в Telegram
             amount: Сумма изменения (положительная или отрицательная)
             action: Тип транзакции ('bet', 'win', 'loss', 'fold', 'svara', 'join', 'bluff')
             game_id: ID игры (опционально)
-            
+
         Returns:
             Tuple[bool, str]: (успех операции, сообщение)
         """
+        # Один условный UPDATE вместо чтения-проверки-записи: проверка средств и
+        # изменение баланса атомарны, запись транзакции вставляется в том же запросе
+        statement = text("""
+            WITH updated AS (
+                UPDATE players
+                SET balance = balance + :amount
+                WHERE telegram_id = :telegram_id AND balance + :amount >= 0
+                RETURNING id, balance
+            ),
+            inserted AS (
+                INSERT INTO transactions (player_id, game_id, amount, action)
+                SELECT id, :game_id, :amount, :action FROM updated
+                RETURNING id
+            )
+            SELECT updated.balance, inserted.id AS version FROM updated, inserted
+        """)
         try:
-            player = self.db.query(Player).filter(Player.telegram_id == telegram_id).first()
-            if not player:
-                return False, "Игрок не найден"
-
-            # Проверка достаточности средств для списания
-            if amount < 0 and abs(amount) > player.balance:
+            result = await self.db.execute(statement, {
+                "telegram_id": telegram_id,
+                "amount": amount,
+                "action": action,
+                "game_id": game_id,
+            })
+            row = result.one_or_none()
+            if row is None:
+                await self.db.rollback()
+                # Холодный путь: выясняем причину отказа
+                exists = await self.db.execute(select(Player.id).where(Player.telegram_id == telegram_id))
+                if exists.scalar_one_or_none() is None:
+                    return False, "Игрок не найден"
                 return False, "Недостаточно средств"
+            await self.db.commit()
+            if self.cache is not None:
+                await self.cache.store(telegram_id, row.balance, row.version)
 
-            # Обновляем баланс
-            player.balance += amount
-
-            # Дополнительная проверка на отрицательный баланс (на случай гонки)
-            if player.balance < 0:
-                self.db.rollback()
-                logger.error(f"Баланс стал отрицательным для пользователя {telegram_id}")
-                return False, "Ошибка: баланс не может быть отрицательным"
-
-            # Создаем запись о транзакции
-            transaction = Transaction(
-                player_id=player.id,
-                game_id=game_id,
-                amount=amount,
-                action=action
-            )
-            self.db.add(transaction)
-            self.db.commit()
-
-            return True, f"Баланс успешно обновлен. Новый баланс: {player.balance}"
+            return True, f"Баланс успешно обновлен. Новый баланс: {row.balance}"
         except SQLAlchemyError as e:
             try:
-                self.db.rollback()
+                await self.db.rollback()
             except Exception as rollback_exc:
                 logger.error(f"Rollback error: {rollback_exc}")
             logger.error(f"Error updating balance for user {telegram_id}: {e}", exc_info=True)
             return False, "Ошибка при обновлении баланса"
 
-    def get_transaction_history(self, telegram_id: int, limit: int = 10) -> list:
-        """Получить историю транзакций пользователя"""
+    @timed(DB_CALL_SECONDS, "settle_game")
+    @traced("wallet.settle_game")
+    async def settle_game(self, game_id: str, deltas: Dict[int, int]) -> Tuple[bool, str, Dict[int, int]]:
+        """
+        Провести итоги раздачи одной транзакцией БД
+
+        Все изменения балансов применяются одним UPDATE ... FROM (VALUES ...),
+        записи транзакций вставляются пачкой в том же запросе. Проверка
+        достаточности средств выполняется в SQL: если хотя бы один баланс
+        ушел бы в минус (или игрок не найден), раздача не проводится целиком.
+
+        Args:
+            game_id: ID игры
+            deltas: Изменения баланса по telegram_id (выигрыш > 0, проигрыш < 0)
+
+        Returns:
+            Tuple[bool, str, Dict[int, int]]: (успех, сообщение, новые балансы по telegram_id)
+        """
+        if not deltas:
+            return True, "Нечего проводить", {}
+
+        # Сортировка по telegram_id — одинаковый порядок блокировок строк у параллельных расчетов
+        items = sorted(deltas.items())
+        values = ", ".join(
+            f"(CAST(:t{i} AS BIGINT), CAST(:a{i} AS INTEGER))" for i in range(len(items))
+        )
+        params = {"game_id": game_id}
+        for i, (telegram_id, amount) in enumerate(items):
+            params[f"t{i}"] = telegram_id
+            params[f"a{i}"] = amount
+
+        statement = text(f"""
+            WITH deltas (telegram_id, amount) AS (VALUES {values}),
+            updated AS (
+                UPDATE players AS p
+                SET balance = p.balance + d.amount
+                FROM deltas AS d
+                WHERE p.telegram_id = d.telegram_id
+                  AND p.balance + d.amount >= 0
+                RETURNING p.id, p.telegram_id, p.balance, d.amount
+            ),
+            inserted AS (
+                INSERT INTO transactions (player_id, game_id, amount, action)
+                SELECT id, :game_id, amount, CASE WHEN amount > 0 THEN 'win' ELSE 'loss' END
+                FROM updated
+                RETURNING id, player_id
+            ),
+            results AS (
+                SELECT id AS player_id, amount AS net, false AS svara FROM updated
+            ),
+            {RECORD_RESULTS_CTE}
+            SELECT updated.telegram_id, updated.balance, inserted.id AS version, results.net
+            FROM updated
+            JOIN inserted ON inserted.player_id = updated.id
+            JOIN results ON results.player_id = updated.id
+        """)
         try:
-            player = self.db.query(Player).filter(Player.telegram_id == telegram_id).first()
-            if not player:
-                return []
-
-            transactions = (
-                self.db.query(Transaction)
-                .filter(Transaction.player_id == player.id)
-                .order_by(Transaction.created_at.desc())
-                .limit(limit)
-                .all()
+            result = await self.db.execute(statement, params)
+            rows = result.all()
+            balances = {row.telegram_id: row.balance for row in rows}
+            if len(balances) != len(items):
+                await self.db.rollback()
+                missing = [telegram_id for telegram_id, _ in items if telegram_id not in balances]
+                logger.warning(f"Settlement of game {game_id} rejected for players {missing}")
+                return False, "Недостаточно средств или игрок не найден", {}
+            await self.db.commit()
+            if self.cache is not None:
+                await self.cache.store_many([(row.telegram_id, row.balance, row.version) for row in rows])
+            if self.leaderboard is not None:
+                await self.leaderboard.record({row.telegram_id: row.net for row in rows})
+            return True, "Итоги игры проведены", balances
+        except SQLAlchemyError as e:
+            try:
+                await self.db.rollback()
+            except Exception as rollback_exc:
+                logger.error(f"Rollback error: {rollback_exc}")
+            logger.error(f"Error settling game {game_id}: {e}", exc_info=True)
+            return False, "Ошибка при проведении итогов игры", {}
+
+    @timed(DB_CALL_SECONDS, "reserve_stake")
+    @traced("wallet.reserve_stake")
+    async def reserve_stake(self, telegram_id: int, game_id: str, amount: int) -> Tuple[bool, str]:
+        """
+        Зарезервировать фишки для игры за столом (buy-in)
+
+        Списание с кошелька, запись резерва и транзакция 'join' выполняются
+        одним запросом. Дальше ставки двигают фишки только в GameState,
+        а в БД деньги возвращаются один раз — через release_escrow.
+        """
+        statement = text("""
+            WITH updated AS (
+                UPDATE players
+                SET balance = balance - :amount
+                WHERE telegram_id = :telegram_id AND balance >= :amount
+                RETURNING id, balance
+            ),
+            game AS (
+                INSERT INTO games (id, status, pot)
+                SELECT :game_id, 'active', 0 FROM updated
+                ON CONFLICT (id) DO NOTHING
+            ),
+            escrow AS (
+                INSERT INTO escrows (game_id, player_id, amount)
+                SELECT :game_id, id, :amount FROM updated
+            ),
+            inserted AS (
+                INSERT INTO transactions (player_id, game_id, amount, action)
+                SELECT id, :game_id, -CAST(:amount AS INTEGER), 'join' FROM updated
+                RETURNING id
             )
+            SELECT updated.balance, inserted.id AS version FROM updated, inserted
+        """)
+        try:
+            result = await self.db.execute(statement, {
+                "telegram_id": telegram_id,
+                "game_id": game_id,
+                "amount": amount,
+            })
+            row = result.one_or_none()
+            if row is None:
+                await self.db.rollback()
+                return False, "Недостаточно средств"
+            await self.db.commit()
+            if self.cache is not None:
+                await self.cache.store(telegram_id, row.balance, row.version)
+            return True, f"Зарезервировано {amount}. Баланс: {row.balance}"
+        except SQLAlchemyError as e:
+            try:
+                await self.db.rollback()
+            except Exception as rollback_exc:
+                logger.error(f"Rollback error: {rollback_exc}")
+            logger.error(f"Error reserving stake for user {telegram_id} in game {game_id}: {e}", exc_info=True)
+            return False, "Ошибка при резервировании ставки"
+
+    @timed(DB_CALL_SECONDS, "release_escrow")
+    @traced("wallet.release_escrow")
+    async def release_escrow(self, game_id: str, payouts: Dict[int, int],
+                             svara_players: Iterable[int] = ()) -> Tuple[bool, str, Dict[int, int]]:
+        """
+        Вернуть фишки со стола в кошельки (расчет по итогам игры или уход игрока)
+
+        Резерв удаляется, фишки зачисляются и статистика игроков обновляется
+        в одной транзакции; с последним резервом игра помечается 'finished'.
+        Повторный расчет того же игрока ничего не делает — резерва уже нет.
+
+        Args:
+            game_id: ID игры
+            payouts: Фишки игроков на момент расчета по telegram_id
+            svara_players: telegram_id участников свары
+
+        Returns:
+            Tuple[bool, str, Dict[int, int]]: (успех, сообщение, новые балансы по telegram_id)
+        """
+        if not payouts:
+            return True, "Нечего возвращать", {}
+
+        items = sorted(payouts.items())
+        svara_players = set(svara_players)
+        values = ", ".join(
+            f"(CAST(:t{i} AS BIGINT), CAST(:a{i} AS INTEGER), CAST(:s{i} AS BOOLEAN))" for i in range(len(items))
+        )
+        params = {"game_id": game_id}
+        for i, (telegram_id, amount) in enumerate(items):
+            params[f"t{i}"] = telegram_id
+            params[f"a{i}"] = amount
+            params[f"s{i}"] = telegram_id in svara_players
 
-            return [
-                {
-                    "amount": t.amount,
-                    "action": t.action,
-                    "created_at": t.created_at,
-                    "game_id": t.game_id
-                }
-                for t in transactions
-            ]
+        statement = text(f"""
+            WITH payouts (telegram_id, amount, svara) AS (VALUES {values}),
+            released AS (
+                DELETE FROM escrows AS e
+                USING players AS p, payouts AS d
+                WHERE e.game_id = :game_id
+                  AND e.player_id = p.id
+                  AND p.telegram_id = d.telegram_id
+                RETURNING e.player_id, e.amount AS stake, d.amount AS payout, d.svara
+            ),
+            updated AS (
+                UPDATE players AS p
+                SET balance = p.balance + r.payout
+                FROM released AS r
+                WHERE p.id = r.player_id
+                RETURNING p.id, p.telegram_id, p.balance
+            ),
+            inserted AS (
+                INSERT INTO transactions (player_id, game_id, amount, action)
+                SELECT player_id, :game_id, payout, CASE WHEN payout > stake THEN 'win' ELSE 'loss' END
+                FROM released
+                RETURNING id, player_id
+            ),
+            results AS (
+                SELECT player_id, payout - stake AS net, svara FROM released
+            ),
+            finished AS (
+                -- Игра закрывается, когда возвращен последний резерв (уход игрока ее не закрывает)
+                UPDATE games
+                SET status = 'finished', finished_at = now()
+                WHERE id = :game_id
+                  AND (SELECT count(*) FROM escrows WHERE game_id = :game_id) = (SELECT count(*) FROM released)
+            ),
+            {RECORD_RESULTS_CTE}
+            SELECT updated.telegram_id, updated.balance, inserted.id AS version, results.net
+            FROM updated
+            JOIN inserted ON inserted.player_id = updated.id
+            JOIN results ON results.player_id = updated.id
+        """)
+        try:
+            result = await self.db.execute(statement, params)
+            rows = result.all()
+            await self.db.commit()
+            if self.cache is not None:
+                await self.cache.store_many([(row.telegram_id, row.balance, row.version) for row in rows])
+            if self.leaderboard is not None:
+                await self.leaderboard.record({row.telegram_id: row.net for row in rows})
+            return True, "Фишки возвращены", {row.telegram_id: row.balance for row in rows}
+        except SQLAlchemyError as e:
+            try:
+                await self.db.rollback()
+            except Exception as rollback_exc:
+                logger.error(f"Rollback error: {rollback_exc}")
+            logger.error(f"Error releasing escrow of game {game_id}: {e}", exc_info=True)
+            return False, "Ошибка при возврате фишек", {}
+
+    @timed(DB_CALL_SECONDS, "refund_escrow")
+    @traced("wallet.refund_escrow")
+    async def refund_escrow(self, game_id: str) -> Tuple[bool, str, Dict[int, int]]:
+        """
+        Вернуть все резервы несостоявшейся игры (стол так и не собрался)
+
+        В отличие от release_escrow игра не засчитывается: в журнал пишется
+        'refund', статистика и лидерборд не меняются, игра помечается 'cancelled'.
+
+        Returns:
+            Tuple[bool, str, Dict[int, int]]: (успех, сообщение, новые балансы по telegram_id)
+        """
+        statement = text("""
+            WITH released AS (
+                DELETE FROM escrows
+                WHERE game_id = :game_id
+                RETURNING player_id, amount
+            ),
+            updated AS (
+                UPDATE players AS p
+                SET balance = p.balance + r.amount
+                FROM released AS r
+                WHERE p.id = r.player_id
+                RETURNING p.id, p.telegram_id, p.balance
+            ),
+            inserted AS (
+                INSERT INTO transactions (player_id, game_id, amount, action)
+                SELECT player_id, :game_id, amount, 'refund' FROM released
+                RETURNING id, player_id
+            ),
+            cancelled AS (
+                UPDATE games
+                SET status = 'cancelled', finished_at = now()
+                WHERE id = :game_id
+            )
+            SELECT updated.telegram_id, updated.balance, inserted.id AS version
+            FROM updated
+            JOIN inserted ON inserted.player_id = updated.id
+        """)
+        try:
+            result = await self.db.execute(statement, {"game_id": game_id})
+            rows = result.all()
+            await self.db.commit()
+            if self.cache is not None:
+                await self.cache.store_many([(row.telegram_id, row.balance, row.version) for row in rows])
+            return True, "Резервы возвращены", {row.telegram_id: row.balance for row in rows}
+        except SQLAlchemyError as e:
+            try:
+                await self.db.rollback()
+            except Exception as rollback_exc:
+                logger.error(f"Rollback error: {rollback_exc}")
+            logger.error(f"Error refunding escrow of game {game_id}: {e}", exc_info=True)
+            return False, "Ошибка при возврате резервов", {}
+
+    @timed(DB_CALL_SECONDS, "refund_stale_escrows")
+    @traced("wallet.refund_stale_escrows")
+    async def refund_stale_escrows(self, active_game_ids: List[str], older_than: int) -> int:
+        """
+        Вернуть резервы игр, которых больше нет (например, после падения сервера)
+
+        Returns:
+            Количество игроков, получивших возврат
+        """
+        statement = text("""
+            WITH released AS (
+                DELETE FROM escrows
+                WHERE created_at < now() - make_interval(secs => :older_than)
+                  AND NOT (game_id = ANY(CAST(:active AS VARCHAR[])))
+                RETURNING game_id, player_id, amount
+            ),
+            totals AS (
+                SELECT player_id, SUM(amount) AS amount FROM released GROUP BY player_id
+            ),
+            updated AS (
+                UPDATE players AS p
+                SET balance = p.balance + t.amount
+                FROM totals AS t
+                WHERE p.id = t.player_id
+                RETURNING p.id, p.telegram_id, p.balance
+            ),
+            inserted AS (
+                INSERT INTO transactions (player_id, game_id, amount, action)
+                SELECT player_id, game_id, amount, 'refund' FROM released
+                RETURNING id, player_id
+            ),
+            cancelled AS (
+                UPDATE games
+                SET status = 'cancelled', finished_at = now()
+                WHERE id IN (SELECT game_id FROM released) AND finished_at IS NULL
+            )
+            SELECT updated.telegram_id, updated.balance, MAX(inserted.id) AS version
+            FROM updated
+            JOIN inserted ON inserted.player_id = updated.id
+            GROUP BY updated.telegram_id, updated.balance
+        """)
+        try:
+            result = await self.db.execute(statement, {"older_than": older_than, "active": list(active_game_ids)})
+            refunded = result.all()
+            await self.db.commit()
+            if self.cache is not None:
+                await self.cache.store_many([(row.telegram_id, row.balance, row.version) for row in refunded])
+            if refunded:
+                logger.warning(f"Refunded stale escrows to {len(refunded)} players")
+            return len(refunded)
+        except SQLAlchemyError as e:
+            try:
+                await self.db.rollback()
+            except Exception as rollback_exc:
+                logger.error(f"Rollback error: {rollback_exc}")
+            logger.error(f"Error refunding stale escrows: {e}", exc_info=True)
+            return 0
+
+    async def get_transaction_history(self, telegram_id: int, limit: int = 10) -> list:
+        """Получить последние транзакции пользователя"""
+        transactions, _ = await self.get_transaction_page(telegram_id, limit=limit)
+        return transactions
+
+    @timed(DB_CALL_SECONDS, "get_transaction_page")
+    @traced("wallet.get_transaction_page")
+    async def get_transaction_page(self, telegram_id: int, limit: int = 20, cursor: Optional[str] = None,
+                                   action: Optional[str] = None,
+                                   game_id: Optional[str] = None) -> Tuple[list, Optional[str]]:
+        """
+        Страница истории транзакций, от новых к старым (keyset-пагинация)
+
+        Args:
+            telegram_id: ID пользователя в Telegram
+            limit: Размер страницы
+            cursor: Курсор из предыдущей страницы (None — первая страница)
+            action: Фильтр по типу транзакции
+            game_id: Фильтр по игре
+
+        Returns:
+            Tuple[list, Optional[str]]: (транзакции, курсор следующей страницы или None)
+        """
+        # Игрок ищется подзапросом в том же запросе: при JOIN планировщик не знает,
+        # что player_id постоянен, и сортирует все строки игрока вместо чтения индекса по порядку
+        player_id = select(Player.id).where(Player.telegram_id == telegram_id).scalar_subquery()
+        query = (
+            select(Transaction.id, Transaction.amount, Transaction.action,
+                   Transaction.created_at, Transaction.game_id)
+            .where(Transaction.player_id == player_id)
+        )
+        if action is not None:
+            query = query.where(Transaction.action == action)
+        if game_id is not None:
+            query = query.where(Transaction.game_id == game_id)
+        if cursor is not None:
+            created_at, transaction_id = decode_history_cursor(cursor)
+            # Отдельное условие по created_at позволяет отсечь более новые помесячные секции
+            query = query.where(
+                Transaction.created_at <= created_at,
+                tuple_(Transaction.created_at, Transaction.id) < tuple_(created_at, transaction_id)
+            )
+        # Порядок совпадает с индексом idx_transactions_player_created; берем на строку больше,
+        # чтобы узнать, есть ли следующая страница
+        query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(limit + 1)
+
+        try:
+            rows = (await self.db.execute(query)).all()
         except SQLAlchemyError as e:
             logger.error(f"Error getting transaction history for user {telegram_id}: {e}")
-            return [] 
\ No newline at end of file
+            return [], None
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_history_cursor(rows[-1].created_at, rows[-1].id)
+
+        return [
+            {
+                "id": row.id,
+                "amount": row.amount,
+                "action": row.action,
+                "created_at": row.created_at,
+                "game_id": row.game_id
+            }
+            for row in rows
+        ], next_cursor
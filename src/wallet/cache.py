@@ -0,0 +1,88 @@
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Запись только если версия новее сохраненной (или записи нет)
+_STORE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'version')
+if current and tonumber(current) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'balance', ARGV[1], 'version', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# Заполнение после промаха: только если запись отсутствует
+_FILL_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'balance', ARGV[1], 'version', 0)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class BalanceCache:
+    """
+    Write-through кэш балансов в Redis поверх Postgres.
+
+    Postgres остается источником истины. Каждая запись в кэше хранит версию —
+    id последней транзакции игрока, поэтому запоздавшая запись не может
+    перетереть более свежий баланс, а значение, прочитанное из БД при промахе,
+    кладется только в пустой слот.
+    """
+
+    def __init__(self, redis_client, ttl: int = 3600):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.key_prefix = "seka:balance:"
+        self._store = redis_client.register_script(_STORE_SCRIPT)
+        self._fill = redis_client.register_script(_FILL_SCRIPT)
+
+    def _key(self, telegram_id: int) -> str:
+        return f"{self.key_prefix}{telegram_id}"
+
+    async def get(self, telegram_id: int) -> Optional[int]:
+        """Баланс из кэша или None при промахе"""
+        try:
+            balance = await self.redis.hget(self._key(telegram_id), "balance")
+            return int(balance) if balance is not None else None
+        except Exception as e:
+            logger.warning(f"Balance cache read failed for {telegram_id}: {e}")
+            return None
+
+    async def store(self, telegram_id: int, balance: int, version: int) -> None:
+        """Сохранить баланс после изменения в БД (write-through)"""
+        try:
+            await self._store(keys=[self._key(telegram_id)], args=[balance, version, self.ttl])
+        except Exception as e:
+            logger.warning(f"Balance cache write failed for {telegram_id}: {e}")
+            await self.invalidate(telegram_id)
+
+    async def store_many(self, entries) -> None:
+        """Сохранить несколько балансов одним конвейером: [(telegram_id, balance, version), ...]"""
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for telegram_id, balance, version in entries:
+                    await self._store(keys=[self._key(telegram_id)], args=[balance, version, self.ttl], client=pipe)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Balance cache batch write failed: {e}")
+            for telegram_id, _, _ in entries:
+                await self.invalidate(telegram_id)
+
+    async def fill(self, telegram_id: int, balance: int) -> None:
+        """Положить в кэш баланс, прочитанный из БД после промаха"""
+        try:
+            await self._fill(keys=[self._key(telegram_id)], args=[balance, self.ttl])
+        except Exception as e:
+            logger.warning(f"Balance cache fill failed for {telegram_id}: {e}")
+
+    async def invalidate(self, telegram_id: int) -> None:
+        try:
+            await self.redis.delete(self._key(telegram_id))
+        except Exception as e:
+            logger.error(f"Balance cache invalidation failed for {telegram_id}: {e}")
@@ -0,0 +1,148 @@
+import logging
+import re
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "transactions"
+DEFAULT_PARTITION = "transactions_default"
+_PARTITION_NAME = re.compile(r"^transactions_(\d{4})_(\d{2})$")
+_COLUMNS = "id, game_id, player_id, amount, action, created_at"
+
+# Свертка строк в дневные итоги; строки берутся из CTE "archived"
+_SUMMARIZE = """
+    INSERT INTO transaction_daily_summary (player_id, day, action, amount, transactions_count)
+    SELECT player_id, (created_at AT TIME ZONE 'UTC')::date, action, SUM(amount), COUNT(*)
+    FROM archived
+    GROUP BY 1, 2, 3
+    ON CONFLICT (player_id, day, action) DO UPDATE
+    SET amount = transaction_daily_summary.amount + EXCLUDED.amount,
+        transactions_count = transaction_daily_summary.transactions_count + EXCLUDED.transactions_count
+"""
+
+
+def _month_start(year: int, month: int) -> datetime:
+    return datetime(year, month, 1, tzinfo=timezone.utc)
+
+
+def _shift_month(year: int, month: int, delta: int) -> Tuple[int, int]:
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def partition_name(year: int, month: int) -> str:
+    return f"{PARENT_TABLE}_{year:04d}_{month:02d}"
+
+
+class LedgerMaintenance:
+    """
+    Обслуживание секционированной таблицы transactions.
+
+    Каждый месяц хранится в отдельной секции transactions_YYYY_MM: вставки идут
+    в небольшую текущую секцию, а запросы истории с условием по created_at
+    читают только нужные секции. Задача заранее создает секции на ближайшие
+    месяцы, а секции старше срока хранения сворачивает в transaction_daily_summary
+    и удаляет целиком, без построчного DELETE.
+    """
+
+    def __init__(self, session_factory, retention_months: int = 12, premake_months: int = 2):
+        self.session_factory = session_factory
+        self.retention_months = retention_months
+        self.premake_months = premake_months
+
+    async def run(self, now: Optional[datetime] = None) -> None:
+        """Один проход обслуживания; ошибки логируются, следующий проход повторит работу"""
+        try:
+            created = await self.ensure_partitions(now)
+            archived = await self.archive_partitions(now)
+            if created or archived:
+                logger.info(f"Ledger maintenance: created {created}, archived {archived}")
+        except SQLAlchemyError as e:
+            logger.error(f"Ledger maintenance failed: {e}")
+
+    async def _list_partitions(self, db) -> List[Tuple[int, int]]:
+        result = await db.execute(text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:parent AS regclass)
+        """), {"parent": PARENT_TABLE})
+        months = []
+        for (name,) in result:
+            match = _PARTITION_NAME.match(name)
+            if match:
+                months.append((int(match.group(1)), int(match.group(2))))
+        return sorted(months)
+
+    async def ensure_partitions(self, now: Optional[datetime] = None) -> List[str]:
+        """Создает секции текущего и premake_months следующих месяцев"""
+        now = now or datetime.now(timezone.utc)
+        created = []
+        async with self.session_factory() as db:
+            existing = set(await self._list_partitions(db))
+            for delta in range(self.premake_months + 1):
+                year, month = _shift_month(now.year, now.month, delta)
+                if (year, month) in existing:
+                    continue
+                await self._create_partition(db, year, month)
+                await db.commit()
+                created.append(partition_name(year, month))
+        return created
+
+    async def _create_partition(self, db, year: int, month: int) -> None:
+        name = partition_name(year, month)
+        start = _month_start(year, month)
+        end = _month_start(*_shift_month(year, month, 1))
+        bounds = {"start": start, "end": end}
+        create = (f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} "
+                  f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')")
+
+        stray = await db.execute(text(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end)"
+        ), bounds)
+        if not stray.scalar():
+            await db.execute(text(create))
+            return
+
+        # В секции по умолчанию уже есть строки этого месяца: Postgres не даст создать
+        # пересекающуюся секцию, поэтому строки переносятся при отсоединенной DEFAULT
+        logger.warning(f"Moving rows of {name} out of {DEFAULT_PARTITION}")
+        await db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+        await db.execute(text(create))
+        await db.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE created_at >= :start AND created_at < :end
+                RETURNING {_COLUMNS}
+            )
+            INSERT INTO {name} ({_COLUMNS}) SELECT {_COLUMNS} FROM moved
+        """), bounds)
+        await db.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+
+    async def archive_partitions(self, now: Optional[datetime] = None) -> List[str]:
+        """Сворачивает в дневные итоги и удаляет секции старше retention_months"""
+        now = now or datetime.now(timezone.utc)
+        cutoff = _shift_month(now.year, now.month, -self.retention_months)
+        archived = []
+        async with self.session_factory() as db:
+            for year, month in await self._list_partitions(db):
+                if (year, month) >= cutoff:
+                    continue
+                name = partition_name(year, month)
+                # Свертка, отсоединение и удаление в одной транзакции: при сбое секция остается целой
+                await db.execute(text(f"WITH archived AS (SELECT {_COLUMNS} FROM {name})" + _SUMMARIZE))
+                await db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+                await db.execute(text(f"DROP TABLE {name}"))
+                await db.commit()
+                archived.append(name)
+
+            # Старые строки, попавшие в DEFAULT до создания секций своего месяца
+            await db.execute(text(f"""
+                WITH archived AS (
+                    DELETE FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff RETURNING {_COLUMNS}
+                )""" + _SUMMARIZE), {"cutoff": _month_start(*cutoff)})
+            await db.commit()
+        return archived
@@ -46,7 +46,9 @@ python3 init_db.py
 
 # --- 5. Запускаем приложение ---
 echo -e "${GREEN}Starting application...${NC}"
-uvicorn src.server:app --host 0.0.0.0 --port 8000 --workers 1 &
+# Кадры WebSocket больше WS_MAX_MESSAGE_SIZE uvicorn отклоняет до буферизации в памяти
+WS_MAX_MESSAGE_SIZE=${WS_MAX_MESSAGE_SIZE:-$(grep -s '^WS_MAX_MESSAGE_SIZE=' .env | cut -d= -f2)}
+uvicorn src.server:app --host 0.0.0.0 --port 8000 --workers 1 --ws-max-size "${WS_MAX_MESSAGE_SIZE:-4096}" &
 SERVER_PID=$!
 echo -e "Game Server started with PID ${YELLOW}$SERVER_PID${NC} on port ${YELLOW}8000${NC}"
 
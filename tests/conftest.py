@@ -0,0 +1,64 @@
+"""
+Подключения для интеграционных тестов.
+
+Тесты, которым нужны Postgres или Redis, получают адрес через фикстуры и
+пропускаются, если сервис не настроен или недоступен. Запись в Postgres
+(кошелек, секции журнала) выполняется только в базе из TEST_DATABASE_URL
+с примененными миграциями — рабочую базу из POSTGRES_* эти тесты не трогают.
+"""
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+
+def _check_postgres(url: str) -> str:
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except OperationalError as e:
+        pytest.skip(f"Postgres недоступен: {e.orig}")
+    finally:
+        engine.dispose()
+    return url
+
+
+@pytest.fixture(scope="session")
+def database_url() -> str:
+    """Синхронный URL базы для чтения: TEST_DATABASE_URL или настройки POSTGRES_*"""
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        from src.db import DATABASE_URL, DB_HOST
+        if not DB_HOST:
+            pytest.skip("Postgres не настроен (TEST_DATABASE_URL или POSTGRES_*)")
+        url = DATABASE_URL
+    return _check_postgres(url)
+
+
+@pytest.fixture(scope="session")
+def test_database_url() -> str:
+    """Асинхронный (asyncpg) URL тестовой базы, в которую можно писать"""
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("Нужна тестовая база с миграциями: TEST_DATABASE_URL")
+    _check_postgres(url)
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+@pytest.fixture(scope="session")
+def redis_url() -> str:
+    """Адрес Redis: TEST_REDIS_URL или localhost. Тесты пишут только под своими префиксами"""
+    import redis
+
+    url = os.getenv("TEST_REDIS_URL") or "redis://localhost:6379/0"
+    client = redis.Redis.from_url(url)
+    try:
+        client.ping()
+    except redis.RedisError as e:
+        pytest.skip(f"Redis недоступен: {e}")
+    finally:
+        client.close()
+    return url
@@ -0,0 +1,65 @@
+import asyncio
+import uuid
+
+import redis.asyncio as redis
+
+from src.wallet.cache import BalanceCache
+
+
+def _run(redis_url, scenario):
+    async def main():
+        client = redis.Redis.from_url(redis_url, decode_responses=True)
+        cache = BalanceCache(client)
+        cache.key_prefix = f"test:{uuid.uuid4().hex}:balance:"
+        try:
+            await scenario(cache)
+        finally:
+            keys = [key async for key in client.scan_iter(f"{cache.key_prefix}*")]
+            if keys:
+                await client.delete(*keys)
+            await client.aclose()
+
+    asyncio.run(main())
+
+
+def test_late_write_does_not_overwrite_newer_balance(redis_url):
+    async def scenario(cache):
+        await cache.store(1, 700, version=12)
+        # Запись более ранней транзакции пришла позже
+        await cache.store(1, 900, version=10)
+        assert await cache.get(1) == 700
+
+        await cache.store(1, 650, version=13)
+        assert await cache.get(1) == 650
+
+    _run(redis_url, scenario)
+
+
+def test_fill_after_miss_only_takes_an_empty_slot(redis_url):
+    async def scenario(cache):
+        assert await cache.get(1) is None
+        await cache.fill(1, 1000)
+        assert await cache.get(1) == 1000
+
+        # Значение из БД, прочитанное до записи, не перетирает ее
+        await cache.store(1, 800, version=5)
+        await cache.fill(1, 1000)
+        assert await cache.get(1) == 800
+
+        # Любая версионная запись новее заполненного значения
+        await cache.invalidate(1)
+        await cache.fill(1, 1000)
+        await cache.store(1, 1200, version=1)
+        assert await cache.get(1) == 1200
+
+    _run(redis_url, scenario)
+
+
+def test_store_many_applies_each_version_check(redis_url):
+    async def scenario(cache):
+        await cache.store(2, 300, version=20)
+        await cache.store_many([(1, 100, 5), (2, 200, 15), (3, 400, 1)])
+
+        assert [await cache.get(i) for i in (1, 2, 3)] == [100, 300, 400]
+
+    _run(redis_url, scenario)
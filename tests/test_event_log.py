@@ -0,0 +1,30 @@
+from src.game.replay import TableEventLog
+
+
+def _log_with(count: int, capacity: int = 4) -> TableEventLog:
+    log = TableEventLog(capacity=capacity)
+    for n in range(count):
+        log.append({"type": "game_state", "n": n})
+    return log
+
+
+def test_since_returns_missed_events():
+    log = _log_with(3)
+
+    assert [e["seq"] for e in log.since(1)] == [2, 3]
+    assert log.since(3) == []
+
+
+def test_since_requires_snapshot_when_events_are_gone():
+    log = _log_with(6)
+
+    # В буфере остались события 3..6
+    assert [e["seq"] for e in log.since(2)] == [3, 4, 5, 6]
+    assert log.since(1) is None
+
+
+def test_since_requires_snapshot_for_unknown_future_seq():
+    # Клиент видел больше событий, чем есть в буфере (буфер пересоздан после простоя)
+    log = _log_with(2)
+
+    assert log.since(10) is None
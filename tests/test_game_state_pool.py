@@ -0,0 +1,42 @@
+from src.game.engine import GameState, GameStatePool
+
+
+def _played_table(game: GameState) -> GameState:
+    """Стол после раздачи, ставок и сброса — все поля отличаются от нового"""
+    game.created_at = "2026-01-01T00:00:00"
+    game.min_bet = 200
+    game.max_bet = 4000
+    for seat in range(6):
+        game.add_player(str(seat), {"first_name": f"p{seat}"}, chips=1000)
+    for seat in range(6):
+        game.place_initial_bet(str(seat), 200)
+    game.place_bet(game.current_turn, 400)
+    game.fold(game.current_turn)
+    game.svara_players.add("0")
+    return game
+
+
+def test_released_state_is_clean_on_reacquire():
+    pool = GameStatePool(max_size=1)
+    game = _played_table(pool.acquire())
+    assert game.status == "playing" and game.deck and game.bank and game.folded_players
+
+    pool.release(game)
+    reused = pool.acquire()
+
+    assert reused is game
+    assert vars(reused) == vars(GameState())
+
+
+def test_release_keeps_containers_and_ignores_double_release():
+    pool = GameStatePool(max_size=4)
+    game = pool.acquire()
+    players, folded = game.players, game.folded_players
+    _played_table(game)
+
+    pool.release(game)
+    pool.release(game)
+
+    assert len(pool) == 1
+    assert pool.acquire().players is players and game.folded_players is folded
+    assert len(pool) == 0
@@ -0,0 +1,32 @@
+from src.game.engine import GameState
+
+
+def _full_table() -> GameState:
+    game = GameState()
+    for seat in range(6):
+        game.add_player(str(seat), chips=1000)
+    return game
+
+
+def test_second_initial_bet_is_rejected():
+    game = _full_table()
+
+    assert game.place_initial_bet("0", 100)
+    assert not game.place_initial_bet("0", 100)
+
+    player = game.players["0"]
+    assert player["chips"] == 900 and player["bet"] == 100
+    assert sum(p["chips"] + p["bet"] for p in game.players.values()) == 6000
+
+
+def test_initial_bet_only_while_betting():
+    game = GameState()
+    game.add_player("0", chips=1000)
+    assert game.status == "matchmaking"
+    assert not game.place_initial_bet("0", 100)
+
+    game = _full_table()
+    for seat in range(6):
+        game.place_initial_bet(str(seat), 100)
+    assert game.status == "playing"
+    assert not game.place_initial_bet("0", 100)
@@ -0,0 +1,94 @@
+"""
+Лидерборды в Redis: накопление итогов, места игроков и пересборка из
+Postgres. Нужен Redis (TEST_REDIS_URL); ключи получают уникальный префикс.
+"""
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import redis.asyncio as redis
+
+from src.stats.leaderboard import Leaderboard
+
+
+def _run(redis_url, scenario):
+    async def main():
+        client = redis.Redis.from_url(redis_url, decode_responses=True)
+        leaderboard = Leaderboard(client, key_prefix=f"test:{uuid.uuid4().hex}:leaderboard:")
+        try:
+            await scenario(leaderboard)
+        finally:
+            keys = [key async for key in client.scan_iter(f"{leaderboard.key_prefix}*")]
+            if keys:
+                await client.delete(*keys)
+            await client.aclose()
+
+    asyncio.run(main())
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+
+class FakeDb:
+    """Итоги игроков из Postgres; before_query — что происходит, пока запрос выполняется"""
+
+    def __init__(self, totals, before_query=None):
+        self.totals = totals
+        self.before_query = before_query
+
+    async def execute(self, statement, params=None):
+        if self.before_query is not None:
+            await self.before_query()
+            self.before_query = None
+        return FakeResult(SimpleNamespace(telegram_id=t, net=net) for t, net in self.totals.items())
+
+
+def test_results_accumulate_and_rank(redis_url):
+    async def scenario(leaderboard):
+        await leaderboard.record({1: 100, 2: -50, 3: 30})
+        await leaderboard.record({2: 200, 3: -30})
+
+        assert await leaderboard.top() == [(2, 150), (1, 100), (3, 0)]
+        assert await leaderboard.top("daily", limit=1) == [(2, 150)]
+        assert await leaderboard.rank(1) == (2, 100)
+        assert await leaderboard.rank(4) is None
+        assert await leaderboard.around(3, radius=1) == [(2, 1, 100), (3, 3, 0)]
+
+    _run(redis_url, scenario)
+
+
+def test_compact_replaces_sets_with_postgres_totals(redis_url):
+    async def scenario(leaderboard):
+        # В Redis пропущено обновление игрока 2 и лишний игрок 9
+        await leaderboard.record({1: 100, 9: 10})
+
+        sizes = await leaderboard.compact(FakeDb({1: 100, 2: 250}), batch_size=1)
+
+        assert sizes == {"global": 2, "daily": 2, "weekly": 2}
+        assert await leaderboard.top() == [(2, 250), (1, 100)]
+        assert await leaderboard.rank(9, "weekly") is None
+
+    _run(redis_url, scenario)
+
+
+def test_results_recorded_during_compact_are_kept(redis_url):
+    async def scenario(leaderboard):
+        async def game_settles():
+            # Эта игра не попала в выборку из Postgres
+            await leaderboard.record({1: 40})
+
+        await leaderboard.compact(FakeDb({1: 100}, before_query=game_settles))
+
+        assert await leaderboard.top() == [(1, 140)]
+        # Журнал и метка пересборки удалены, дальше итоги пишутся только в набор
+        await leaderboard.record({1: 10})
+        assert await leaderboard.top() == [(1, 150)]
+        assert not await leaderboard.redis.exists(f"{leaderboard._key('global')}:journal")
+
+    _run(redis_url, scenario)
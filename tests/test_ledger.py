@@ -0,0 +1,113 @@
+"""
+Секции журнала transactions: создание секции месяца с переносом строк из
+секции по умолчанию и архивирование старых секций в дневные итоги. Нужна
+тестовая база (TEST_DATABASE_URL) с миграциями; используются месяцы 1990 года,
+до которых рабочие данные не доходят.
+"""
+import asyncio
+import random
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.wallet.ledger import DEFAULT_PARTITION, LedgerMaintenance, partition_name
+
+MARCH_1990 = partition_name(1990, 3)
+
+
+def _run(database_url, scenario):
+    """Создает игрока, выполняет сценарий и удаляет игрока вместе с его строками"""
+    telegram_id = random.randrange(10 ** 12, 2 * 10 ** 12)
+
+    async def main():
+        engine = create_async_engine(database_url)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            async with sessions() as db:
+                result = await db.execute(text(
+                    "INSERT INTO players (telegram_id, first_name, balance) VALUES (:t, 'test', 0) RETURNING id"
+                ), {"t": telegram_id})
+                player_id = result.scalar()
+                await db.commit()
+            await scenario(sessions, LedgerMaintenance(sessions, retention_months=12, premake_months=0), player_id)
+        finally:
+            async with sessions() as db:
+                await db.execute(text(f"DROP TABLE IF EXISTS {MARCH_1990}"))
+                await db.execute(text("DELETE FROM players WHERE telegram_id = :t"), {"t": telegram_id})
+                await db.commit()
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+async def _insert(sessions, player_id, rows):
+    async with sessions() as db:
+        for amount, action, created_at in rows:
+            await db.execute(text(
+                "INSERT INTO transactions (player_id, amount, action, created_at) VALUES (:p, :a, :action, :c)"
+            ), {"p": player_id, "a": amount, "action": action, "c": created_at})
+        await db.commit()
+
+
+async def _count(sessions, table, player_id):
+    async with sessions() as db:
+        result = await db.execute(text(f"SELECT count(*) FROM {table} WHERE player_id = :p"), {"p": player_id})
+        return result.scalar()
+
+
+async def _summary(sessions, player_id):
+    async with sessions() as db:
+        result = await db.execute(text("""
+            SELECT day, action, amount, transactions_count FROM transaction_daily_summary
+            WHERE player_id = :p ORDER BY day, action
+        """), {"p": player_id})
+        return [tuple(row) for row in result.all()]
+
+
+def _utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_new_partition_takes_stray_rows_from_default(test_database_url):
+    async def scenario(sessions, ledger, player_id):
+        await _insert(sessions, player_id, [(-100, "join", _utc(1990, 3, 10, 12)), (250, "win", _utc(1990, 3, 31, 23))])
+        assert await _count(sessions, DEFAULT_PARTITION, player_id) == 2
+
+        assert await ledger.ensure_partitions(now=_utc(1990, 3, 15)) == [MARCH_1990]
+
+        assert await _count(sessions, DEFAULT_PARTITION, player_id) == 0
+        assert await _count(sessions, MARCH_1990, player_id) == 2
+        # Повторный проход ничего не создает
+        assert await ledger.ensure_partitions(now=_utc(1990, 3, 15)) == []
+
+    _run(test_database_url, scenario)
+
+
+def test_old_partition_is_summarized_and_dropped(test_database_url):
+    async def scenario(sessions, ledger, player_id):
+        await ledger.ensure_partitions(now=_utc(1990, 3, 1))
+        await _insert(sessions, player_id, [
+            (-100, "join", _utc(1990, 3, 10, 9)),
+            (-100, "join", _utc(1990, 3, 10, 18)),
+            (300, "win", _utc(1990, 3, 11)),
+            # Месяц без своей секции: строка лежит в секции по умолчанию
+            (-50, "join", _utc(1990, 1, 5)),
+        ])
+
+        # Март 1990 еще в пределах срока хранения
+        assert MARCH_1990 not in await ledger.archive_partitions(now=_utc(1991, 3, 1))
+
+        assert MARCH_1990 in await ledger.archive_partitions(now=_utc(1991, 4, 1))
+
+        async with sessions() as db:
+            result = await db.execute(text("SELECT to_regclass(:name)"), {"name": MARCH_1990})
+            assert result.scalar() is None
+        assert await _count(sessions, "transactions", player_id) == 0
+        assert await _summary(sessions, player_id) == [
+            (_utc(1990, 1, 5).date(), "join", -50, 1),
+            (_utc(1990, 3, 10).date(), "join", -200, 2),
+            (_utc(1990, 3, 11).date(), "win", 300, 1),
+        ]
+
+    _run(test_database_url, scenario)
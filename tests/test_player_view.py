@@ -0,0 +1,31 @@
+from src.game.engine import GameState, HIDDEN_CARD, player_view
+
+
+def _dealt_table() -> GameState:
+    game = GameState()
+    for seat in range(6):
+        game.add_player(str(seat), chips=1000)
+    for seat in range(6):
+        game.place_initial_bet(str(seat), 100)
+    return game
+
+
+def test_opponents_cards_are_hidden_while_playing():
+    state = _dealt_table().to_dict()
+    view = player_view(state, "0")
+
+    assert view["players"]["0"]["cards"] == state["players"]["0"]["cards"]
+    for pid in map(str, range(1, 6)):
+        assert view["players"][pid]["cards"] == [HIDDEN_CARD] * 3
+    # Исходное состояние (оно же хранится в буфере событий) не тронуто
+    assert HIDDEN_CARD not in state["players"]["1"]["cards"]
+
+
+def test_cards_of_players_at_showdown_are_revealed_after_settlement():
+    game = _dealt_table()
+    game.fold("1")
+    game.status = "finished"
+    view = player_view(game.to_dict(), "0")
+
+    assert HIDDEN_CARD not in view["players"]["2"]["cards"]
+    assert view["players"]["1"]["cards"] == [HIDDEN_CARD] * 3
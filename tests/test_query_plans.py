@@ -0,0 +1,101 @@
+"""
+Планы горячих запросов на схеме после миграций.
+
+Для каждого запроса строится EXPLAIN с отключенными последовательным
+сканированием и сортировкой: если нужного индекса нет (или запрос написан
+так, что индекс неприменим), Postgres все равно выберет Seq Scan или
+лишнюю сортировку, и тест упадет. Данные в базе не нужны, но миграции
+должны быть применены.
+
+База берется из TEST_DATABASE_URL, иначе из настроек POSTGRES_*. Без них
+или без доступного Postgres тесты пропускаются.
+"""
+import json
+import re
+
+import pytest
+from sqlalchemy import create_engine, text
+
+# (название, запрос, шаблон имени индекса, допустима ли сортировка в плане)
+HOT_QUERIES = [
+    (
+        "player by telegram_id",
+        "SELECT id, balance FROM players WHERE telegram_id = 1",
+        r"^players_telegram_id_key$",
+        False,
+    ),
+    (
+        "transaction history page",
+        """
+        SELECT id, amount, action, created_at, game_id FROM transactions
+        WHERE player_id = (SELECT id FROM players WHERE telegram_id = 1)
+          AND created_at <= now() AND (created_at, id) < (now(), 1000)
+        ORDER BY created_at DESC, id DESC LIMIT 21
+        """,
+        r"(^idx_transactions_player_created$|player_id_created_at_id_idx$)",
+        False,
+    ),
+    (
+        "transactions of a game",
+        "SELECT player_id, amount FROM transactions WHERE game_id = 'game_1'",
+        r"(^idx_transactions_game$|game_id_idx$)",
+        True,
+    ),
+    (
+        "games of a player",
+        "SELECT game_id FROM game_players WHERE player_id = 1",
+        r"^idx_game_players_player$",
+        True,
+    ),
+    (
+        "stale escrows",
+        "SELECT game_id, player_id FROM escrows WHERE created_at < now() - interval '5 minutes'",
+        r"^idx_escrows_created$",
+        True,
+    ),
+    (
+        "leaderboard by net profit",
+        "SELECT player_id FROM player_stats WHERE games_played > 0 ORDER BY net_profit DESC, player_id LIMIT 10",
+        r"^idx_player_stats_net_profit$",
+        False,
+    ),
+]
+
+
+@pytest.fixture(scope="module")
+def conn(database_url):
+    engine = create_engine(database_url)
+    connection = engine.connect()
+    # Планировщику запрещено все, что дешевле индекса только на маленьких
+    # таблицах: остается Seq Scan или Sort — значит, подходящего индекса нет
+    for setting in ("enable_seqscan", "enable_bitmapscan", "enable_sort"):
+        connection.execute(text(f"SET {setting} = off"))
+    yield connection
+    connection.rollback()
+    connection.close()
+    engine.dispose()
+
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+@pytest.mark.parametrize(
+    "query, index_pattern, allow_sort",
+    [entry[1:] for entry in HOT_QUERIES],
+    ids=[entry[0] for entry in HOT_QUERIES],
+)
+def test_hot_query_uses_index(conn, query, index_pattern, allow_sort):
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(_walk(plan[0]["Plan"]))
+
+    indexes = [node["Index Name"] for node in nodes if "Index Name" in node]
+    assert any(re.search(index_pattern, index) for index in indexes), \
+        f"expected index /{index_pattern}/, plan uses {indexes or 'no indexes'}"
+    if not allow_sort:
+        assert not any(node["Node Type"] in ("Sort", "Incremental Sort") for node in nodes), \
+            "plan sorts rows instead of reading the index in order"
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.utils import rate_limit
+from src.utils.rate_limit import AdmissionController, KeyedRateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=100.0)
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_bucket_allows_burst_then_refills_at_rate(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+
+    assert [bucket.consume() for _ in range(4)] == [True, True, True, False]
+
+    clock.now += 0.5  # +1 токен
+    assert bucket.consume()
+    assert not bucket.consume()
+
+    # Простой не копит токены сверх burst
+    clock.now += 60
+    assert [bucket.consume() for _ in range(4)] == [True, True, True, False]
+
+
+def test_keyed_limiter_keeps_keys_apart_and_bounds_their_number(clock):
+    limiter = KeyedRateLimiter(rate=1, burst=1, max_keys=2)
+
+    assert limiter.consume("a")
+    assert not limiter.consume("a")
+    assert limiter.consume("b")
+
+    # Третий ключ вытесняет самый давний ("a"), и тот начинает с полным запасом
+    assert limiter.consume("c")
+    assert limiter.consume("a")
+
+    limiter.discard("c")
+    assert limiter.consume("c")
+
+
+def test_admission_rejects_on_connections_and_loop_lag():
+    state = SimpleNamespace(connections=0, lag=0.0)
+    admission = AdmissionController(
+        max_connections=2, max_loop_lag=0.5,
+        connection_count=lambda: state.connections, loop_lag=lambda: state.lag,
+    )
+
+    assert admission.admit() == (True, None)
+
+    state.connections = 2
+    admitted, reason = admission.admit()
+    assert not admitted and "connections" in reason
+
+    state.connections, state.lag = 1, 0.8
+    admitted, reason = admission.admit()
+    assert not admitted and "lag" in reason
+    assert admission.rejected == 2
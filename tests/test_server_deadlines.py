@@ -0,0 +1,280 @@
+"""
+Дедлайны игрового сервера: таймаут хода, отмена зависшего стола и таймаут
+очереди. Колесо таймеров и часы сервера подменены, поэтому минуты ожидания
+проходят мгновенно; Redis, кошелек и рассылка заменены записью вызовов.
+"""
+import asyncio
+import json
+import os
+from contextlib import nullcontext
+from types import SimpleNamespace
+
+import pytest
+
+from src.game.engine import GameState
+from src.game.timers import TimerWheel
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    # При импорте сервер монтирует build/static и создает логи в текущем каталоге
+    workdir = tmp_path_factory.mktemp("server")
+    (workdir / "build" / "static").mkdir(parents=True)
+    os.environ.setdefault("BOT_TOKEN", "123:test")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import src.server as server
+    finally:
+        os.chdir(cwd)
+    return server
+
+
+class FakeRedis:
+    """Хэши, множества и строки Redis в памяти — то, чем пользуются очередь и столы"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    async def hmget(self, key, fields):
+        return [self.data.get(key, {}).get(field) for field in fields]
+
+    async def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field] = str(value)
+        return 1
+
+    async def hsetnx(self, key, field, value):
+        if field in self.data.get(key, {}):
+            return 0
+        return await self.hset(key, field, value)
+
+    async def hdel(self, key, *fields):
+        return sum(self.data.get(key, {}).pop(field, None) is not None for field in fields)
+
+    async def hkeys(self, key):
+        return list(self.data.get(key, {}))
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(members)
+
+    async def srem(self, key, *members):
+        self.data.get(key, set()).difference_update(members)
+
+    async def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    async def set(self, key, value):
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.calls.clear()
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.calls.append((name, args))
+            return self
+        return queue
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+@pytest.fixture
+def env(server, monkeypatch):
+    redis = FakeRedis()
+    wheel = TimerWheel(tick=1)
+    state = SimpleNamespace(
+        redis=redis, wheel=wheel, now=1_000_000.0,
+        game_manager=server.GameStateManager(redis, redis),
+        refunded=[], released=[], sent=[], broadcasts=[],
+    )
+
+    class Wallet:
+        def __init__(self, db, *args):
+            pass
+
+        async def refund_escrow(self, game_id):
+            state.refunded.append(game_id)
+            return True, "ok", {}
+
+        async def release_escrow(self, game_id, payouts, svara_players):
+            state.released.append((game_id, payouts))
+            return True, "ok", {}
+
+    async def send_personal_message(message, player_id):
+        state.sent.append((player_id, message))
+
+    async def broadcast_table(game_id, message, player_ids):
+        state.broadcasts.append(message)
+
+    monkeypatch.setattr(server, "redis_master", redis)
+    monkeypatch.setattr(server, "redis_slave", redis)
+    monkeypatch.setattr(server, "game_manager", state.game_manager)
+    monkeypatch.setattr(server, "timer_wheel", wheel)
+    monkeypatch.setattr(server, "time", SimpleNamespace(time=lambda: state.now))
+    monkeypatch.setattr(server, "AsyncSessionLocal", nullcontext)
+    monkeypatch.setattr(server, "WalletManager", Wallet)
+    monkeypatch.setattr(server.manager, "send_personal_message", send_personal_message)
+    monkeypatch.setattr(server.manager, "broadcast_table", broadcast_table)
+    for name in ("_turn_timers", "_stale_timers", "_game_locks"):
+        monkeypatch.setattr(server, name, {})
+    return state
+
+
+async def _advance(env, seconds: float):
+    """Продвигает часы и колесо по секунде, дожидаясь асинхронных коллбеков"""
+    for _ in range(int(seconds)):
+        env.now += 1
+        env.wheel.advance(1)
+        while env.wheel._pending:
+            await asyncio.gather(*list(env.wheel._pending))
+
+
+SEATS = [str(seat) for seat in range(1, 7)]
+
+
+def _table(bets=()) -> GameState:
+    """Полный стол (торги начинаются с шестым игроком) с начальными ставками bets"""
+    game = GameState()
+    for player_id in SEATS:
+        game.add_player(player_id, {"id": int(player_id)}, chips=1000)
+    for player_id in bets:
+        assert game.place_initial_bet(player_id, 100)
+    return game
+
+
+def test_turn_timeout_folds_until_the_table_settles(server, env):
+    async def scenario():
+        game = _table(bets=SEATS)
+        await env.game_manager.save_game("g1", game)
+        server._sync_turn_timer("g1", game)
+        first = game.current_turn
+
+        await _advance(env, server.TURN_TIMEOUT - 1)
+        assert (await env.game_manager.get_game("g1")).folded_players == set()
+
+        await _advance(env, 1)
+        game = await env.game_manager.get_game("g1")
+        assert game.folded_players == {first}
+        # Таймер перешел к следующему игроку
+        assert server._turn_timers["g1"].args == ("g1", game.current_turn)
+
+        for folded in range(2, len(SEATS)):
+            await _advance(env, server.TURN_TIMEOUT)
+            if folded < len(SEATS) - 1:
+                assert len((await env.game_manager.get_game("g1")).folded_players) == folded
+        # Остался один игрок: стол рассчитан и удален, таймеров нет
+        assert await env.game_manager.get_game("g1") is None
+        assert [game_id for game_id, _ in env.released] == ["g1"]
+        assert "g1" not in server._turn_timers
+        assert env.broadcasts[-1]["data"]["status"] == "finished"
+
+    asyncio.run(scenario())
+
+
+def test_turn_timer_follows_the_current_player(server, env):
+    async def scenario():
+        game = _table(bets=SEATS)
+        await env.game_manager.save_game("g1", game)
+        server._sync_turn_timer("g1", game)
+
+        await _advance(env, server.TURN_TIMEOUT - 1)
+        # Игрок успел сходить: таймер перезапускается для следующего
+        assert game.place_bet(game.current_turn, game.current_bet)
+        await env.game_manager.save_game("g1", game)
+        server._sync_turn_timer("g1", game)
+
+        await _advance(env, server.TURN_TIMEOUT - 1)
+        assert (await env.game_manager.get_game("g1")).folded_players == set()
+        await _advance(env, 1)
+        assert (await env.game_manager.get_game("g1")).folded_players == {game.current_turn}
+
+    asyncio.run(scenario())
+
+
+def test_stale_betting_table_is_cancelled_and_bettors_requeued(server, env):
+    async def scenario():
+        game = _table(bets=["1", "2"])
+        await env.game_manager.save_game("g1", game)
+        server._schedule_stale_check("g1", server.STALE_TABLE_TIMEOUT)
+
+        await _advance(env, server.STALE_TABLE_TIMEOUT)
+
+        assert env.refunded == ["g1"]
+        assert await env.game_manager.get_game("g1") is None
+        assert env.broadcasts == [{"type": "game_cancelled", "game_id": "g1"}]
+        # В очередь возвращаются только сделавшие начальную ставку
+        assert await env.game_manager.get_waiting_players() == {"1", "2"}
+        assert json.loads(env.redis.data["seka:user_info:1"]) == {"id": 1}
+
+    asyncio.run(scenario())
+
+
+def test_stale_check_leaves_a_started_table_alone(server, env):
+    async def scenario():
+        game = _table(bets=SEATS)
+        await env.game_manager.save_game("g1", game)
+        server._schedule_stale_check("g1", server.STALE_TABLE_TIMEOUT)
+
+        await _advance(env, server.STALE_TABLE_TIMEOUT)
+
+        assert env.refunded == []
+        assert (await env.game_manager.get_game("g1")).status == "playing"
+
+    asyncio.run(scenario())
+
+
+def test_waiting_player_expires_after_queue_timeout(server, env):
+    async def scenario():
+        await env.redis.set("seka:user_info:1", "{}")
+        assert await env.game_manager.add_waiting_player("1")
+        env.wheel.call_later(server.QUEUE_TIMEOUT, server._expire_waiting, "1")
+
+        await _advance(env, server.QUEUE_TIMEOUT - 1)
+        assert await env.game_manager.get_waiting_players() == {"1"}
+
+        await _advance(env, 1)
+        assert await env.game_manager.get_waiting_players() == set()
+        assert "seka:user_info:1" not in env.redis.data
+        assert env.sent == [("1", {"type": "error", "data": {"message": "matchmaking_timeout"}})]
+
+    asyncio.run(scenario())
+
+
+def test_requeued_player_gets_a_fresh_queue_deadline(server, env):
+    async def scenario():
+        assert await env.game_manager.add_waiting_player("1")
+        env.wheel.call_later(server.QUEUE_TIMEOUT, server._expire_waiting, "1")
+
+        # Через 100 секунд игрок снова встает в очередь: отсчет начинается заново
+        await _advance(env, 100)
+        await env.game_manager.remove_waiting_players(["1"])
+        assert await env.game_manager.add_waiting_player("1")
+
+        await _advance(env, server.QUEUE_TIMEOUT - 100)
+        assert await env.game_manager.get_waiting_players() == {"1"}
+        await _advance(env, 100)
+        assert await env.game_manager.get_waiting_players() == set()
+
+    asyncio.run(scenario())
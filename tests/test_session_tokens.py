@@ -0,0 +1,34 @@
+from jose import jwt
+
+from src.utils.session_tokens import ALGORITHM, issue_session_token, verify_session_token
+
+SECRET = "test-session-secret"
+USER = {"id": 42, "first_name": "Игрок"}
+
+
+def test_token_round_trip_carries_the_user():
+    claims = verify_session_token(issue_session_token(USER, SECRET, ttl=60), SECRET)
+
+    assert claims["sub"] == "42"
+    assert claims["user"] == USER
+    assert claims["exp"] - claims["iat"] == 60
+
+
+def test_token_signed_with_another_secret_is_rejected():
+    token = issue_session_token(USER, "another-secret", ttl=60)
+
+    assert verify_session_token(token, SECRET) is None
+
+
+def test_expired_token_is_rejected():
+    token = issue_session_token(USER, SECRET, ttl=-1)
+
+    assert verify_session_token(token, SECRET) is None
+
+
+def test_other_signed_tokens_are_not_sessions():
+    # Подписано тем же секретом, но это не сессионный токен
+    token = jwt.encode({"sub": "42", "typ": "refresh"}, SECRET, algorithm=ALGORITHM)
+
+    assert verify_session_token(token, SECRET) is None
+    assert verify_session_token("not-a-token", SECRET) is None
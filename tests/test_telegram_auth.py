@@ -0,0 +1,81 @@
+import hashlib
+import hmac
+import json
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
+import pytest
+
+from src.utils import telegram_auth
+from src.utils.telegram_auth import TelegramAuthVerifier
+
+BOT_TOKEN = "123456:TEST-token"
+NOW = 1_700_000_000
+
+
+def _init_data(user_id: int, auth_date: int = NOW, bot_token: str = BOT_TOKEN) -> str:
+    """initData, подписанная так же, как это делает Telegram"""
+    fields = {
+        "query_id": f"AAH{user_id}",
+        "user": json.dumps({"id": user_id, "first_name": "Игрок"}, ensure_ascii=False),
+        "auth_date": str(auth_date),
+    }
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=float(NOW))
+    monkeypatch.setattr(telegram_auth, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def test_valid_init_data_returns_decoded_fields(clock):
+    fields = TelegramAuthVerifier(BOT_TOKEN).verify(_init_data(7))
+
+    assert fields["user"] == {"id": 7, "first_name": "Игрок"}
+    assert "hash" not in fields
+
+
+def test_forged_or_stale_init_data_is_rejected(clock):
+    verifier = TelegramAuthVerifier(BOT_TOKEN, max_age=3600)
+
+    assert verifier.verify(_init_data(7, bot_token="999:other")) is None
+    assert verifier.verify(_init_data(7).replace("AAH7", "AAH8")) is None
+    assert verifier.verify(_init_data(7, auth_date=NOW - 3601)) is None
+    assert verifier.verify("user=%7B%7D") is None
+
+
+def test_repeated_init_data_is_served_from_cache_until_ttl(clock):
+    verifier = TelegramAuthVerifier(BOT_TOKEN, cache_ttl=60)
+    init_data = _init_data(7)
+    assert verifier.verify(init_data) is not None
+
+    # С испорченным ключом проходит только то, что уже лежит в кэше
+    verifier._secret_key = b"broken"
+    assert verifier.verify(init_data) is not None
+    assert verifier.verify(_init_data(8)) is None
+
+    clock.now += 61
+    assert verifier.verify(init_data) is None
+
+
+def test_cached_entry_expires_with_init_data_freshness(clock):
+    verifier = TelegramAuthVerifier(BOT_TOKEN, max_age=30, cache_ttl=300)
+    init_data = _init_data(7)
+    assert verifier.verify(init_data) is not None
+
+    # Кэш не продлевает жизнь initData дольше max_age
+    clock.now += 31
+    assert verifier.verify(init_data) is None
+
+
+def test_cache_is_bounded(clock):
+    verifier = TelegramAuthVerifier(BOT_TOKEN, cache_size=2)
+    for user_id in range(5):
+        verifier.verify(_init_data(user_id))
+
+    assert len(verifier._cache) == 2
@@ -0,0 +1,91 @@
+import asyncio
+
+from src.game.timers import TimerWheel, WHEEL_SIZE
+
+
+def test_call_later_fires_once_on_its_tick():
+    wheel = TimerWheel(tick=1)
+    fired = []
+    wheel.call_later(3, fired.append, "x")
+
+    wheel.advance(2)
+    assert fired == []
+    wheel.advance(1)
+    assert fired == ["x"]
+    wheel.advance(10)
+    assert fired == ["x"]
+    assert len(wheel) == 0
+
+
+def test_long_delays_cascade_to_lower_levels():
+    wheel = TimerWheel(tick=1)
+    fired = []
+    # Задержки на втором и третьем уровнях колеса, в том числе не кратные размеру слота
+    delays = [WHEEL_SIZE - 1, WHEEL_SIZE, WHEEL_SIZE + 5, WHEEL_SIZE ** 2 + 7]
+    for delay in delays:
+        wheel.call_later(delay, lambda d=delay: fired.append((d, wheel.current_tick)))
+
+    wheel.advance(WHEEL_SIZE ** 2 + 10)
+
+    assert fired == [(d, d) for d in delays]
+
+
+def test_cancel_removes_timer():
+    wheel = TimerWheel(tick=1)
+    fired = []
+    handle = wheel.call_later(WHEEL_SIZE + 1, fired.append, "x")
+
+    assert handle.active
+    assert handle.cancel() is True
+    assert not handle.active
+    assert handle.cancel() is False
+
+    wheel.advance(WHEEL_SIZE * 2)
+    assert fired == []
+    assert len(wheel) == 0
+
+
+def test_call_every_repeats_until_cancelled():
+    wheel = TimerWheel(tick=1)
+    fired = []
+    handle = wheel.call_every(2, lambda: fired.append(wheel.current_tick))
+
+    wheel.advance(7)
+    assert fired == [2, 4, 6]
+    assert handle.active
+
+    handle.cancel()
+    wheel.advance(10)
+    assert fired == [2, 4, 6]
+
+
+def test_cancel_from_own_periodic_callback():
+    wheel = TimerWheel(tick=1)
+    fired = []
+
+    def callback():
+        fired.append(wheel.current_tick)
+        handle.cancel()
+
+    handle = wheel.call_every(1, callback)
+    wheel.advance(5)
+
+    assert fired == [1]
+
+
+def test_coroutine_callbacks_run_as_tasks():
+    async def scenario():
+        wheel = TimerWheel(tick=1)
+        fired = []
+
+        async def callback(value):
+            fired.append(value)
+
+        wheel.call_later(1, callback, "x")
+        wheel.advance(1)
+        # Коллбек запущен отдельной задачей и выполнится на следующей итерации цикла
+        assert fired == []
+        await asyncio.sleep(0)
+        return fired
+
+    assert asyncio.run(scenario()) == ["x"]
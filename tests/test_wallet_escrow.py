@@ -0,0 +1,132 @@
+"""
+Резервы фишек за столом: списание при входе, расчет и возврат одним
+запросом. Нужна тестовая база (TEST_DATABASE_URL) с миграциями.
+"""
+import asyncio
+import random
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.wallet import WalletManager
+
+BUY_IN = 1000
+
+
+def _run(database_url, scenario, players=3, balance=5000):
+    """Создает игроков со случайными telegram_id, выполняет сценарий и удаляет их"""
+    telegram_ids = random.sample(range(10 ** 12, 2 * 10 ** 12), players)
+    game_id = f"test_{uuid.uuid4().hex[:12]}"
+
+    async def main():
+        engine = create_async_engine(database_url)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            async with sessions() as db:
+                for telegram_id in telegram_ids:
+                    await db.execute(text(
+                        "INSERT INTO players (telegram_id, first_name, balance) VALUES (:t, 'test', :b)"
+                    ), {"t": telegram_id, "b": balance})
+                await db.commit()
+            async with sessions() as db:
+                await scenario(db, WalletManager(db), game_id, telegram_ids)
+        finally:
+            async with sessions() as db:
+                await db.execute(text("DELETE FROM players WHERE telegram_id = ANY(:ids)"), {"ids": telegram_ids})
+                await db.execute(text("DELETE FROM games WHERE id = :g"), {"g": game_id})
+                await db.commit()
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+async def _balances(db, telegram_ids):
+    result = await db.execute(text(
+        "SELECT telegram_id, balance FROM players WHERE telegram_id = ANY(:ids)"
+    ), {"ids": telegram_ids})
+    return dict(result.all())
+
+
+async def _game(db, game_id):
+    result = await db.execute(text(
+        "SELECT status, finished_at IS NOT NULL, (SELECT count(*) FROM escrows WHERE game_id = :g) "
+        "FROM games WHERE id = :g"
+    ), {"g": game_id})
+    return tuple(result.one())
+
+
+async def _actions(db, telegram_id):
+    result = await db.execute(text("""
+        SELECT t.action, t.amount FROM transactions t JOIN players p ON p.id = t.player_id
+        WHERE p.telegram_id = :t ORDER BY t.id
+    """), {"t": telegram_id})
+    return [tuple(row) for row in result.all()]
+
+
+def test_reserve_then_release_settles_the_table(test_database_url):
+    async def scenario(db, wallet, game_id, players):
+        for telegram_id in players:
+            assert (await wallet.reserve_stake(telegram_id, game_id, BUY_IN))[0]
+        assert await _balances(db, players) == {p: 4000 for p in players}
+        assert await _game(db, game_id) == ("active", False, 3)
+
+        winner, *losers = players
+        payouts = {winner: 2400, losers[0]: 600, losers[1]: 0}
+        settled, _, balances = await wallet.release_escrow(game_id, payouts)
+
+        assert settled
+        assert balances == {winner: 6400, losers[0]: 4600, losers[1]: 4000}
+        assert await _game(db, game_id) == ("finished", True, 0)
+        assert await _actions(db, winner) == [("join", -BUY_IN), ("win", 2400)]
+        assert await _actions(db, losers[1]) == [("join", -BUY_IN), ("loss", 0)]
+
+        # Повторный расчет ничего не меняет: резервов уже нет
+        settled, _, balances = await wallet.release_escrow(game_id, payouts)
+        assert settled and balances == {}
+        assert await _balances(db, players) == {winner: 6400, losers[0]: 4600, losers[1]: 4000}
+
+    _run(test_database_url, scenario)
+
+
+def test_player_leaving_keeps_the_game_open(test_database_url):
+    async def scenario(db, wallet, game_id, players):
+        for telegram_id in players:
+            await wallet.reserve_stake(telegram_id, game_id, BUY_IN)
+
+        leaver, *others = players
+        assert (await wallet.release_escrow(game_id, {leaver: 900}))[0]
+        assert await _game(db, game_id) == ("active", False, 2)
+
+        assert (await wallet.release_escrow(game_id, {others[0]: 1100, others[1]: 1000}))[0]
+        assert await _game(db, game_id) == ("finished", True, 0)
+
+    _run(test_database_url, scenario)
+
+
+def test_refund_returns_buy_ins_and_cancels_the_game(test_database_url):
+    async def scenario(db, wallet, game_id, players):
+        for telegram_id in players:
+            await wallet.reserve_stake(telegram_id, game_id, BUY_IN)
+
+        refunded, _, balances = await wallet.refund_escrow(game_id)
+
+        assert refunded
+        assert balances == {p: 5000 for p in players}
+        assert await _game(db, game_id) == ("cancelled", True, 0)
+        assert await _actions(db, players[0]) == [("join", -BUY_IN), ("refund", BUY_IN)]
+
+    _run(test_database_url, scenario)
+
+
+def test_reserve_without_enough_funds_changes_nothing(test_database_url):
+    async def scenario(db, wallet, game_id, players):
+        reserved, message = await wallet.reserve_stake(players[0], game_id, BUY_IN)
+
+        assert not reserved and message == "Недостаточно средств"
+        assert await _balances(db, players) == {players[0]: 500}
+        assert await _actions(db, players[0]) == []
+        result = await db.execute(text("SELECT count(*) FROM games WHERE id = :g"), {"g": game_id})
+        assert result.scalar() == 0
+
+    _run(test_database_url, scenario, players=1, balance=500)